@@ -0,0 +1,251 @@
+"""
+bench_filters.py — Мікробенчмарки гарячого шляху фільтрації (без Telethon).
+CompiledFilters.decide() і KeywordMatcher.scan() (те, що виконує monitor()),
+CompiledFilters.updated() (перекомпіляція після зміни keywords), а також старі
+обгортки find_keyword / has_minus_word / is_service_spam і clean_minus_words —
+на синтетичному багатомовному корпусі (короткі репліки, довгі прайси, реклама
+з емодзі) і наборах правил по 100 / 1k / 10k записів. Результат — JSON для
+порівняння запусків.
+
+Запуск:
+    python benchmarks/bench_filters.py
+    python benchmarks/bench_filters.py --sizes 100,1000 --messages 500 --out before.json
+    python benchmarks/bench_filters.py --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from filters import (  # noqa: E402
+    CompiledFilters, KeywordMatcher, clean_minus_words, find_keyword, has_minus_word, is_service_spam,
+)
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# ──────────────────────────────────────────────────────────────
+# Синтетичний корпус
+# ──────────────────────────────────────────────────────────────
+_WORDS = {
+    "uk": "привіт шукаю квартиру оренда терміново хто знає де купити продам недорого доставка "
+          "робота вакансія питання допоможіть дякую сьогодні завтра ціна район центр".split(),
+    "ru": "привет ищу квартиру аренда срочно кто знает где купить продам недорого доставка "
+          "работа вакансия вопрос помогите спасибо сегодня завтра цена район центр".split(),
+    "en": "hello looking for flat rent urgent anyone knows where buy sell cheap delivery "
+          "job vacancy question help thanks today tomorrow price district center".split(),
+    "pl": "cześć szukam mieszkania wynajem pilnie ktoś wie gdzie kupić sprzedam tanio dostawa "
+          "praca oferta pytanie pomocy dzięki dzisiaj jutro cena dzielnica centrum".split(),
+}
+_EMOJIS = "🔥💰✅🚀💎⭐️👉📞💯🎁"
+_SERVICES = ["instagram", "tiktok", "youtube", "telegram", "viber", "whatsapp", "facebook", "twitter"]
+_SYLLABLES = "ка ро ми ту ле ва но си да пе ла бу ко ре жи ga mo ri ta ne so lu pa ki de".split()
+
+
+def _sentence(rnd: random.Random, lang: str, n: int) -> str:
+    return " ".join(rnd.choice(_WORDS[lang]) for _ in range(n))
+
+
+def make_corpus(count: int, seed: int = 1) -> list[str]:
+    """Суміш: 60% коротких реплік, 20% прайсів (20–60 рядків), 20% реклами з емодзі."""
+    rnd = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        lang = rnd.choice(list(_WORDS))
+        kind = rnd.random()
+        if kind < 0.6:
+            corpus.append(_sentence(rnd, lang, rnd.randint(3, 15)).capitalize() + rnd.choice(".?!"))
+        elif kind < 0.8:
+            lines = [f"• {_sentence(rnd, lang, rnd.randint(2, 5))} — {rnd.randint(50, 9999)} грн"
+                     for _ in range(rnd.randint(20, 60))]
+            corpus.append("\n".join(lines))
+        else:
+            corpus.append(
+                " ".join(rnd.choice(_EMOJIS) for _ in range(rnd.randint(3, 10)))
+                + f" {_sentence(rnd, lang, rnd.randint(8, 20)).upper()} "
+                + f"{rnd.choice(_SERVICES)} від {rnd.randint(10, 500)}$ "
+                + f"пиши @promo_{rnd.randint(100, 999)} +380{rnd.randint(100000000, 999999999)} "
+                + rnd.choice(_EMOJIS) * 3
+            )
+    return corpus
+
+
+def make_rules(size: int, seed: int = 2) -> list[str]:
+    """size унікальних правил: частина — слова корпусу (є збіги), решта — випадкові склади."""
+    rnd = random.Random(seed)
+    real = sorted({w for words in _WORDS.values() for w in words})
+    rules = rnd.sample(real, min(len(real), max(1, size // 20)))
+    seen = set(rules)
+    while len(rules) < size:
+        word = "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4)))
+        if rnd.random() < 0.2:
+            word += " " + "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 3)))
+        if word not in seen:
+            seen.add(word)
+            rules.append(word)
+    return rules
+
+
+def _spam_config(size: int) -> dict:
+    triggers = make_rules(max(1, size // 10), seed=3)
+    return {
+        "spam_commercial_triggers": triggers,
+        "spam_services": _SERVICES + make_rules(size - len(_SERVICES), seed=4),
+        "spam_emojis": _EMOJIS,
+        "spam_score_threshold": 4,
+    }
+
+
+# ──────────────────────────────────────────────────────────────
+# Вимірювання
+# ──────────────────────────────────────────────────────────────
+def _lazy(factory: Callable[[], object]) -> Callable[[], object]:
+    """Будує об'єкт при першому виклику — щоб _measure() записав це як build_ms."""
+    built = []
+
+    def get():
+        if not built:
+            built.append(factory())
+        return built[0]
+    return get
+
+
+def _cases(size: int) -> dict[str, tuple[Callable[[str], object], str]]:
+    """
+    {функція: (виклик на одне повідомлення, одиниця)}. clean_minus_words
+    і CompiledFilters.updated — на весь список правил.
+    """
+    rules = make_rules(size)
+    minus = make_rules(size, seed=5)
+    spam_config = _spam_config(size)
+    skip = rules[: size // 10]
+    config = {"keywords": rules, "minus_words": minus, **spam_config}
+    compiled = _lazy(lambda: CompiledFilters(config))
+    matcher = _lazy(lambda: KeywordMatcher(rules, minus))
+    keywords_changed = frozenset({"keywords"})
+    return {
+        "CompiledFilters.decide": (lambda text: compiled().decide(text).verdict == "queued", "msg/s"),
+        "KeywordMatcher.scan": (lambda text: matcher().scan(text)[0], "msg/s"),
+        "CompiledFilters.updated": (lambda text: compiled().updated(config, 1, keywords_changed), "calls/s"),
+        "find_keyword": (lambda text: find_keyword(text, rules), "msg/s"),
+        "has_minus_word": (lambda text: has_minus_word(text, minus), "msg/s"),
+        "is_service_spam": (lambda text: is_service_spam(text, spam_config), "msg/s"),
+        "clean_minus_words": (lambda text: clean_minus_words(minus, skip, rules), "calls/s"),
+    }
+
+
+def _measure(fn: Callable[[str], object], corpus: list[str], repeat: int) -> dict:
+    # Перший виклик будує автомат/скорер (lru_cache або CompiledFilters) — міряється окремо
+    started = time.perf_counter()
+    fn(corpus[0])
+    build = time.perf_counter() - started
+
+    best = float("inf")
+    hits = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hits = sum(1 for text in corpus if fn(text))
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for text in corpus:
+            fn(text)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(len(corpus) / best, 1) if best else None,
+        "us_per_op": round(best / len(corpus) * 1e6, 2),
+        "build_ms": round(build * 1000, 2),
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "alloc_retained_kb": round((current - before) / 1024, 1),
+        "hits": hits,
+    }
+
+
+def run(sizes: list[int], messages: int = 2000, repeat: int = 3, seed: int = 1) -> dict:
+    corpus = make_corpus(messages, seed)
+    results = []
+    for size in sizes:
+        for name, (fn, unit) in _cases(size).items():
+            # Операції над списком правил — корпус для них не потрібен
+            texts = corpus if unit == "msg/s" else corpus[: max(1, min(len(corpus), 20_000 // size))]
+            results.append({"function": name, "rules": size, "unit": unit, **_measure(fn, texts, repeat)})
+    return {"meta": _meta(messages, repeat, seed), "results": results}
+
+
+def _meta(messages: int, repeat: int, seed: int) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "messages": messages,
+        "repeat": repeat,
+        "seed": seed,
+    }
+
+
+# ──────────────────────────────────────────────────────────────
+# Вивід і порівняння
+# ──────────────────────────────────────────────────────────────
+def format_table(report: dict, baseline: dict | None = None) -> str:
+    old = {(r["function"], r["rules"]): r for r in (baseline or {}).get("results", [])}
+    lines = [f"{'функція':<24} {'правил':>7} {'оп/с':>12} {'мкс/оп':>9} {'збірка мс':>10} {'пік КБ':>9}"
+             + ("  Δ оп/с" if baseline else "")]
+    for r in report["results"]:
+        line = (f"{r['function']:<24} {r['rules']:>7} {r['ops_per_sec'] or 0:>12,.0f} "
+                f"{r['us_per_op']:>9.2f} {r['build_ms']:>10.2f} {r['alloc_peak_kb']:>9.1f}")
+        prev = old.get((r["function"], r["rules"]))
+        if prev and prev.get("ops_per_sec") and r["ops_per_sec"]:
+            line += f"  {(r['ops_per_sec'] / prev['ops_per_sec'] - 1) * 100:+.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Мікробенчмарки фільтрів")
+    parser.add_argument("--sizes", default="100,1000,10000", help="розміри наборів правил через кому")
+    parser.add_argument("--messages", type=int, default=2000, help="повідомлень у корпусі")
+    parser.add_argument("--repeat", type=int, default=3, help="повторів (береться найкращий)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, help="JSON з результатами (за замовчуванням benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="попередній JSON для порівняння")
+    args = parser.parse_args(argv)
+
+    report = run([int(s) for s in args.sizes.split(",") if s.strip()], args.messages, args.repeat, args.seed)
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+
+    out = args.out
+    if out is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        out = RESULTS_DIR / f"filters_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(format_table(report, baseline))
+    print(f"\n💾 {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
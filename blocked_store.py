@@ -0,0 +1,160 @@
+"""
+blocked_store.py — Сховище заблокованих повідомлень у SQLite (без залежності від Telethon).
+Повний текст, чат, ключове слово, бали/вердикт AI і час для /blocked: сторінки від
+новіших до старіших за ключем (id < …) — без OFFSET і без читання логів.
+Обсяг обмежений к-стю записів і віком.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+log = logging.getLogger("monitor")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocked (
+    id       INTEGER PRIMARY KEY,
+    ts       REAL    NOT NULL,
+    kind     TEXT    NOT NULL,
+    chat_id  INTEGER,
+    chat     TEXT    NOT NULL DEFAULT '',
+    keyword  TEXT    NOT NULL DEFAULT '',
+    reason   TEXT    NOT NULL DEFAULT '',
+    score    INTEGER,
+    text     TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocked_ts ON blocked (ts);
+CREATE INDEX IF NOT EXISTS blocked_chat ON blocked (chat_id, id);
+CREATE INDEX IF NOT EXISTS blocked_keyword ON blocked (keyword, id);
+"""
+
+
+class BlockedMessage(NamedTuple):
+    id: int
+    ts: float
+    kind: str  # local_blocked / ai_blocked
+    chat_id: Optional[int]
+    chat: str
+    keyword: str
+    reason: str
+    score: Optional[int]
+    text: str
+
+
+class BlockedStore:
+    """
+    add() лише буферизує; flush() пише пакет однією транзакцією в потоці й обрізає
+    таблицю до max_rows записів і max_age_days днів. Запити — синхронні, під lock
+    (з event loop — через asyncio.to_thread()).
+    """
+
+    def __init__(self, path: "str | Path", max_rows: int = 20000, max_age_days: int = 30,
+                 flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.flush_interval = flush_interval
+        self._buffer: list[tuple] = []
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # lower() у SQLite змінює регістр лише ASCII — для кирилиці потрібен Python
+        self._db.create_function("ulower", 1, lambda v: v.lower() if isinstance(v, str) else v,
+                                 deterministic=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def add(self, kind: str, chat_id, chat: str, keyword: str, text: str,
+            reason: str = "", score: Optional[int] = None, ts: Optional[float] = None) -> None:
+        self._buffer.append((time.time() if ts is None else ts, kind, chat_id, chat or "",
+                             (keyword or "").lower(), reason or "", score, text[:4000]))
+
+    # ── Запис ──
+    def _write(self, rows: list[tuple]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO blocked (ts, kind, chat_id, chat, keyword, reason, score, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._prune()
+
+    def _prune(self) -> None:
+        if self.max_age_days:
+            self._db.execute("DELETE FROM blocked WHERE ts < ?", (time.time() - self.max_age_days * 86400,))
+        if self.max_rows:
+            row = self._db.execute(
+                "SELECT id FROM blocked ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_rows,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM blocked WHERE id <= ?", row)
+
+    def flush_sync(self) -> None:
+        rows, self._buffer = self._buffer, []
+        if rows:
+            self._write(rows)
+
+    async def flush(self) -> None:
+        rows, self._buffer = self._buffer, []
+        if rows:
+            await asyncio.to_thread(self._write, rows)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                log.error(f"Помилка запису заблокованих: {exc}")
+
+    # ── Читання ──
+    def page(
+        self,
+        since: float = 0.0,
+        before_id: Optional[int] = None,
+        limit: int = 10,
+        chat: str = "",
+        keyword: str = "",
+        query: str = "",
+    ) -> list[BlockedMessage]:
+        """
+        Новіші спершу. Наступна сторінка — before_id = id останнього запису попередньої.
+        chat — id чату або частина назви, keyword — точне ключове слово, query — підрядок тексту.
+        """
+        where, params = ["ts >= ?"], [since]
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        if chat:
+            if chat.lstrip("-").isdigit():
+                where.append("chat_id = ?")
+                params.append(int(chat))
+            else:
+                where.append("instr(ulower(chat), ?) > 0")
+                params.append(chat.lower())
+        if keyword:
+            where.append("keyword = ?")
+            params.append(keyword.lower())
+        if query:
+            where.append("instr(ulower(text), ?) > 0")
+            params.append(query.lower())
+        sql = (
+            "SELECT id, ts, kind, chat_id, chat, keyword, reason, score, text FROM blocked "
+            f"WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit)).fetchall()
+        return [BlockedMessage(*row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM blocked").fetchone()[0]
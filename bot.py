@@ -4,12 +4,14 @@ bot.py — Telegram Bot: обробка черги, AI фільтрація, к
 """
 
 import asyncio
+import importlib
 import os
 import re
 import random
 import string
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from pathlib import Path
 from telethon import TelegramClient, events, Button
 from telethon.errors import FloodWaitError
@@ -22,35 +24,97 @@ from telethon.tl.types import (
     BotCommandScopeDefault,
 )
 
+from journal import COUNTERS, day_start
+from metrics import AI_LATENCY, FLOOD_WAIT_SECONDS, FLOOD_WAITS, STAGES
+from rules_store import RULE_KEYS
+
 log = logging.getLogger("bot")
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
     OPENAI_AVAILABLE = True
 except ImportError:
-    OpenAI = None
+    AsyncOpenAI = None
+    DefaultAsyncHttpxClient = None
     OPENAI_AVAILABLE = False
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
 
 # ──────────────────────────────────────────────────────────────
-# OpenAI синглтон
+# OpenAI синглтон (асинхронний клієнт + обмеження паралельних запитів)
 # ──────────────────────────────────────────────────────────────
 _openai_client = None
-_openai_key_used: str = ""
+_openai_settings: tuple = ()
+_ai_semaphore: asyncio.Semaphore | None = None
+_ai_semaphore_size = 0
+_closing_clients: set = set()
+
+
+def _ai_options(config) -> tuple[int, float, int]:
+    """(ai_max_concurrency, ai_timeout, ai_max_retries) з конфігу."""
+    return (
+        max(1, config.get("ai_max_concurrency", 4)),
+        float(config.get("ai_timeout", 30) or 30),
+        config.get("ai_max_retries", 2),
+    )
+
+
+def _http_limits(concurrency: int) -> dict:
+    """
+    {"limits": …} для пулу з'єднань — з того HTTP-пакета, з яким зібрано openai
+    (httpx у 1.x, httpx2 у 3.x); напряму цей пакет не імпортуємо. {} — ліміти SDK.
+    """
+    for cls in DefaultAsyncHttpxClient.__mro__:
+        if cls.__name__ == "AsyncClient":
+            transport = importlib.import_module(cls.__module__.partition(".")[0])
+            return {"limits": transport.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=60,
+            )}
+    return {}
 
 
-def get_openai_client(api_key: str):
-    global _openai_client, _openai_key_used
+def get_openai_client(api_key: str, config=None):
+    """
+    AsyncOpenAI поверх спільного DefaultAsyncHttpxClient: keep-alive пул на ai_max_concurrency
+    з'єднань, таймаут ai_timeout с, ai_max_retries повторів. Перестворюється лише
+    при зміні ключа чи цих параметрів (старий клієнт закривається у фоні).
+    """
+    global _openai_client, _openai_settings
     if not OPENAI_AVAILABLE:
         return None
-    if _openai_client is None or _openai_key_used != api_key:
-        _openai_client = OpenAI(api_key=api_key)
-        _openai_key_used = api_key
+    concurrency, timeout, retries = _ai_options(config or {})
+    settings = (api_key, concurrency, timeout, retries)
+    if _openai_client is None or _openai_settings != settings:
+        old = _openai_client
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=timeout,
+            max_retries=retries,
+            http_client=DefaultAsyncHttpxClient(timeout=timeout, **_http_limits(concurrency)),
+        )
+        _openai_settings = settings
+        if old is not None:
+            try:
+                task = asyncio.get_running_loop().create_task(old.close())
+            except RuntimeError:
+                pass
+            else:
+                _closing_clients.add(task)
+                task.add_done_callback(_closing_clients.discard)
     return _openai_client
 
 
+def _ai_slot(config) -> asyncio.Semaphore:
+    """Семафор на ai_max_concurrency одночасних запитів (новий — при зміні ліміту)."""
+    global _ai_semaphore, _ai_semaphore_size
+    size = _ai_options(config)[0]
+    if _ai_semaphore is None or _ai_semaphore_size != size:
+        _ai_semaphore = asyncio.Semaphore(size)
+        _ai_semaphore_size = size
+    return _ai_semaphore
+
+
 # ──────────────────────────────────────────────────────────────
 # Статистика AI
 # ──────────────────────────────────────────────────────────────
@@ -60,15 +124,15 @@ ai_stats = {"checked": 0, "passed": 0, "filtered": 0}
 # ──────────────────────────────────────────────────────────────
 # AI фільтрація
 # ──────────────────────────────────────────────────────────────
-async def ai_filter_message(text: str, keyword: str, chat_name: str, config: dict) -> bool:
-    """True = цільове (пропустити), False = спам/реклама (блокувати)."""
+async def ai_filter_message(text: str, keyword: str, chat_name: str, config: dict, journal=None) -> bool:
+    """True = цільове (пропустити), False = спам/реклама (блокувати). journal — лічильники ai_checked/ai_passed."""
     if not config.get("ai_filter_enabled", False):
         return True
 
     if not OPENAI_AVAILABLE or not OPENAI_API_KEY:
         return True
 
-    oc = get_openai_client(OPENAI_API_KEY)
+    oc = get_openai_client(OPENAI_API_KEY, config)
     if oc is None:
         return True
 
@@ -90,17 +154,30 @@ async def ai_filter_message(text: str, keyword: str, chat_name: str, config: dic
             "Відповідай одним словом: TARGET або SPAM."
         )
 
-        response = oc.responses.create(
-            model=config.get("openai_model", "gpt-4o-mini"),
-            instructions=ai_main_filter_role,
-            input=prompt,
-        )
+        async with _ai_slot(config):
+            started = time.perf_counter()
+            try:
+                response = await oc.responses.create(
+                    model=config.get("openai_model", "gpt-4o-mini"),
+                    instructions=ai_main_filter_role,
+                    input=prompt,
+                )
+            except Exception:
+                AI_LATENCY.observe(time.perf_counter() - started, "error")
+                raise
+            finally:
+                STAGES.observe("openai", time.perf_counter() - started)
 
         result = response.output_text.upper()
+        AI_LATENCY.observe(time.perf_counter() - started, "target" if "TARGET" in result else "spam")
         ai_stats["checked"] += 1
+        if journal is not None:
+            journal.count("ai_checked")
 
         if "TARGET" in result:
             ai_stats["passed"] += 1
+            if journal is not None:
+                journal.count("ai_passed")
             log.info(f"🤖 AI ПРОПУСТИВ: {text[:60]}…")
             return True
         else:
@@ -124,7 +201,7 @@ async def ai_extract_stop_words(text: str, config: dict) -> list[str]:
     if not OPENAI_AVAILABLE or not OPENAI_API_KEY:
         return []
 
-    oc = get_openai_client(OPENAI_API_KEY)
+    oc = get_openai_client(OPENAI_API_KEY, config)
     if oc is None:
         return []
 
@@ -147,11 +224,12 @@ async def ai_extract_stop_words(text: str, config: dict) -> list[str]:
             f"Повідомлення:\n{text[:500]}"
         )
 
-        response = oc.responses.create(
-            model=config.get("openai_model", "gpt-4o-mini"),
-            instructions="Ти — аналітик спам-контенту.",
-            input=prompt,
-        )
+        async with _ai_slot(config):
+            response = await oc.responses.create(
+                model=config.get("openai_model", "gpt-4o-mini"),
+                instructions="Ти — аналітик спам-контенту.",
+                input=prompt,
+            )
 
         raw = response.output_text.strip()
         if not raw or "NONE" in raw.upper():
@@ -190,7 +268,7 @@ async def ai_extract_keywords(text: str, config: dict) -> list[str]:
     if not OPENAI_AVAILABLE or not OPENAI_API_KEY:
         return []
 
-    oc = get_openai_client(OPENAI_API_KEY)
+    oc = get_openai_client(OPENAI_API_KEY, config)
     if oc is None:
         return []
 
@@ -213,11 +291,12 @@ async def ai_extract_keywords(text: str, config: dict) -> list[str]:
             f"Повідомлення:\n{text[:500]}"
         )
 
-        response = oc.responses.create(
-            model=config.get("openai_model", "gpt-4o-mini"),
-            instructions="Ти — аналітик цільового контенту.",
-            input=prompt,
-        )
+        async with _ai_slot(config):
+            response = await oc.responses.create(
+                model=config.get("openai_model", "gpt-4o-mini"),
+                instructions="Ти — аналітик цільового контенту.",
+                input=prompt,
+            )
 
         raw = response.output_text.strip()
         if not raw or "NONE" in raw.upper():
@@ -256,7 +335,7 @@ async def ai_consolidate_list(words: list[str], list_type: str, config: dict) ->
     if not OPENAI_AVAILABLE or not OPENAI_API_KEY:
         return words[:100]
 
-    oc = get_openai_client(OPENAI_API_KEY)
+    oc = get_openai_client(OPENAI_API_KEY, config)
     if oc is None:
         return words[:100]
 
@@ -287,11 +366,12 @@ async def ai_consolidate_list(words: list[str], list_type: str, config: dict) ->
             f"Поточний список ({len(words)} записів):\n{words_str}"
         )
 
-        response = oc.responses.create(
-            model=config.get("openai_model", "gpt-4o-mini"),
-            instructions="Ти — асистент для оптимізації списків слів.",
-            input=prompt,
-        )
+        async with _ai_slot(config):
+            response = await oc.responses.create(
+                model=config.get("openai_model", "gpt-4o-mini"),
+                instructions="Ти — асистент для оптимізації списків слів.",
+                input=prompt,
+            )
 
         raw = response.output_text.strip()
         if not raw:
@@ -329,7 +409,10 @@ async def safe_send(bot_client, destination, text: str, max_retries: int = 5) ->
             return
         except FloodWaitError as exc:
             wait = exc.seconds + 5
+            FLOOD_WAITS.inc("bot")
+            FLOOD_WAIT_SECONDS.inc("bot", amount=exc.seconds)
             log.warning(f"FloodWait: чекаю {wait}с… (спроба {attempt + 1}/{max_retries})")
+            STAGES.observe("flood_wait", wait)
             await asyncio.sleep(wait)
         except Exception as exc:
             log.error(f"Помилка відправки в {destination}: {exc}")
@@ -365,64 +448,193 @@ async def send_long_message(bot_client, destination, text: str, max_length: int
 # ──────────────────────────────────────────────────────────────
 # Фонова пересилка
 # ──────────────────────────────────────────────────────────────
-async def background_forwarder(bot_client, pending_messages, get_config_fn, load_config_fn, update_config_fn) -> None:
+def _render_forward(msg_data: dict, sender_name: str) -> str:
+    also_seen = msg_data.get("also_seen") or []
+    return (
+        f"🔔 Знайдено: **{msg_data['keyword']}**\n"
+        f"📢 Чат: {msg_data['chat']}\n"
+        + (f"👥 Також у {len(also_seen)} чат(ах): {', '.join(also_seen[:5])}"
+           f"{' …' if len(also_seen) > 5 else ''}\n" if also_seen else "")
+        + f"👤 Від: {sender_name or ''}\n\n"
+        f"💬 {msg_data['text']}\n\n"
+        f"🔗 {msg_data.get('link', '')}"
+    )
+
+
+def _render_digest(items: list[dict], group_by: str = "keyword", preview: int = 300) -> str:
+    """Один пост на кілька збігів, згрупованих за ключовим словом або чатом."""
+    other = "chat" if group_by == "keyword" else "keyword"
+    groups: dict[str, list[dict]] = {}
+    for item in items:
+        groups.setdefault(item[group_by], []).append(item)
+    lines = [f"📰 **Дайджест: {len(items)} повідомлень**"]
+    for name, group in sorted(groups.items(), key=lambda g: -len(g[1])):
+        lines.append("")
+        lines.append(f"{'🔔' if group_by == 'keyword' else '📢'} **{name}** ({len(group)})")
+        for item in group:
+            text = " ".join(item["text"].split())
+            if len(text) > preview:
+                text = text[:preview] + "…"
+            also = f" (+{len(item['also_seen'])} чат.)" if item.get("also_seen") else ""
+            lines.append(f"• {item[other]}{also} — {item.get('sender') or ''}: {text}")
+            if item.get("link"):
+                lines.append(f"  🔗 {item['link']}")
+    return "\n".join(lines)
+
+
+def _digest_active(config: dict, queue_depth: int) -> bool:
+    mode = config.get("digest_mode", "off")
+    if mode == "always":
+        return True
+    return mode == "auto" and queue_depth >= config.get("digest_auto_threshold", 30)
+
+
+async def _send_forward(bot_client, fwd_ch, forward_text: str, config: dict) -> None:
+    if config.get("ai_filter_enabled", False):
+        buttons = [
+            [Button.inline("✅ Цільове", data=b"target"),
+             Button.inline("🚫 Спам", data=b"spam")]
+        ]
+        for attempt in range(5):
+            try:
+                await bot_client.send_message(fwd_ch, forward_text, buttons=buttons)
+                break
+            except FloodWaitError as exc:
+                wait = exc.seconds + 5
+                FLOOD_WAITS.inc("bot")
+                FLOOD_WAIT_SECONDS.inc("bot", amount=exc.seconds)
+                log.warning(f"FloodWait: чекаю {wait}с… (спроба {attempt + 1}/5)")
+                STAGES.observe("flood_wait", wait)
+                await asyncio.sleep(wait)
+            except Exception as exc:
+                log.error(f"Помилка відправки в {fwd_ch}: {exc}")
+                break
+    else:
+        await safe_send(bot_client, fwd_ch, forward_text)
+
+
+def _observe_delivered(msg_data: dict) -> None:
+    """End-to-end: від отримання повідомлення в monitor() до посту в каналі."""
+    received_at = msg_data.get("received_at")
+    if received_at:
+        STAGES.observe("end_to_end", time.time() - received_at)
+
+
+async def _flush_digest(bot_client, pending_messages, digest: dict[str, list[dict]], config: dict,
+                        journal=None) -> None:
+    """Надсилає накопичене (один пост на канал, довгий — частинами) і підтверджує елементи черги."""
+    group_by = config.get("digest_group_by", "keyword")
+    for fwd_ch, items in list(digest.items()):
+        with STAGES.time("send"):
+            await send_long_message(bot_client, fwd_ch, _render_digest([i["data"] for i in items], group_by))
+        log.info(f"📰 Дайджест у {fwd_ch}: {len(items)} повідомлень")
+        for item in items:
+            _observe_delivered(item["data"])
+            if journal is not None:
+                data = item["data"]
+                journal.record("forwarded", data.get("chat_id"), data["keyword"], "digest", chat=data["chat"])
+            pending_messages.task_done(item["source"])
+        del digest[fwd_ch]
+
+
+async def background_forwarder(bot_client, pending_messages, get_config_fn,
+                               resolve_sender_fn=None, journal=None, blocked_store=None,
+                               near_duplicates=None) -> None:
+    """
+    Один пост на збіг (пауза 3 с між постами). У режимі дайджесту (digest_mode: always,
+    або auto — коли черга глибша за digest_auto_threshold) збіги накопичуються
+    до digest_max_items або digest_window секунд і йдуть одним постом.
+    """
     log.info("🔄 Запущено фонову пересилку повідомлень (бот)")
+    digest: dict[str, list[dict]] = {}  # канал → [{"data": …, "source": елемент черги}]
+    digest_started = 0.0
     while True:
+        msg_data = None
         try:
-            msg_data = await pending_messages.get()
+            config = await get_config_fn()
+            timeout = None
+            if digest:
+                elapsed = time.monotonic() - digest_started
+                timeout = max(config.get("digest_window", 60) - elapsed, 0)
+            try:
+                msg_data = await asyncio.wait_for(pending_messages.get(), timeout)
+            except asyncio.TimeoutError:
+                await _flush_digest(bot_client, pending_messages, digest, config, journal)
+                await asyncio.sleep(3)
+                continue
+            if msg_data.get("queued_at"):
+                STAGES.observe("queue_wait", time.time() - msg_data["queued_at"])
+            if near_duplicates is not None and msg_data.get("dedup_id"):
+                # Дублікати, що прийшли, поки елемент чекав у черзі, — «також у N чатах»
+                also_seen = near_duplicates.take(msg_data["dedup_id"])
+                if also_seen:
+                    msg_data["also_seen"] = also_seen
             config = await get_config_fn()
             fwd_ch = config.get("forward_channel")
 
             if not fwd_ch:
                 log.warning("Канал для пересилки не налаштовано!")
-                pending_messages.task_done()
+                if journal is not None:
+                    journal.record("dropped", msg_data.get("chat_id"), msg_data["keyword"], "no_channel",
+                                   chat=msg_data["chat"])
+                pending_messages.task_done(msg_data)
                 continue
 
-            forward_text = (
-                f"🔔 Знайдено: **{msg_data['keyword']}**\n"
-                f"📢 Чат: {msg_data['chat']}\n"
-                f"👤 Від: {msg_data['sender']}\n\n"
-                f"💬 {msg_data['text']}\n\n"
-                f"🔗 {msg_data.get('link', '')}"
-            )
-
             # AI фільтрація
-            if not await ai_filter_message(
-                msg_data['text'], msg_data['keyword'], msg_data['chat'], config
-            ):
+            with STAGES.time("ai_filter"):
+                passed = await ai_filter_message(
+                    msg_data['text'], msg_data['keyword'], msg_data['chat'], config, journal
+                )
+            if not passed:
                 log.info(f"🚫 AI відфільтрував повідомлення з {msg_data['chat']}")
-                pending_messages.task_done()
+                if journal is not None:
+                    journal.record("ai_blocked", msg_data.get("chat_id"), msg_data["keyword"], "ai",
+                                   chat=msg_data["chat"], text=msg_data["text"][:200])
+                if blocked_store is not None:
+                    blocked_store.add("ai_blocked", msg_data.get("chat_id"), msg_data["chat"],
+                                      msg_data["keyword"], msg_data["text"], reason="AI: спам")
+                pending_messages.task_done(msg_data)
                 continue
 
-            if config.get("ai_filter_enabled", False):
-                buttons = [
-                    [Button.inline("✅ Цільове", data=b"target"),
-                     Button.inline("🚫 Спам", data=b"spam")]
-                ]
-                for attempt in range(5):
-                    try:
-                        sent = await bot_client.send_message(fwd_ch, forward_text, buttons=buttons)
-                        break
-                    except FloodWaitError as exc:
-                        wait = exc.seconds + 5
-                        log.warning(f"FloodWait: чекаю {wait}с… (спроба {attempt + 1}/5)")
-                        await asyncio.sleep(wait)
-                    except Exception as exc:
-                        log.error(f"Помилка відправки в {fwd_ch}: {exc}")
-                        break
-            else:
-                await safe_send(bot_client, fwd_ch, forward_text)
+            # Відправник резолвиться лише тут — для повідомлень, що реально пересилаються
+            sender_name = msg_data.get("sender")
+            if sender_name is None and resolve_sender_fn:
+                with STAGES.time("resolve_sender"):
+                    sender_name = await resolve_sender_fn(msg_data.get("sender_id"), msg_data.get("sender_peer"))
+
+            # Дайджест: підтвердження елементів черги — лише після відправки посту
+            if digest or _digest_active(config, pending_messages.qsize()):
+                if not digest:
+                    digest_started = time.monotonic()
+                    log.info(f"📰 Режим дайджесту (черга: {pending_messages.qsize()})")
+                digest.setdefault(fwd_ch, []).append(
+                    {"data": {**msg_data, "sender": sender_name}, "source": msg_data}
+                )
+                msg_data = None
+                buffered = sum(len(items) for items in digest.values())
+                if (buffered >= config.get("digest_max_items", 20)
+                        or time.monotonic() - digest_started >= config.get("digest_window", 60)):
+                    await _flush_digest(bot_client, pending_messages, digest, config, journal)
+                    await asyncio.sleep(3)
+                continue
 
+            with STAGES.time("send"):
+                await _send_forward(bot_client, fwd_ch, _render_forward(msg_data, sender_name), config)
+            _observe_delivered(msg_data)
             log.info(f"✅ Переслано в {fwd_ch} з {msg_data['chat']}")
+            if journal is not None:
+                journal.record("forwarded", msg_data.get("chat_id"), msg_data["keyword"], chat=msg_data["chat"])
+            pending_messages.task_done(msg_data)  # ack одразу після відправки, а не після паузи
+            msg_data = None
             await asyncio.sleep(3)
-            pending_messages.task_done()
 
         except Exception as exc:
             log.error(f"Помилка в фоновій пересилці: {exc}")
-            try:
-                pending_messages.task_done()
-            except ValueError:
-                pass
+            if msg_data is not None:
+                try:
+                    pending_messages.task_done(msg_data)
+                except ValueError:
+                    pass
             await asyncio.sleep(5)
 
 # ──────────────────────────────────────────────────────────────
@@ -583,62 +795,135 @@ async def auto_promote_bot_in_channel(
 
 
 # ──────────────────────────────────────────────────────────────
-# Парсинг лог-файлів для статистики
+# Статистика з журналу подій (journal.py)
 # ──────────────────────────────────────────────────────────────
-LOGS_DIR = Path("logs")
-
-
-def _collect_log_stats(days: int = 1) -> dict:
-    """Збирає статистику з лог-файлів за останні N днів."""
-    stats = {"queued": 0, "forwarded": 0, "local_blocked": 0, "ai_blocked": 0}
-    cutoff = datetime.now() - timedelta(days=days)
+def _collect_stats(journal, days: int = 1) -> dict:
+    """Лічильники за останні N днів (з опівночі) — з агрегатів журналу, без читання файлів."""
+    if journal is None:
+        return dict.fromkeys(COUNTERS, 0)
+    return journal.summary(days)
+
+
+_PERIODS = {"тиждень": 7, "week": 7, "місяць": 30, "month": 30}
+_BLOCKED_FILTERS = {"чат": "chat", "chat": "chat", "слово": "keyword", "kw": "keyword", "до": "before", "before": "before"}
+
+
+def _parse_blocked_args(arg: str) -> tuple[int, dict]:
+    """«/blocked [дні] [чат:…] [слово:…] [до:id] [текст]» → (дні, фільтри для BlockedStore.page)."""
+    days, filters, words = 1, {}, []
+    for token in arg.split():
+        name, sep, value = token.partition(":")
+        if sep and name.lower() in _BLOCKED_FILTERS and value:
+            filters[_BLOCKED_FILTERS[name.lower()]] = value
+        elif not words and not filters and (token.isdigit() or token.lower() in _PERIODS):
+            days = int(token) if token.isdigit() else _PERIODS[token.lower()]
+        else:
+            words.append(token)
+    if "before" in filters:
+        before = filters.pop("before")
+        if before.isdigit():
+            filters["before_id"] = int(before)
+    if words:
+        filters["query"] = " ".join(words)
+    return days, filters
+
+
+def _format_blocked(rows, preview: int = 700) -> str:
+    lines = []
+    for row in rows:
+        icon = "🛑" if row.kind == "local_blocked" else "🤖"
+        when = datetime.fromtimestamp(row.ts).strftime("%m-%d %H:%M")
+        verdict = f"{row.score} б." if row.score is not None else (row.reason or "AI")
+        text = row.text if len(row.text) <= preview else row.text[:preview] + "…"
+        lines.append(
+            f"{icon} #{row.id} [{when}] {row.chat} · **{row.keyword}** · {verdict}\n{text}"
+        )
+    return "\n\n".join(lines)
 
-    for d in range(days + 1):
-        date_str = (datetime.now() - timedelta(days=d)).strftime("%Y-%m-%d")
 
-        # User logs
-        user_log = LOGS_DIR / f"user_{date_str}.log"
-        if user_log.exists():
-            for line in user_log.read_text(encoding="utf-8", errors="ignore").splitlines():
-                if "📥 Додано в чергу" in line:
-                    stats["queued"] += 1
-                elif "🛑 Локальний фільтр заблокував" in line:
-                    stats["local_blocked"] += 1
+_PERF_STAGES = (
+    "get_chat", "match", "spam_score", "dedup", "enqueue", "monitor",
+    "queue_wait", "ai_filter", "openai", "resolve_sender", "send", "flood_wait", "end_to_end",
+)
 
-        # Bot logs
-        bot_log = LOGS_DIR / f"bot_{date_str}.log"
-        if bot_log.exists():
-            for line in bot_log.read_text(encoding="utf-8", errors="ignore").splitlines():
-                if "✅ Переслано" in line:
-                    stats["forwarded"] += 1
-                elif "🤖 AI ЗАБЛОКУВАВ" in line:
-                    stats["ai_blocked"] += 1
 
-    return stats
+def _format_duration(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.1f} мс"
+    return f"{seconds:.2f} с"
 
 
-def _collect_blocked_messages(days: int = 1, limit: int = 30) -> list[str]:
-    """Збирає список заблокованих повідомлень з логів."""
-    blocked: list[str] = []
+def _format_perf(percentiles: dict[str, dict[str, float]]) -> str:
+    """Рядок на стадію: к-сть вимірів і p50 / p95 / p99 / max."""
+    stages = [s for s in _PERF_STAGES if s in percentiles] + sorted(set(percentiles) - set(_PERF_STAGES))
+    lines = []
+    for stage in stages:
+        p = percentiles[stage]
+        lines.append(
+            f"{'🏁' if stage == 'end_to_end' else '•'} **{stage}** ({p['count']}): "
+            f"{_format_duration(p['p50'])} / {_format_duration(p['p95'])} / "
+            f"{_format_duration(p['p99'])} / max {_format_duration(p['max'])}"
+        )
+    return "\n".join(lines)
 
-    for d in range(days + 1):
-        date_str = (datetime.now() - timedelta(days=d)).strftime("%Y-%m-%d")
 
-        # Локальний фільтр
-        user_log = LOGS_DIR / f"user_{date_str}.log"
-        if user_log.exists():
-            for line in user_log.read_text(encoding="utf-8", errors="ignore").splitlines():
-                if "🛑 Локальний фільтр заблокував" in line:
-                    blocked.append(f"🛑 [{date_str}] {line.split('Локальний фільтр заблокував: ', 1)[-1]}")
+def _format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f} с"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} хв"
+    return f"{seconds / 3600:.1f} год"
 
-        # AI фільтр
-        bot_log = LOGS_DIR / f"bot_{date_str}.log"
-        if bot_log.exists():
-            for line in bot_log.read_text(encoding="utf-8", errors="ignore").splitlines():
-                if "🤖 AI ЗАБЛОКУВАВ" in line:
-                    blocked.append(f"🤖 [{date_str}] {line.split('AI ЗАБЛОКУВАВ: ', 1)[-1]}")
 
-    return blocked[-limit:]  # останні N
+# ──────────────────────────────────────────────────────────────
+# Мутації конфігу: fn для mutate_config_fn (редагують свіжу копію під lock)
+# ──────────────────────────────────────────────────────────────
+def _set_value(key: str, value):
+    def apply(config: dict) -> None:
+        config[key] = value
+    return apply
+
+
+def _add_items(key: str, items, added: list | None = None, ignore_case: bool = True):
+    """Додає items у список key без дублів; фактично додані — в added."""
+    norm = str.lower if ignore_case else str
+    def apply(config: dict) -> None:
+        current = list(config.get(key, []))
+        seen = {norm(v) for v in current}
+        for item in items:
+            if norm(item) not in seen:
+                current.append(item)
+                seen.add(norm(item))
+                if added is not None:
+                    added.append(item)
+        if len(current) != len(config.get(key, [])):
+            config[key] = current
+    return apply
+
+
+def _remove_items(key: str, items, ignore_case: bool = True):
+    norm = str.lower if ignore_case else str
+    drop = {norm(i) for i in items}
+    def apply(config: dict) -> None:
+        if key in config:
+            config[key] = [v for v in config[key] if norm(v) not in drop]
+    return apply
+
+
+def _pop_index(key: str, index: int, removed: list):
+    def apply(config: dict) -> None:
+        items = config.get(key, [])
+        if 0 <= index < len(items):
+            removed.append(items.pop(index))
+    return apply
+
+
+def _replace_if_unchanged(key: str, expected, value):
+    """Заміна списку, лише якщо його не змінили, поки працював AI."""
+    def apply(config: dict) -> None:
+        if list(config.get(key, [])) == list(expected):
+            config[key] = value
+    return apply
 
 
 # ──────────────────────────────────────────────────────────────
@@ -649,10 +934,15 @@ def register_bot_handlers(
     user_client: TelegramClient,
     pending_messages,
     get_config_fn,
-    load_config_fn,
-    update_config_fn,
+    mutate_config_fn,
     is_admin_fn,
     clean_minus_words_fn,
+    chat_cache=None,
+    sender_cache=None,
+    rule_store=None,
+    near_duplicates=None,
+    journal=None,
+    blocked_store=None,
 ):
     """Реєструє всі хендлери на bot_client."""
 
@@ -671,6 +961,7 @@ def register_bot_handlers(
         BotCommand(command="get_channel", description="📢 Поточний канал"),
         BotCommand(command="add_word", description="🔍 Додати ключове слово"),
         BotCommand(command="del_word", description="🗑 Видалити ключове слово"),
+        BotCommand(command="fuzzy", description="🔤 Пошук з опечатками"),
         BotCommand(command="add_minus", description="🚫 Додати мінус-слово"),
         BotCommand(command="del_minus", description="🗑 Видалити мінус-слово"),
         BotCommand(command="add_skip", description="⏭ Додати skip-слово"),
@@ -685,6 +976,9 @@ def register_bot_handlers(
         BotCommand(command="spam_emojis", description="🛡 Показати/задати спам-емодзі"),
         BotCommand(command="spam_threshold", description="🎯 Поріг спам-фільтру"),
         BotCommand(command="queue_status", description="📊 Статус черги"),
+        BotCommand(command="perf", description="⏱ Затримки стадій"),
+        BotCommand(command="rule_stats", description="🗄 Сховище правил"),
+        BotCommand(command="cache_stats", description="🗂 Кеш чатів/відправників"),
         BotCommand(command="add_admin", description="👤 Додати адміна"),
         BotCommand(command="del_admin", description="🗑 Видалити адміна"),
         BotCommand(command="join_add", description="📥 Додати групи в чергу"),
@@ -760,18 +1054,12 @@ def register_bot_handlers(
             words = undo["words"]
 
             if words:
-                fresh = load_config_fn()
                 if action == "target":
-                    kw = fresh.get("keywords", [])
-                    words_lower = {w.lower() for w in words}
-                    fresh["keywords"] = [w for w in kw if w.lower() not in words_lower]
+                    await mutate_config_fn(_remove_items("keywords", words))
                     log.info(f"↩️ Відмінено ключові слова: {words}")
                 else:
-                    mw = fresh.get("minus_words", [])
-                    words_lower = {w.lower() for w in words}
-                    fresh["minus_words"] = [w for w in mw if w.lower() not in words_lower]
+                    await mutate_config_fn(_remove_items("minus_words", words))
                     log.info(f"↩️ Відмінено стоп-слова: {words}")
-                await update_config_fn(fresh)
                 await event.answer("↩️ Відмінено! Слова видалено з конфігу", alert=False)
             else:
                 await event.answer("↩️ Відмінено!", alert=False)
@@ -813,19 +1101,13 @@ def register_bot_handlers(
             new_words = await ai_extract_keywords(original_text, config)
             added = []
             if new_words:
-                fresh = load_config_fn()
-                kw = fresh.get("keywords", [])
-                kw_lower = {w.lower() for w in kw}
-                for w in new_words:
-                    if w.lower() not in kw_lower:
-                        kw.append(w)
-                        kw_lower.add(w.lower())
-                        added.append(w)
+                await mutate_config_fn(_add_items("keywords", new_words, added), added_by="ai:target")
                 if added:
-                    if len(kw) > 100:
-                        kw = await ai_consolidate_list(kw, "keywords", fresh)
-                    fresh["keywords"] = kw
-                    await update_config_fn(fresh)
+                    fresh = await get_config_fn()
+                    kw = list(fresh.get("keywords", []))
+                    if len(kw) > 100 and not fresh.get("rule_store"):
+                        consolidated = await ai_consolidate_list(kw, "keywords", fresh)
+                        await mutate_config_fn(_replace_if_unchanged("keywords", kw, consolidated))
                     added_str = ", ".join(f'"{w}"' for w in added)
                     log.info(f"✅ Додано ключові слова: {added_str}")
                     result_text = f"\n\n✅ **Додано ключові слова:** {added_str}"
@@ -848,19 +1130,13 @@ def register_bot_handlers(
             new_words = await ai_extract_stop_words(original_text, config)
             added = []
             if new_words:
-                fresh = load_config_fn()
-                mw = fresh.get("minus_words", [])
-                mw_lower = {w.lower() for w in mw}
-                for w in new_words:
-                    if w.lower() not in mw_lower:
-                        mw.append(w)
-                        mw_lower.add(w.lower())
-                        added.append(w)
+                await mutate_config_fn(_add_items("minus_words", new_words, added), added_by="ai:spam")
                 if added:
-                    if len(mw) > 100:
-                        mw = await ai_consolidate_list(mw, "minus_words", fresh)
-                    fresh["minus_words"] = mw
-                    await update_config_fn(fresh)
+                    fresh = await get_config_fn()
+                    mw = list(fresh.get("minus_words", []))
+                    if len(mw) > 100 and not fresh.get("rule_store"):
+                        consolidated = await ai_consolidate_list(mw, "minus_words", fresh)
+                        await mutate_config_fn(_replace_if_unchanged("minus_words", mw, consolidated))
                     added_str = ", ".join(f'"{w}"' for w in added)
                     log.info(f"🚫 Додано стоп-слова: {added_str}")
                     result_text = f"\n\n🚫 **Додано стоп-слова:** {added_str}"
@@ -888,12 +1164,13 @@ def register_bot_handlers(
     @bot_client.on(events.NewMessage(pattern=r'^/'))
     async def commands(event):
         global OPENAI_API_KEY
-        config = await get_config_fn()
+        config = await get_config_fn()  # лише читання; зміни — через mutate_config_fn
         sender = await event.get_sender()
         chat_username = getattr(sender, "username", "") or ""
 
         if not is_admin_fn(chat_username, config.get("admins", [])):
             return
+        actor = f"@{chat_username}"  # added_by для сховища правил
 
         # Встановити повне меню при першій взаємодії адміна
         await _ensure_admin_menu(event)
@@ -911,13 +1188,11 @@ def register_bot_handlers(
             if not OPENAI_API_KEY or OPENAI_API_KEY == "YOUR_OPENAI_API_KEY":
                 await event.reply("❌ Спочатку задай ключ: /ai_set_key sk-…")
                 return
-            config["ai_filter_enabled"] = True
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("ai_filter_enabled", True), added_by=actor)
             await event.reply("✅ AI фільтрація УВІМКНЕНА")
 
         elif cmd == "/ai_disable":
-            config["ai_filter_enabled"] = False
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("ai_filter_enabled", False), added_by=actor)
             await event.reply("🔴 AI фільтрація ВИМКНЕНА")
 
         elif cmd == "/ai_set_key":
@@ -937,32 +1212,35 @@ def register_bot_handlers(
                     "/ai_set_model gpt-4.1-mini (найточніше)"
                 )
                 return
-            config["openai_model"] = arg
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("openai_model", arg), added_by=actor)
             await event.reply(f"✅ Модель: {arg}")
 
         elif cmd == "/ai_status":
             enabled = config.get("ai_filter_enabled", False)
             key_ok = bool(OPENAI_API_KEY) and OPENAI_API_KEY != "YOUR_OPENAI_API_KEY"
 
-            # Статистика з логів
-            today = _collect_log_stats(1)
-            week = _collect_log_stats(7)
+            # Статистика з журналу подій
+            today = _collect_stats(journal, 1)
+            week = _collect_stats(journal, 7)
 
             await event.reply(
                 f"🤖 **AI фільтрація (OpenAI):**\n"
                 f"{'🟢 УВІМКНЕНА' if enabled else '🔴 ВИМКНЕНА'}\n"
                 f"🔑 Ключ: {'✅' if key_ok else '❌ не налаштовано'}\n"
                 f"🧠 Модель: {config.get('openai_model', 'gpt-4o-mini')}\n"
+                f"🚦 Паралельно: до {config.get('ai_max_concurrency', 4)} запитів | "
+                f"таймаут {config.get('ai_timeout', 30)} с | повторів {config.get('ai_max_retries', 2)}\n"
                 f"🎭 Роль: {'✅' if config.get('ai_main_filter_role') else '❌ не задано'}\n"
                 f"🎯 Критерії цільового: {'✅' if config.get('ai_tagret_filter_criteria') else '❌ не задано'}\n"
                 f"🛡 Критерії спаму: {'✅' if config.get('ai_spam_filter_criteria') else '❌ не задано'}\n\n"
                 f"📊 **Статистика сьогодні:**\n"
                 f"  📥 В чергу: {today['queued']} | ✅ Переслано: {today['forwarded']}\n"
-                f"  🛑 Локальний: {today['local_blocked']} | 🤖 AI: {today['ai_blocked']}\n\n"
+                f"  🛑 Локальний: {today['local_blocked']} | 🤖 AI: {today['ai_blocked']}\n"
+                f"  🧠 AI перевірено: {today['ai_checked']} | пропущено: {today['ai_passed']}\n\n"
                 f"📊 **За тиждень:**\n"
                 f"  📥 В чергу: {week['queued']} | ✅ Переслано: {week['forwarded']}\n"
-                f"  🛑 Локальний: {week['local_blocked']} | 🤖 AI: {week['ai_blocked']}"
+                f"  🛑 Локальний: {week['local_blocked']} | 🤖 AI: {week['ai_blocked']}\n"
+                f"  🧠 AI перевірено: {week['ai_checked']} | пропущено: {week['ai_passed']}"
             )
 
         elif cmd == "/ai_test":
@@ -977,8 +1255,7 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /ai_set_role <текст ролі AI>")
                 return
-            config["ai_main_filter_role"] = arg
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("ai_main_filter_role", arg), added_by=actor)
             await event.reply(f"✅ AI роль встановлено:\n{arg[:200]}")
 
         elif cmd == "/ai_get_role":
@@ -989,8 +1266,7 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /ai_set_target <критерії цільового повідомлення>")
                 return
-            config["ai_tagret_filter_criteria"] = arg
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("ai_tagret_filter_criteria", arg), added_by=actor)
             await event.reply(f"✅ Критерії ЦІЛЬОВОГО встановлено:\n{arg[:200]}")
 
         elif cmd == "/ai_get_target":
@@ -1001,8 +1277,7 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /ai_set_spam <критерії спаму>")
                 return
-            config["ai_spam_filter_criteria"] = arg
-            await update_config_fn(config)
+            await mutate_config_fn(_set_value("ai_spam_filter_criteria", arg), added_by=actor)
             await event.reply(f"✅ Критерії СПАМУ встановлено:\n{arg[:200]}")
 
         elif cmd == "/ai_get_spam":
@@ -1016,8 +1291,7 @@ def register_bot_handlers(
                 return
             try:
                 entity = await bot_client.get_entity(arg)
-                config["forward_channel"] = arg
-                await update_config_fn(config)
+                await mutate_config_fn(_set_value("forward_channel", arg), added_by=actor)
                 await event.reply(
                     f"✅ Канал: **{arg}**\n"
                     f"Назва: {getattr(entity, 'title', '?')}\n"
@@ -1035,24 +1309,16 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /add_admin @username")
                 return
-            admins = config.get("admins", [])
-            if arg.lower() in {a.lower() for a in admins}:
+            if not await mutate_config_fn(_add_items("admins", [arg]), added_by=actor):
                 await event.reply("⚠️ Адмін вже є")
             else:
-                admins.append(arg)
-                config["admins"] = admins
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано адміна: **{arg}**")
 
         elif cmd == "/del_admin":
             if "@" + chat_username.lower() == arg.lower():
                 await event.reply("❌ Не можна видалити себе")
                 return
-            admins = config.get("admins", [])
-            new_admins = [a for a in admins if a.lower() != arg.lower()]
-            if len(new_admins) < len(admins):
-                config["admins"] = new_admins
-                await update_config_fn(config)
+            if await mutate_config_fn(_remove_items("admins", [arg]), added_by=actor):
                 await event.reply(f"🗑 Видалено: **{arg}**")
             else:
                 await event.reply("❌ Адміна не знайдено")
@@ -1062,45 +1328,51 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /add_word <слово>")
                 return
-            kw = config.get("keywords", [])
-            if arg.lower() in {w.lower() for w in kw}:
+            if not await mutate_config_fn(_add_items("keywords", [arg]), added_by=actor):
                 await event.reply("⚠️ Вже є")
             else:
-                kw.append(arg)
-                config["keywords"] = kw
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано: **{arg}**")
 
         elif cmd == "/del_word":
-            kw = config.get("keywords", [])
-            new_kw = [w for w in kw if w.lower() != arg.lower()]
-            if len(new_kw) < len(kw):
-                config["keywords"] = new_kw
-                await update_config_fn(config)
+            if await mutate_config_fn(_remove_items("keywords", [arg]), added_by=actor):
                 await event.reply(f"🗑 Видалено: **{arg}**")
             else:
                 await event.reply("❌ Не знайдено")
 
+        # === Нечіткий пошук (опечатки) ===
+        elif cmd == "/fuzzy":
+            if arg in ("on", "off"):
+                await mutate_config_fn(_set_value("fuzzy_keywords_enabled", arg == "on"), added_by=actor)
+                await event.reply("✅ Пошук з опечатками УВІМКНЕНО" if arg == "on" else "🔴 Пошук з опечатками ВИМКНЕНО")
+            elif arg.isdigit():
+                await mutate_config_fn(_set_value("fuzzy_max_distance", int(arg)), added_by=actor)
+                await event.reply(f"✅ Допустимо опечаток: **{arg}**")
+            elif arg:
+                await event.reply("❌ /fuzzy on | off | <к-сть опечаток>")
+            else:
+                enabled = config.get("fuzzy_keywords_enabled", False)
+                overrides = config.get("fuzzy_keywords_overrides", {})
+                ov_lines = "\n".join(f"  • {w}: {d}" for w, d in overrides.items()) or "  (немає)"
+                await event.reply(
+                    f"🔤 **Пошук з опечатками:** {'🟢 УВІМКНЕНО' if enabled else '🔴 ВИМКНЕНО'}\n"
+                    f"📏 Допустимо опечаток: {config.get('fuzzy_max_distance', 1)}\n"
+                    f"⚙️ Винятки (fuzzy_keywords_overrides):\n{ov_lines}\n\n"
+                    f"/fuzzy on|off — увімкнути/вимкнути\n"
+                    f"/fuzzy <число> — к-сть опечаток"
+                )
+
         # === Мінус-слова ===
         elif cmd == "/add_minus":
             if not arg:
                 await event.reply("❌ /add_minus <слово>")
                 return
-            mw = config.get("minus_words", [])
-            if arg.lower() in {w.lower() for w in mw}:
+            if not await mutate_config_fn(_add_items("minus_words", [arg]), added_by=actor):
                 await event.reply("⚠️ Вже є")
             else:
-                mw.append(arg)
-                config["minus_words"] = mw
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано мінус-слово: **{arg}**")
 
         elif cmd == "/del_minus":
-            mw = config.get("minus_words", [])
-            new_mw = [w for w in mw if w.lower() != arg.lower()]
-            if len(new_mw) < len(mw):
-                config["minus_words"] = new_mw
-                await update_config_fn(config)
+            if await mutate_config_fn(_remove_items("minus_words", [arg]), added_by=actor):
                 await event.reply(f"🗑 Видалено: **{arg}**")
             else:
                 await event.reply("❌ Не знайдено")
@@ -1110,47 +1382,110 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /add_skip <слово>")
                 return
-            sw = config.get("skip_words", [])
-            if arg.lower() in {w.lower() for w in sw}:
+            if not await mutate_config_fn(_add_items("skip_words", [arg]), added_by=actor):
                 await event.reply("⚠️ Вже є")
             else:
-                sw.append(arg)
-                config["skip_words"] = sw
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано skip: **{arg}**")
 
         elif cmd == "/del_skip":
             if not arg:
                 await event.reply("❌ /del_skip <слово>")
                 return
-            sw = config.get("skip_words", [])
-            new_sw = [w for w in sw if w.lower() != arg.lower()]
-            if len(new_sw) < len(sw):
-                config["skip_words"] = new_sw
-                await update_config_fn(config)
+            if await mutate_config_fn(_remove_items("skip_words", [arg]), added_by=actor):
                 await event.reply(f"🗑 Видалено: **{arg}**")
             else:
                 await event.reply("❌ Не знайдено")
 
         # === Статус черги ===
         elif cmd == "/queue_status":
+            st = pending_messages.stats()
+            dropped = " | ".join(f"{p}: {n}" for p, n in st["dropped"].items())
             await event.reply(
                 f"📊 **Черга пересилки:**\n"
-                f"📥 У черзі: {pending_messages.qsize()} повідомлень\n"
-                f"📢 Канал: {config.get('forward_channel', 'не встановлено')}\n"
+                f"📥 У черзі: {st['size']} / {st['maxsize'] or '∞'} повідомлень\n"
+                f"⌛ Найстаріше чекає: {_format_age(st['oldest_age'])}\n"
+                f"🧯 Політика переповнення: {st['policy']}\n"
+                f"🗑 Відкинуто: {st['dropped_total']} ({dropped})\n"
+                + (
+                    f"💾 На диску: {st['spilled']} | без ack: {st['unacked']} | "
+                    f"відновлено при старті: {st['recovered']}\n"
+                    if st.get("durable") else ""
+                )
+                + (
+                    f"♻️ Дублікатів пропущено: {near_duplicates.duplicates} "
+                    f"(у вікні: {len(near_duplicates)})\n"
+                    if near_duplicates is not None else ""
+                )
+                + f"📢 Канал: {config.get('forward_channel', 'не встановлено')}\n"
+                f"📰 Дайджест: {config.get('digest_mode', 'off')} "
+                f"(поріг черги {config.get('digest_auto_threshold', 30)}, "
+                f"до {config.get('digest_max_items', 20)} шт / {config.get('digest_window', 60)} с)\n"
                 f"⏱ Затримка: 3 сек"
             )
 
+        # === Затримки стадій ===
+        elif cmd == "/perf":
+            minutes = int(arg) if arg.isdigit() and int(arg) > 0 else int(STAGES.window // 60)
+            percentiles = STAGES.percentiles(minutes * 60)
+            if not percentiles:
+                await event.reply(f"⏱ Немає вимірів за останні {minutes} хв")
+                return
+            await event.reply(
+                f"⏱ **Затримки за {minutes} хв** (к-сть: p50 / p95 / p99 / max):\n"
+                + _format_perf(percentiles)
+            )
+
+        # === Сховище правил ===
+        elif cmd == "/rule_stats":
+            if rule_store is None:
+                await event.reply("❌ Сховище правил вимкнено (config: \"rule_store\": \"data/rules.db\")")
+                return
+            key = {"kw": "keywords", "minus": "minus_words"}.get(arg, arg or "keywords")
+            if key not in RULE_KEYS:
+                await event.reply(f"❌ /rule_stats [{'|'.join(RULE_KEYS)}]")
+                return
+            counts = await asyncio.to_thread(rule_store.count)
+            top = await asyncio.to_thread(rule_store.top, key, 15)
+            lines = ["🗄 **Сховище правил:**"]
+            lines += [f"  • {k}: {n}" for k, n in counts.items()]
+            lines.append(f"\n🏆 **Топ {key} за спрацюваннями:**")
+            for value, hits, added_by, added_at in top:
+                when = datetime.fromtimestamp(added_at).strftime("%Y-%m-%d")
+                lines.append(f"  {hits:>5} × {value}  ({added_by or '—'}, {when})")
+            await send_long_message(bot_client, event.chat_id, "\n".join(lines))
+
+        # === Кеш чатів ===
+        elif cmd == "/cache_stats":
+            caches = [(title, c) for title, c in (("Чати", chat_cache), ("Відправники", sender_cache)) if c is not None]
+            if not caches:
+                await event.reply("❌ Кеш недоступний")
+                return
+            parts = []
+            for title, cache in caches:
+                st = cache.stats()
+                parts.append(
+                    f"🗂 **{title}:**\n"
+                    f"📦 Записів: {st['size']} / {st['maxsize']} (TTL {st['ttl']} с)\n"
+                    f"✅ Влучання: {st['hits']} | ❌ Промахи: {st['misses']}\n"
+                    f"🎯 Hit rate: {st['hit_rate']:.1%}\n"
+                    f"⌛ Прострочено: {st['expired']} | 🗑 Витіснено: {st['evictions']}"
+                )
+            await event.reply("\n\n".join(parts))
+
         # === Очищення minus_words ===
         elif cmd == "/clean_minus":
-            old = config.get("minus_words", [])
-            new = clean_minus_words_fn(old, config.get("skip_words", []), config.get("keywords", []))
-            diff = len(old) - len(new)
-            config["minus_words"] = new
-            await update_config_fn(config)
+            sizes = {}
+
+            def _clean(cfg: dict) -> None:
+                old = cfg.get("minus_words", [])
+                new = clean_minus_words_fn(old, cfg.get("skip_words", []), cfg.get("keywords", []))
+                sizes["old"], sizes["new"] = len(old), len(new)
+                cfg["minus_words"] = new
+
+            await mutate_config_fn(_clean, added_by=actor)
             await event.reply(
                 f"🧹 Очищено minus_words\n"
-                f"Було: {len(old)} | Стало: {len(new)} | Видалено: {diff}"
+                f"Було: {sizes['old']} | Стало: {sizes['new']} | Видалено: {sizes['old'] - sizes['new']}"
             )
 
         # === Список налаштувань ===
@@ -1162,6 +1497,10 @@ def register_bot_handlers(
             adm = "\n".join(f"  • {a}" for a in config.get("admins", [])) or "  (пусто)"
             ch = config.get("forward_channel", "не встановлено")
             ai_st = "🟢 УВІМКНЕНА" if config.get("ai_filter_enabled") else "🔴 ВИМКНЕНА"
+            fuzzy_st = (
+                f"🟢 УВІМКНЕНО (опечаток: {config.get('fuzzy_max_distance', 1)})"
+                if config.get("fuzzy_keywords_enabled") else "🔴 ВИМКНЕНО"
+            )
 
             # Евристичний фільтр
             triggers = "\n".join(f"  • {t}" for t in config.get("spam_commercial_triggers", [])) or "  (пусто)"
@@ -1175,6 +1514,7 @@ def register_bot_handlers(
                 f"📢 Канал пересилки: {ch}\n\n"
                 f"🤖 AI фільтрація: {ai_st}\n\n"
                 f"🔍 Ключові слова:\n{kw}\n\n"
+                f"🔤 Пошук з опечатками: {fuzzy_st}\n\n"
                 f"🚫 Мінус-слова:\n{mw}\n\n"
                 f"⏭️ Skip-слова:\n{sw}\n\n"
                 f"🛡 **Евристичний фільтр** (поріг: {threshold}):\n\n"
@@ -1198,13 +1538,11 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /add_trigger <regex патерн>")
                 return
-            triggers = config.get("spam_commercial_triggers", [])
-            if arg in triggers:
+            if not await mutate_config_fn(
+                _add_items("spam_commercial_triggers", [arg], ignore_case=False), added_by=actor
+            ):
                 await event.reply("⚠️ Вже є")
             else:
-                triggers.append(arg)
-                config["spam_commercial_triggers"] = triggers
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано тригер: `{arg}`")
 
         elif cmd == "/del_trigger":
@@ -1214,15 +1552,13 @@ def register_bot_handlers(
             triggers = config.get("spam_commercial_triggers", [])
             # Дозволити видалення за номером або текстом
             if arg.isdigit() and 1 <= int(arg) <= len(triggers):
-                removed = triggers.pop(int(arg) - 1)
-                config["spam_commercial_triggers"] = triggers
-                await update_config_fn(config)
-                await event.reply(f"🗑 Видалено тригер: `{removed}`")
+                removed = []
+                await mutate_config_fn(_pop_index("spam_commercial_triggers", int(arg) - 1, removed), added_by=actor)
+                await event.reply(f"🗑 Видалено тригер: `{removed[0]}`" if removed else "❌ Не знайдено")
             else:
-                new_t = [t for t in triggers if t != arg]
-                if len(new_t) < len(triggers):
-                    config["spam_commercial_triggers"] = new_t
-                    await update_config_fn(config)
+                if await mutate_config_fn(
+                    _remove_items("spam_commercial_triggers", [arg], ignore_case=False), added_by=actor
+                ):
                     await event.reply(f"🗑 Видалено: `{arg}`")
                 else:
                     await event.reply("❌ Не знайдено")
@@ -1239,13 +1575,9 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /add_service <назва>")
                 return
-            services = config.get("spam_services", [])
-            if arg.lower() in {s.lower() for s in services}:
+            if not await mutate_config_fn(_add_items("spam_services", [arg.lower()]), added_by=actor):
                 await event.reply("⚠️ Вже є")
             else:
-                services.append(arg.lower())
-                config["spam_services"] = services
-                await update_config_fn(config)
                 await event.reply(f"✅ Додано сервіс: **{arg}**")
 
         elif cmd == "/del_service":
@@ -1254,23 +1586,18 @@ def register_bot_handlers(
                 return
             services = config.get("spam_services", [])
             if arg.isdigit() and 1 <= int(arg) <= len(services):
-                removed = services.pop(int(arg) - 1)
-                config["spam_services"] = services
-                await update_config_fn(config)
-                await event.reply(f"🗑 Видалено: **{removed}**")
+                removed = []
+                await mutate_config_fn(_pop_index("spam_services", int(arg) - 1, removed), added_by=actor)
+                await event.reply(f"🗑 Видалено: **{removed[0]}**" if removed else "❌ Не знайдено")
             else:
-                new_s = [s for s in services if s.lower() != arg.lower()]
-                if len(new_s) < len(services):
-                    config["spam_services"] = new_s
-                    await update_config_fn(config)
+                if await mutate_config_fn(_remove_items("spam_services", [arg]), added_by=actor):
                     await event.reply(f"🗑 Видалено: **{arg}**")
                 else:
                     await event.reply("❌ Не знайдено")
 
         elif cmd == "/spam_emojis":
             if arg:
-                config["spam_emojis"] = arg
-                await update_config_fn(config)
+                await mutate_config_fn(_set_value("spam_emojis", arg), added_by=actor)
                 await event.reply(f"✅ Спам-емодзі встановлено: {arg}")
             else:
                 emojis = config.get("spam_emojis", "")
@@ -1280,8 +1607,7 @@ def register_bot_handlers(
             if arg:
                 try:
                     val = int(arg)
-                    config["spam_score_threshold"] = val
-                    await update_config_fn(config)
+                    await mutate_config_fn(_set_value("spam_score_threshold", val), added_by=actor)
                     await event.reply(f"✅ Поріг спам-фільтру: **{val}**")
                 except ValueError:
                     await event.reply("❌ Вкажи число: /spam_threshold 4")
@@ -1321,19 +1647,12 @@ def register_bot_handlers(
                 await event.reply("❌ Групи мають починатися з @")
                 return
 
-            queue = config.get("join_queue", [])
-            q_lower = {g.lower() for g in queue}
-            added, skipped = [], []
-            for g in new_groups:
-                if g.lower() not in q_lower:
-                    queue.append(g)
-                    q_lower.add(g.lower())
-                    added.append(g)
-                else:
-                    skipped.append(g)
-
-            config["join_queue"] = queue
-            await update_config_fn(config)
+            added = []
+            await mutate_config_fn(_add_items("join_queue", new_groups, added), added_by=actor)
+            skipped = list(new_groups)
+            for g in added:
+                skipped.remove(g)
+            queue = (await get_config_fn()).get("join_queue", [])
 
             msg = ""
             if added:
@@ -1347,11 +1666,7 @@ def register_bot_handlers(
             if not arg:
                 await event.reply("❌ /join_del @група")
                 return
-            queue = config.get("join_queue", [])
-            new_q = [g for g in queue if g.lower() != arg.lower()]
-            if len(new_q) < len(queue):
-                config["join_queue"] = new_q
-                await update_config_fn(config)
+            if await mutate_config_fn(_remove_items("join_queue", [arg]), added_by=actor):
                 await event.reply(f"🗑 Видалено: **{arg}**")
             else:
                 await event.reply("❌ Не знайдено в черзі")
@@ -1384,9 +1699,7 @@ def register_bot_handlers(
                         failed.append(f"{group} — {exc}")
                         await safe_send(bot_client, event.chat_id, f"❌ [{i}/{len(queue)}] Помилка: {group}\n{exc}")
                     await asyncio.sleep(15)
-                fresh = load_config_fn()
-                fresh["join_queue"] = [g for g in fresh.get("join_queue", []) if g not in success]
-                await update_config_fn(fresh)
+                await mutate_config_fn(_remove_items("join_queue", success, ignore_case=False), added_by=actor)
                 msg_result = f"🏁 **Готово!**\n✅ Вступив: {len(success)}\n❌ Помилок: {len(failed)}"
                 if failed:
                     msg_result += "\n\n❌ Не вдалось:\n" + "\n".join(f"  • {f}" for f in failed)
@@ -1407,7 +1720,7 @@ def register_bot_handlers(
             )
             await send_long_message(bot_client, event.chat_id, f"📋 **Групи ({len(groups)}):**\n\n{lines}")
 
-        # === Статистика з логів ===
+        # === Статистика з журналу подій ===
         elif cmd == "/stats":
             # /stats або /stats 7 або /stats 30
             days = 1
@@ -1419,8 +1732,7 @@ def register_bot_handlers(
                 elif arg.isdigit():
                     days = int(arg)
 
-            await event.reply(f"⏳ Збираю статистику за {days} днів…")
-            s = _collect_log_stats(days)
+            s = _collect_stats(journal, days)
             total = s['queued'] + s['local_blocked']
             total_blocked = s['local_blocked'] + s['ai_blocked']
 
@@ -1431,29 +1743,44 @@ def register_bot_handlers(
                 f"✅ Переслано в канал: **{s['forwarded']}**\n\n"
                 f"❌ **Заблоковано всього: {total_blocked}**\n"
                 f"  🛑 Локальний фільтр: {s['local_blocked']}\n"
-                f"  🤖 AI фільтр: {s['ai_blocked']}\n\n"
+                f"  🤖 AI фільтр: {s['ai_blocked']} (перевірено AI: {s['ai_checked']})\n"
+                f"🗑 Відкинуто (дублікати, переповнення черги): {s['dropped']}\n\n"
                 f"📝 Всього оброблено: {total + s['ai_blocked']}\n\n"
-                f"/blocked — список заблокованих"
             )
+            if days == 1 and journal is not None:
+                hours = journal.counters.hours(24)
+                text_out += (
+                    f"🕐 Переслано по годинах ({hours[0][0][-2:]}:00 → зараз):\n"
+                    f"`{' '.join(str(h.get('forwarded', 0)) for _, h in hours)}`\n\n"
+                )
+            text_out += "/blocked — список заблокованих"
             await event.reply(text_out)
 
         elif cmd == "/blocked":
-            days = 1
-            if arg:
-                if arg in ("тиждень", "week", "7"):
-                    days = 7
-                elif arg in ("місяць", "month", "30"):
-                    days = 30
-                elif arg.isdigit():
-                    days = int(arg)
-
-            blocked = _collect_blocked_messages(days, limit=50)
-            if not blocked:
-                await event.reply(f"✅ За {days} днів немає заблокованих повідомлень")
-            else:
-                lines = "\n".join(blocked)
-                header = f"🚫 **Заблоковано за {days} днів ({len(blocked)}):**\n\n"
-                await send_long_message(bot_client, event.chat_id, header + lines)
+            if blocked_store is None:
+                await event.reply("❌ Сховище заблокованих недоступне")
+                return
+            days, filters = _parse_blocked_args(arg)
+            page_size = 10
+            rows = await asyncio.to_thread(
+                blocked_store.page, since=day_start(days), limit=page_size, **filters
+            )
+            if not rows:
+                more = " за цим фільтром" if filters else ""
+                await event.reply(f"✅ За {days} днів немає заблокованих повідомлень{more}")
+                return
+            header = f"🚫 **Заблоковано за {days} днів** (новіші спершу):\n\n"
+            footer = ""
+            if len(rows) == page_size:
+                next_arg = " ".join(
+                    [str(days)]
+                    + [f"чат:{filters['chat']}"] * ("chat" in filters)
+                    + [f"слово:{filters['keyword']}"] * ("keyword" in filters)
+                    + [f"до:{rows[-1].id}"]
+                    + [filters["query"]] * ("query" in filters)
+                )
+                footer = f"\n\n➡️ Далі: `/blocked {next_arg}`"
+            await send_long_message(bot_client, event.chat_id, header + _format_blocked(rows) + footer)
 
         elif cmd == "/help" or cmd == "/start":
             help_text = (
@@ -1477,10 +1804,14 @@ def register_bot_handlers(
                 "📢 **Канал:**\n"
                 "/set_channel @к — встановити\n"
                 "/get_channel — поточний\n"
-                "/queue_status — статус черги\n\n"
+                "/queue_status — статус черги\n"
+                "/perf [хв] — затримки стадій (p50/p95/p99)\n"
+                "/cache_stats — кеш чатів і відправників (hit/miss)\n"
+                "/rule_stats [вид] — сховище правил: к-сть, топ спрацювань\n\n"
                 "🔍 **Ключові слова:**\n"
                 "/add_word [слово] — додати\n"
-                "/del_word [слово] — видалити\n\n"
+                "/del_word [слово] — видалити\n"
+                "/fuzzy [on|off|число] — пошук з опечатками\n\n"
                 "🚫 **Мінус-слова:**\n"
                 "/add_minus [слово] — додати\n"
                 "/del_minus [слово] — видалити\n"
@@ -1507,7 +1838,7 @@ def register_bot_handlers(
                 "⚙️ **Інше:**\n"
                 "/groups — всі групи\n"
                 "/stats [дні] — статистика (сьогодні/7/30)\n"
-                "/blocked [дні] — список заблокованих\n"
+                "/blocked [дні] [чат:…] [слово:…] [текст] — заблоковані (новіші спершу)\n"
                 "/list — всі налаштування\n"
                 "/help — ця довідка"
             )
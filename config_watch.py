@@ -0,0 +1,252 @@
+"""
+config_watch.py — Гаряче перезавантаження config/config.json (без залежності від Telethon).
+Стежить за файлом через inotify (Linux, ctypes) або опитуванням mtime,
+перевіряє новий конфіг і формує читабельний diff для логу.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from dedup import MODES as DEDUP_MODES
+from message_queue import POLICIES as QUEUE_POLICIES
+
+log = logging.getLogger("monitor")
+
+# ──────────────────────────────────────────────────────────────
+# Перевірка конфігу
+# ──────────────────────────────────────────────────────────────
+_STR_LIST_KEYS = (
+    "keywords", "minus_words", "skip_words", "admins", "join_queue",
+    "spam_commercial_triggers", "spam_services",
+)
+_STR_KEYS = (
+    "forward_channel", "openai_model", "spam_emojis", "rule_store", "queue_path", "blocked_store", "metrics_host",
+    "ai_main_filter_role", "ai_tagret_filter_criteria", "ai_spam_filter_criteria",
+)
+_BOOL_KEYS = ("ai_filter_enabled", "fuzzy_keywords_enabled")
+_INT_KEYS = (
+    "spam_score_threshold", "fuzzy_max_distance",
+    "chat_cache_size", "chat_cache_ttl", "sender_cache_size", "sender_cache_ttl",
+    "queue_max_size", "queue_memory_budget_kb", "dedup_window", "dedup_max_entries",
+    "digest_window", "digest_max_items", "digest_auto_threshold", "journal_retention_days",
+    "blocked_max_rows", "blocked_retention_days", "metrics_port",
+    "ai_max_concurrency", "ai_max_retries",
+)
+_NUMBER_KEYS = ("ai_timeout",)
+_CHOICE_KEYS = {
+    "digest_mode": ("off", "auto", "always"),
+    "digest_group_by": ("keyword", "chat"),
+}
+
+
+def validate_config(data) -> list[str]:
+    """Список помилок (порожній — конфіг коректний)."""
+    if not isinstance(data, dict):
+        return ["конфіг має бути JSON-об'єктом"]
+    errors = []
+    for key in _STR_LIST_KEYS:
+        value = data.get(key, [])
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            errors.append(f"{key}: очікується список рядків")
+    for key in _STR_KEYS:
+        if not isinstance(data.get(key, ""), str):
+            errors.append(f"{key}: очікується рядок")
+    for key in _BOOL_KEYS:
+        if not isinstance(data.get(key, False), bool):
+            errors.append(f"{key}: очікується true/false")
+    for key in _INT_KEYS:
+        value = data.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            errors.append(f"{key}: очікується невід'ємне ціле число")
+    for key in _NUMBER_KEYS:
+        value = data.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            errors.append(f"{key}: очікується невід'ємне число")
+    overrides = data.get("fuzzy_keywords_overrides", {})
+    if not isinstance(overrides, dict) or not all(
+        isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in overrides.values()
+    ):
+        errors.append("fuzzy_keywords_overrides: очікується {\"слово\": число}")
+    priorities = data.get("keyword_priorities", {})
+    if not isinstance(priorities, dict) or not all(
+        isinstance(v, int) and not isinstance(v, bool) for v in priorities.values()
+    ):
+        errors.append("keyword_priorities: очікується {\"слово\": число}")
+    if data.get("queue_overflow_policy", "drop_oldest") not in QUEUE_POLICIES:
+        errors.append(f"queue_overflow_policy: одне з {', '.join(QUEUE_POLICIES)}")
+    if data.get("dedup_mode", "annotate") not in DEDUP_MODES:
+        errors.append(f"dedup_mode: одне з {', '.join(DEDUP_MODES)}")
+    for key, choices in _CHOICE_KEYS.items():
+        if key in data and data[key] not in choices:
+            errors.append(f"{key}: одне з {', '.join(choices)}")
+    threshold = data.get("dedup_threshold", 0.8)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 < threshold <= 1:
+        errors.append("dedup_threshold: очікується число від 0 до 1")
+    triggers = data.get("spam_commercial_triggers", [])
+    if isinstance(triggers, list):
+        for pattern in triggers:
+            try:
+                re.compile(str(pattern), re.IGNORECASE)
+            except re.error as exc:
+                errors.append(f"spam_commercial_triggers: некоректний regex {pattern!r}: {exc}")
+    return errors
+
+
+def diff_config(old: Mapping, new: Mapping, limit: int = 10) -> list[str]:
+    """Рядки змін між двома конфігами: +/- для елементів списків, old → new для значень."""
+    lines = []
+    for key in sorted(set(old) | set(new)):
+        a, b = old.get(key), new.get(key)
+        if a == b:
+            continue
+        if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+            added = [v for v in b if v not in a]
+            removed = [v for v in a if v not in b]
+            for sign, items in (("+", added), ("-", removed)):
+                if items:
+                    shown = ", ".join(map(str, items[:limit]))
+                    more = f" … (+{len(items) - limit})" if len(items) > limit else ""
+                    lines.append(f"{key} {sign}{len(items)}: {shown}{more}")
+            if not added and not removed:
+                lines.append(f"{key}: змінено порядок")
+        elif key not in old:
+            lines.append(f"{key}: додано = {b!r}")
+        elif key not in new:
+            lines.append(f"{key}: видалено (було {a!r})")
+        else:
+            lines.append(f"{key}: {a!r} → {b!r}")
+    return lines
+
+
+# ──────────────────────────────────────────────────────────────
+# inotify через ctypes (лише Linux)
+# ──────────────────────────────────────────────────────────────
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Мінімальна обгортка inotify: спостереження за каталогом, неблокуюче читання подій."""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify недоступний")
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch")
+
+    def read_names(self) -> list[str]:
+        """Імена файлів з усіх подій, що накопичились (без блокування)."""
+        names = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(buf):
+                _, _, _, length = _EVENT_HEADER.unpack_from(buf, pos)
+                pos += _EVENT_HEADER.size
+                names.append(buf[pos:pos + length].rstrip(b"\0").decode(errors="replace"))
+                pos += length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+# ──────────────────────────────────────────────────────────────
+# Спостерігач за файлом конфігу
+# ──────────────────────────────────────────────────────────────
+class ConfigWatcher:
+    """
+    Викликає on_change() після зміни файлу. Серію подій (запис + rename)
+    об'єднує за debounce секунд. inotify — якщо доступний, інакше опитування mtime.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        on_change: Callable[[], Awaitable[None]],
+        poll_interval: float = 2.0,
+        debounce: float = 0.5,
+    ):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mode = ""
+        self._changed = asyncio.Event()
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    async def _poll(self) -> None:
+        last = self._signature()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._signature()
+            if current != last:
+                last = current
+                self._changed.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        inotify = None
+        try:
+            inotify = _Inotify(self.path.parent)
+        except (OSError, AttributeError) as exc:
+            log.info(f"👁 inotify недоступний ({exc}) — опитування mtime кожні {self.poll_interval} с")
+
+        if inotify is not None:
+            self.mode = "inotify"
+            name = self.path.name
+
+            def _on_readable():
+                if name in inotify.read_names():
+                    self._changed.set()
+
+            loop.add_reader(inotify.fd, _on_readable)
+            poller = None
+        else:
+            self.mode = "poll"
+            poller = asyncio.create_task(self._poll())
+
+        log.info(f"👁 Стежу за {self.path} ({self.mode})")
+        try:
+            while True:
+                await self._changed.wait()
+                await asyncio.sleep(self.debounce)
+                self._changed.clear()
+                try:
+                    await self.on_change()
+                except Exception as exc:
+                    log.error(f"Помилка перезавантаження конфігу: {exc}")
+        finally:
+            if inotify is not None:
+                loop.remove_reader(inotify.fd)
+                inotify.close()
+            if poller is not None:
+                poller.cancel()
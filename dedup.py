@@ -0,0 +1,216 @@
+"""
+dedup.py — Виявлення майже-дублікатів повідомлень (без залежності від Telethon).
+MinHash-підписи по символьних шинглах + LSH-індекс (смуги підпису) у ковзному вікні:
+перевірка нового повідомлення — кілька звернень до словника незалежно від
+кількості запам'ятованих повідомлень. Пам'ять обмежена max_entries.
+"""
+
+import random
+import time
+import zlib
+from collections import deque
+from typing import Iterable, Optional
+
+from filters import NormalizedMessage, as_message
+
+MODES = ("off", "drop", "annotate")
+
+_PRIME = (1 << 61) - 1
+
+
+def shingles(tokens: list[str], k: int = 5) -> set[str]:
+    """
+    Символьні k-грами нормалізованого тексту (слова через пробіл): заміна одного
+    символу зачіпає лише k шинглів, тож дрібні правки мало знижують подібність.
+    """
+    text = " ".join(tokens)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """
+    num_perm універсальних хеш-функцій (a·x + b) mod p; однакові параметри — порівнювані
+    підписи. Шингли хешуються crc32, а не hash(): підписи однакові в різних процесах.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rnd = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: Iterable[str]) -> tuple[int, ...]:
+        hashes = [zlib.crc32(s.encode()) for s in items]
+        if not hashes:
+            return ()
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._params)
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Оцінка подібності Жаккара за двома підписами."""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class SeenMessage:
+    """Запам'ятоване повідомлення: підпис, де бачили, і (поки в черзі) id елемента черги."""
+
+    __slots__ = ("key", "signature", "seen_at", "chats", "pending_id")
+
+    def __init__(self, key: int, signature: tuple[int, ...], seen_at: float, chat: str,
+                 pending_id: Optional[str] = None):
+        self.key = key
+        self.signature = signature
+        self.seen_at = seen_at
+        self.chats = [chat]
+        self.pending_id = pending_id
+
+
+class NearDuplicateIndex:
+    """
+    Ковзне вікно window секунд / max_entries повідомлень (0 — без обмеження). bands × rows = num_perm:
+    кандидати — повідомлення зі збігом хоча б однієї смуги, дублікат — кандидат
+    з оцінкою подібності ≥ threshold.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        window: float = 3600,
+        max_entries: int = 5000,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm має ділитися на bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._entries: deque[SeenMessage] = deque()
+        self._buckets: dict[tuple, list[SeenMessage]] = {}
+        self._pending: dict[str, SeenMessage] = {}  # ще в черзі пересилки: id елемента → запис
+        self._next_key = 0
+        self.checked = 0
+        self.duplicates = 0
+        self.threshold = threshold
+        self.window = window
+        self.max_entries = max_entries
+
+    def configure(self, threshold: float, window: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.max_entries = max_entries
+        self._expire(time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple]:
+        r = self.rows
+        return [(i, signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries and (
+            (self.max_entries and len(entries) > self.max_entries)
+            or now - entries[0].seen_at > self.window
+        ):
+            self._unlink(entries.popleft())
+
+    def _unlink(self, old: SeenMessage) -> None:
+        if old.pending_id is not None:
+            self._pending.pop(old.pending_id, None)
+        for band in self._band_keys(old.signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.remove(old)
+                if not bucket:
+                    del self._buckets[band]
+
+    def signature(self, text: "str | NormalizedMessage") -> tuple[int, ...]:
+        return self.hasher.signature(shingles(as_message(text).tokens))
+
+    def check(
+        self,
+        text: "str | NormalizedMessage",
+        chat: str,
+        pending_id: Optional[str] = None,
+        signature: Optional[tuple[int, ...]] = None,
+    ) -> Optional[SeenMessage]:
+        """
+        Повертає раніше бачене схоже повідомлення (і додає chat до його списку)
+        або запам'ятовує це й повертає None. pending_id — id елемента черги,
+        для якого пересилка згодом забере список чатів через take(). signature —
+        підпис, уже обчислений деінде (напр. в іншому процесі тим самим num_perm).
+        """
+        now = time.monotonic()
+        self._expire(now)
+        self.checked += 1
+        if signature is None:
+            signature = self.signature(text)
+        if not signature:
+            return None
+        bands = self._band_keys(signature)
+
+        best, best_sim = None, self.threshold
+        seen = set()
+        for band in bands:
+            for candidate in self._buckets.get(band, ()):
+                if candidate.key in seen:
+                    continue
+                seen.add(candidate.key)
+                sim = similarity(signature, candidate.signature)
+                if sim >= best_sim:
+                    best, best_sim = candidate, sim
+        if best is not None:
+            self.duplicates += 1
+            if chat not in best.chats:
+                best.chats.append(chat)
+            return best
+
+        entry = SeenMessage(self._next_key, signature, now, chat, pending_id)
+        self._next_key += 1
+        if pending_id is not None:
+            self._pending[pending_id] = entry
+        self._entries.append(entry)
+        for band in bands:
+            self._buckets.setdefault(band, []).append(entry)
+        self._expire(now)
+        return None
+
+    def discard(self, signature: tuple[int, ...]) -> bool:
+        """
+        Забуває повідомлення, запам'ятоване check() з цим підписом (напр. черга
+        його відкинула — пізніші копії не мають рахуватися дублікатами непересланого).
+        """
+        if not signature:
+            return False
+        for entry in self._buckets.get(self._band_keys(signature)[0], ()):
+            if entry.signature == signature:
+                self._unlink(entry)
+                self._entries.remove(entry)
+                return True
+        return False
+
+    def take(self, pending_id: str) -> list[str]:
+        """
+        Пересилка взяла елемент pending_id з черги: повертає інші чати, де бачили
+        його дублікати, і більше не відстежує його (запис лишається для дедуплікації).
+        Невідомий id (вже витіснений або з черги попереднього запуску) — [].
+        """
+        entry = self._pending.pop(pending_id, None)
+        if entry is None:
+            return []
+        entry.pending_id = None
+        return entry.chats[1:]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "window": self.window,
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+        }
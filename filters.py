@@ -0,0 +1,644 @@
+"""
+filters.py — Скомпільовані фільтри повідомлень (без залежності від Telethon).
+Нормалізований вигляд повідомлення (спільний для всіх стадій), матчер
+keywords/minus_words на автоматі Aho–Corasick (один прохід по тексту
+незалежно від довжини списків), нечіткий пошук ключових слів по
+триграмному індексу та евристичний спам-скорер.
+"""
+
+import re
+import unicodedata
+from collections import deque
+from contextlib import nullcontext
+from functools import cached_property, lru_cache
+from typing import Iterable, Iterator, NamedTuple
+
+
+# ──────────────────────────────────────────────────────────────
+# Нормалізація тексту
+# ──────────────────────────────────────────────────────────────
+# Невидимі символи, якими розбивають слова (zero-width, bidi-мітки, м'який перенос…)
+_INVISIBLE = dict.fromkeys(
+    [0x00AD, 0x034F, 0x061C, 0x115F, 0x1160, 0x17B4, 0x17B5, 0x180E, 0x3164, 0xFEFF, 0xFFA0]
+    + list(range(0x200B, 0x2010))
+    + list(range(0x202A, 0x202F))
+    + list(range(0x2060, 0x2070)),
+    None,
+)
+
+# Кириличні/грецькі літери, схожі на латинські (після lower()) → латинський скелет
+_CONFUSABLES = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ї": "i", "ј": "j",
+    "ѕ": "s", "ԁ": "d", "һ": "h", "ӏ": "l", "ԛ": "q", "ԝ": "w", "ү": "y",
+    "α": "a", "β": "b", "ε": "e", "ζ": "z", "η": "n", "ι": "i", "κ": "k", "μ": "m",
+    "ν": "v", "ο": "o", "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+})
+
+
+def fold_text(text: str) -> str:
+    """
+    Скелет тексту для матчерів: NFKC + нижній регістр + без невидимих символів
+    + кириличні/грецькі двійники латиниці зведені до одного вигляду.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return text.translate(_INVISIBLE).translate(_CONFUSABLES)
+
+
+_TOKEN_RE = re.compile(r"\w+")
+PRICE_RE = re.compile(r"\d+\s*(?:[€$]|eur|usd)\b")
+PHONE_RE = re.compile(r"\+?\d[\d\s\-]{8,}")
+BULLET_RE = re.compile(r"^[✓✔•►▸→]\s*\S", re.MULTILINE)
+CONTACT_RE = re.compile(r"contact.{0,10}privado|privado.{0,5}📱|в лс|в личк|telegram.{0,5}@")
+
+
+class NormalizedMessage:
+    """
+    Вигляд повідомлення, що будується один раз у monitor() і читається всіма стадіями.
+    Похідні значення обчислюються ліниво і кешуються.
+    """
+
+    def __init__(self, text: str):
+        self.raw = text
+        self.lower = text.lower()
+        self._char_counts: dict[frozenset, int] = {}
+
+    @cached_property
+    def folded(self) -> str:
+        """Текст для матчерів (див. fold_text)."""
+        return fold_text(self.raw)
+
+    @cached_property
+    def tokens(self) -> list[str]:
+        return _TOKEN_RE.findall(self.folded)
+
+    @cached_property
+    def prices(self) -> int:
+        return len(PRICE_RE.findall(self.lower))
+
+    @cached_property
+    def phone_runs(self) -> int:
+        return len(PHONE_RE.findall(self.raw))
+
+    @cached_property
+    def has_phone(self) -> bool:
+        if "phone_runs" in self.__dict__:
+            return self.phone_runs > 0
+        return PHONE_RE.search(self.raw) is not None
+
+    @cached_property
+    def bullets(self) -> int:
+        return len(BULLET_RE.findall(self.raw))
+
+    def count_chars(self, chars: Iterable[str]) -> int:
+        """Скільки разів у тексті зустрічаються символи з набору (напр. спам-емодзі)."""
+        key = chars if isinstance(chars, frozenset) else frozenset(chars)
+        count = self._char_counts.get(key)
+        if count is None:
+            raw = self.raw
+            count = self._char_counts[key] = sum(raw.count(c) for c in key)
+        return count
+
+
+def as_message(text: "str | NormalizedMessage") -> NormalizedMessage:
+    return text if isinstance(text, NormalizedMessage) else NormalizedMessage(text)
+
+
+# ──────────────────────────────────────────────────────────────
+# Aho–Corasick автомат
+# ──────────────────────────────────────────────────────────────
+class Automaton:
+    """
+    Мультипатерновий пошук: усі входження всіх рядків за один прохід по тексту.
+    Патерни задаються парами (рядок, мітка); мітка повертається при збігу.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "size")
+
+    def __init__(self, patterns: Iterable[tuple[str, object]]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[tuple] = [()]
+        self.size = 0
+
+        for pattern, tag in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    out.append(())
+                    goto[state][ch] = nxt
+                state = nxt
+            out[state] += ((len(pattern), tag),)
+            self.size += 1
+
+        # Fail-переходи (BFS): вихід стану доповнюється виходом його fail-стану
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[nxt] = f
+                if out[f]:
+                    out[nxt] += out[f]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, object]]:
+        """Генерує (start, end, tag) для кожного входження в порядку кінця збігу."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for length, tag in out[state]:
+                    yield end - length, end, tag
+
+
+def _is_word_char(ch: str) -> bool:
+    """Еквівалент `\\w` з модуля re для str."""
+    return ch.isalnum() or ch == "_"
+
+
+def _bounded(text: str, start: int, end: int) -> bool:
+    """Семантика `(?<!\\w)…(?!\\w)`: збіг не є частиною довшого слова."""
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if end < len(text) and _is_word_char(text[end]):
+        return False
+    return True
+
+
+# ──────────────────────────────────────────────────────────────
+# Матчер keywords + minus_words
+# ──────────────────────────────────────────────────────────────
+class KeywordMatcher:
+    """
+    Один автомат на обидва списки; працює по NormalizedMessage.folded.
+    Ключові слова — з межами слова, пріоритет за порядком у списку.
+    Мінус-слова — підрядок (як і раніше).
+    """
+
+    def __init__(self, keywords: Iterable[str], minus_words: Iterable[str]):
+        self.keywords = tuple(keywords)
+        self.minus_words = tuple(minus_words)
+        # Мітка >= 0 — індекс ключового слова, < 0 — ~індекс мінус-слова
+        patterns = [(fold_text(kw), i) for i, kw in enumerate(self.keywords)]
+        patterns += [(fold_text(mw), ~j) for j, mw in enumerate(self.minus_words)]
+        self._automaton = Automaton(patterns)
+
+    def scan(self, text: "str | NormalizedMessage") -> tuple[str | None, str | None]:
+        """
+        Один прохід по тексту: (перше ключове слово, знайдене мінус-слово).
+        Після першого мінус-слова сканування зупиняється — ключове слово вже не важливе.
+        """
+        folded = as_message(text).folded
+        best: int | None = None
+        for start, end, tag in self._automaton.iter_matches(folded):
+            if tag < 0:
+                return None, self.minus_words[~tag]
+            if (best is None or tag < best) and _bounded(folded, start, end):
+                best = tag
+        return (self.keywords[best] if best is not None else None), None
+
+    def find_keyword(self, text: "str | NormalizedMessage") -> str | None:
+        """Перше (за порядком у списку) ключове слово з межами слова або None."""
+        folded = as_message(text).folded
+        best: int | None = None
+        for start, end, tag in self._automaton.iter_matches(folded):
+            if tag >= 0 and (best is None or tag < best) and _bounded(folded, start, end):
+                best = tag
+                if best == 0:
+                    break
+        return self.keywords[best] if best is not None else None
+
+    def find_minus_word(self, text: "str | NormalizedMessage") -> str | None:
+        """Перше знайдене мінус-слово або None."""
+        for _, _, tag in self._automaton.iter_matches(as_message(text).folded):
+            if tag < 0:
+                return self.minus_words[~tag]
+        return None
+
+
+@lru_cache(maxsize=16)
+def _matcher_for(keywords: tuple[str, ...], minus_words: tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords, minus_words)
+
+
+def has_minus_word(text: "str | NormalizedMessage", minus_words: list[str]) -> bool:
+    """True якщо текст містить будь-яке мінус-слово."""
+    return _matcher_for((), tuple(minus_words)).find_minus_word(text) is not None
+
+
+def find_keyword(text: "str | NormalizedMessage", keywords: list[str]) -> str | None:
+    """
+    Повертає перше знайдене ключове слово або None.
+    """
+    return _matcher_for(tuple(keywords), ()).find_keyword(text)
+
+
+# ──────────────────────────────────────────────────────────────
+# Утиліти: очищення minus_words
+# ──────────────────────────────────────────────────────────────
+def clean_minus_words(minus_words: list[str], skip_words: list[str], keywords: list[str]) -> list[str]:
+    """
+    Видаляє зі списку мінус-слів ті слова, що є в skip_words або keywords.
+    Повертає новий (очищений) список. НЕ мутує оригінал.
+    """
+    skip_lower = {w.lower() for w in skip_words}
+    kw_lower = {w.lower() for w in keywords}
+    forbidden = skip_lower | kw_lower
+
+    result: list[str] = []
+    seen: set[str] = set()
+
+    for phrase in minus_words:
+        words = phrase.lower().split()
+        cleaned = [w for w in words if w not in forbidden]
+        new_phrase = " ".join(cleaned).strip()
+        if new_phrase and new_phrase not in seen:
+            result.append(new_phrase)
+            seen.add(new_phrase)
+
+    return result
+
+
+# ──────────────────────────────────────────────────────────────
+# Нечіткий пошук ключових слів (опечатки)
+# ──────────────────────────────────────────────────────────────
+FUZZY_MIN_LENGTH = 5  # коротші ключові слова нечітко не шукаються (без явного override)
+
+
+def _trigrams(s: str) -> set[str]:
+    padded = f" {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _within_distance(a: str, b: str, k: int) -> bool:
+    """Відстань Левенштейна між a та b не більша за k (з раннім виходом)."""
+    if abs(len(a) - len(b)) > k:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > k:
+            return False
+        prev = cur
+    return prev[-1] <= k
+
+
+class FuzzyKeywordIndex:
+    """
+    Триграмний інвертований індекс по ключових словах.
+    Кожна правка змінює не більше 3 триграм, тож ключове слово на відстані k
+    від вікна повідомлення має спільними щонайменше max(|A|, |B|) - 3k триграм,
+    а отже хоча б одну з будь-яких 3k + 1 триграм вікна. Кандидати беруться
+    зі списків 3k + 1 найрідкісніших триграм (без перебору всіх ключових слів),
+    далі — фільтр за кількістю спільних триграм і перевірка відстанню Левенштейна.
+    Дуже короткі слова (|A| <= 3k) можуть не мати спільних триграм взагалі —
+    вони перевіряються для кожного вікна напряму.
+    """
+
+    def __init__(self, keywords: Iterable[str], max_distance: int = 1, overrides: dict | None = None):
+        self.keywords = tuple(keywords)
+        overrides = {k.lower(): v for k, v in (overrides or {}).items()}
+        self._entries: list[tuple[str, int, frozenset]] = []  # (скелет, дистанція, триграми)
+        self._ids: list[int] = []                             # індекс у self.keywords
+        self._index: dict[str, list[int]] = {}
+        self._unindexed: list[int] = []
+        self._window_sizes: set[int] = set()
+        self._max_len = 0
+        self._max_distance = 0
+
+        for i, kw in enumerate(self.keywords):
+            skeleton = " ".join(_TOKEN_RE.findall(fold_text(kw)))
+            if not skeleton:
+                continue
+            default = max_distance if len(skeleton) >= FUZZY_MIN_LENGTH else 0
+            distance = int(overrides.get(kw.lower(), default))
+            if distance <= 0:
+                continue
+            grams = frozenset(_trigrams(skeleton))
+            entry = len(self._entries)
+            self._entries.append((skeleton, distance, grams))
+            self._ids.append(i)
+            if len(grams) <= 3 * distance:
+                self._unindexed.append(entry)
+            for gram in grams:
+                self._index.setdefault(gram, []).append(entry)
+            self._window_sizes.add(skeleton.count(" ") + 1)
+            self._max_len = max(self._max_len, len(skeleton) + distance)
+            self._max_distance = max(self._max_distance, distance)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, text: "str | NormalizedMessage") -> str | None:
+        """Ключове слово (найвищий пріоритет за порядком), що збігається з опечаткою, або None."""
+        if not self._entries:
+            return None
+        tokens = as_message(text).tokens
+        index = self._index
+        probes = 3 * self._max_distance + 1
+        best: int | None = None
+        seen: set[str] = set()
+
+        for size in self._window_sizes:
+            for start in range(len(tokens) - size + 1):
+                window = " ".join(tokens[start:start + size])
+                if len(window) > self._max_len or window in seen:
+                    continue
+                seen.add(window)
+                grams = _trigrams(window)
+                rare = sorted(grams, key=lambda g: len(index.get(g, ())))[:probes]
+                candidates = {entry for gram in rare for entry in index.get(gram, ())}
+                candidates.update(self._unindexed)
+                for entry in candidates:
+                    if best is not None and self._ids[entry] >= best:
+                        continue
+                    skeleton, distance, entry_grams = self._entries[entry]
+                    if len(grams & entry_grams) < max(len(entry_grams), len(grams)) - 3 * distance:
+                        continue
+                    if _within_distance(window, skeleton, distance):
+                        best = self._ids[entry]
+                        if best == 0:
+                            return self.keywords[0]
+
+        return self.keywords[best] if best is not None else None
+
+
+# ──────────────────────────────────────────────────────────────
+# Локальний евристичний спам-скорер
+# ──────────────────────────────────────────────────────────────
+_REGEX_META = set("\\.^$*+?{}[]|()")
+
+
+def _literal_trigger(pattern: str) -> tuple[str, bool, bool] | None:
+    """
+    Якщо тригер — звичайний рядок (можливо в обгортці \\b…\\b), повертає
+    (рядок, межа_зліва, межа_справа) для автомата; інакше None (лишається regex).
+    """
+    core = pattern
+    left = core.startswith(r"\b")
+    if left:
+        core = core[2:]
+    right = core.endswith(r"\b")
+    if right:
+        core = core[:-2]
+    if not core or any(ch in _REGEX_META for ch in core):
+        return None
+    # \b ≡ (?<!\w)/(?!\w) лише коли крайній символ — символ слова
+    if (left and not _is_word_char(core[0])) or (right and not _is_word_char(core[-1])):
+        return None
+    return core.lower(), left, right
+
+
+def _points(count: int, table: tuple[tuple[int, int], ...]) -> int:
+    """Бали за кількістю збігів: перша пара (мінімум, бали), де count >= мінімум."""
+    for minimum, points in table:
+        if count >= minimum:
+            return points
+    return 0
+
+
+# Менші списки швидше перевірити C-пошуком підрядка, ніж пройти автоматом у Python
+AUTOMATON_MIN_PATTERNS = 32
+
+_TRIGGER_POINTS = ((3, 4), (2, 3), (1, 1))
+_EMOJI_POINTS = ((6, 3), (3, 1))
+_SERVICE_POINTS = ((5, 4), (3, 2), (2, 1))
+_PRICE_POINTS = ((3, 4), (2, 3), (1, 1))
+_BULLET_POINTS = ((4, 3), (2, 1))
+
+
+class SpamScore(NamedTuple):
+    score: int
+    features: dict[str, int]
+
+
+class SpamScorer:
+    """
+    Евристичний фільтр комерційного спаму, скомпільований з конфігу.
+    Усі regex зібрані заздалегідь; великі списки сервісів і тригерів-рядків
+    шукаються одним автоматом за один прохід.
+    """
+
+    def __init__(
+        self,
+        triggers: Iterable[str] = (),
+        emojis: str = "",
+        services: Iterable[str] = (),
+        threshold: int = 4,
+    ):
+        self.threshold = threshold
+        self._emojis = frozenset(emojis)
+        triggers = tuple(triggers)
+        services = tuple(services)
+
+        literals = {i: _literal_trigger(p) for i, p in enumerate(triggers)}
+        literals = {i: lit for i, lit in literals.items() if lit is not None}
+        self._regex_triggers = [
+            re.compile(p, re.IGNORECASE) for i, p in enumerate(triggers) if i not in literals
+        ]
+        self._services = services
+        self._always_services = sum(1 for s in services if not s)  # "" in t — завжди True
+        self._use_automaton = len(services) + len(literals) >= AUTOMATON_MIN_PATTERNS
+
+        if self._use_automaton:
+            # Мітка >= 0 — індекс сервісу, < 0 — ~індекс тригера-рядка
+            patterns = [(service, j) for j, service in enumerate(services)]
+            patterns += [(core, ~i) for i, (core, _, _) in literals.items()]
+            self._automaton = Automaton(patterns)
+            self._literal_bounds = {i: (left, right) for i, (_, left, right) in literals.items()}
+        else:
+            # Швидка перевірка підрядка; regex з межами слова — лише якщо підрядок є
+            self._literal_checks = [
+                (core, re.compile(
+                    ("(?<!\\w)" if left else "") + re.escape(core) + ("(?!\\w)" if right else "")
+                ) if left or right else None)
+                for core, left, right in literals.values()
+            ]
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SpamScorer":
+        return cls(
+            config.get("spam_commercial_triggers", []),
+            config.get("spam_emojis", ""),
+            config.get("spam_services", []),
+            config.get("spam_score_threshold", 4),
+        )
+
+    def score(self, text: "str | NormalizedMessage") -> SpamScore:
+        """Сумарний бал + бали по кожній ознаці."""
+        msg = as_message(text)
+        t = msg.lower
+
+        if self._use_automaton:
+            services_found, literal_triggers = self._scan_literals(t)
+            services_count = len(services_found) + self._always_services
+        else:
+            literal_triggers = sum(
+                1 for core, bounded in self._literal_checks
+                if core in t and (bounded is None or bounded.search(t))
+            )
+            services_count = sum(1 for s in self._services if s in t)
+        trigger_count = literal_triggers + sum(1 for p in self._regex_triggers if p.search(t))
+
+        features = {
+            "triggers": _points(trigger_count, _TRIGGER_POINTS),
+            "emojis": _points(msg.count_chars(self._emojis), _EMOJI_POINTS) if self._emojis else 0,
+            "services": _points(services_count, _SERVICE_POINTS),
+            "prices": _points(msg.prices, _PRICE_POINTS),
+            "phone": 1 if msg.has_phone else 0,
+            "contacts": 2 if CONTACT_RE.search(t) else 0,
+            "bullets": _points(msg.bullets, _BULLET_POINTS),
+        }
+        return SpamScore(sum(features.values()), features)
+
+    def is_spam(self, text: "str | NormalizedMessage") -> bool:
+        return self.score(text).score >= self.threshold
+
+    def _scan_literals(self, t: str) -> tuple[set[int], int]:
+        """Один прохід автомата: (знайдені сервіси, кількість тригерів-рядків)."""
+        services_found: set[int] = set()
+        triggers_found: set[int] = set()
+        for start, end, tag in self._automaton.iter_matches(t):
+            if tag >= 0:
+                services_found.add(tag)
+                continue
+            i = ~tag
+            if i in triggers_found:
+                continue
+            left, right = self._literal_bounds[i]
+            if left and start > 0 and _is_word_char(t[start - 1]):
+                continue
+            if right and end < len(t) and _is_word_char(t[end]):
+                continue
+            triggers_found.add(i)
+        return services_found, len(triggers_found)
+
+
+@lru_cache(maxsize=16)
+def _scorer_for(triggers: tuple[str, ...], emojis: str, services: tuple[str, ...], threshold: int) -> SpamScorer:
+    return SpamScorer(triggers, emojis, services, threshold)
+
+
+def is_service_spam(text: "str | NormalizedMessage", config: dict) -> bool:
+    """
+    Локальний евристичний фільтр: виявляє комерційний спам.
+    True = спам, False = не спам.
+    """
+    scorer = _scorer_for(
+        tuple(config.get("spam_commercial_triggers", [])),
+        config.get("spam_emojis", ""),
+        tuple(config.get("spam_services", [])),
+        config.get("spam_score_threshold", 4),
+    )
+    return scorer.is_spam(text)
+
+
+# ──────────────────────────────────────────────────────────────
+# Набір скомпільованих стадій для однієї версії конфігу
+# ──────────────────────────────────────────────────────────────
+VERDICTS = ("minus_word", "no_keyword", "spam_score", "queued")
+
+
+class Decision(NamedTuple):
+    """Рішення фільтрів щодо одного повідомлення (без чату, дублікатів і AI)."""
+
+    verdict: str  # одне з VERDICTS
+    keyword: str | None = None
+    minus_word: str | None = None
+    spam: SpamScore | None = None
+
+
+def _untimed(stage: str):
+    return nullcontext()
+
+
+class CompiledFilters:
+    """Матчер + нечіткий індекс (якщо увімкнено) + спам-скорер з одного конфігу."""
+
+    # Ключі конфігу, від яких залежить кожна стадія
+    MATCHER_KEYS = frozenset({"keywords", "minus_words"})
+    FUZZY_KEYS = frozenset({
+        "keywords", "fuzzy_keywords_enabled", "fuzzy_max_distance", "fuzzy_keywords_overrides",
+    })
+    SCORER_KEYS = frozenset({
+        "spam_commercial_triggers", "spam_emojis", "spam_services", "spam_score_threshold",
+    })
+
+    def __init__(self, config: dict, version: int = 0):
+        self.version = version
+        self.matcher = self._build_matcher(config)
+        self.fuzzy = self._build_fuzzy(config)
+        self.scorer = SpamScorer.from_config(config)
+
+    @staticmethod
+    def _build_matcher(config: dict) -> KeywordMatcher:
+        return KeywordMatcher(config.get("keywords", []), config.get("minus_words", []))
+
+    @staticmethod
+    def _build_fuzzy(config: dict) -> "FuzzyKeywordIndex | None":
+        if not config.get("fuzzy_keywords_enabled", False):
+            return None
+        return FuzzyKeywordIndex(
+            config.get("keywords", []),
+            config.get("fuzzy_max_distance", 1),
+            config.get("fuzzy_keywords_overrides", {}),
+        )
+
+    def updated(self, config: dict, version: int, changed: "set[str] | frozenset[str]") -> "CompiledFilters":
+        """Новий набір для version: перебудовуються лише стадії, чиї ключі є в changed."""
+        new = object.__new__(CompiledFilters)
+        new.version = version
+        new.matcher = self._build_matcher(config) if changed & self.MATCHER_KEYS else self.matcher
+        new.fuzzy = self._build_fuzzy(config) if changed & self.FUZZY_KEYS else self.fuzzy
+        new.scorer = SpamScorer.from_config(config) if changed & self.SCORER_KEYS else self.scorer
+        return new
+
+    def match(self, msg: "str | NormalizedMessage") -> tuple[str | None, str | None]:
+        """
+        (ключове слово, мінус-слово). Спершу точний прохід автомата;
+        нечіткий пошук — лише якщо точного збігу й мінус-слова немає.
+        """
+        keyword, minus_word = self.matcher.scan(msg)
+        if keyword is None and minus_word is None and self.fuzzy is not None:
+            keyword = self.fuzzy.find(msg)
+        return keyword, minus_word
+
+    def decide(self, msg: "str | NormalizedMessage", timers=None) -> Decision:
+        """
+        Стадії monitor() без Telethon: мінус-слова/ключові слова, потім спам-скорер.
+        timers — об'єкт з .time(stage) (напр. metrics.STAGES) для замірів стадій.
+        """
+        time_stage = timers.time if timers is not None else _untimed
+        with time_stage("match"):
+            msg = as_message(msg)
+            keyword, minus_word = self.match(msg)
+        if minus_word:
+            return Decision("minus_word", keyword, minus_word)
+        if not keyword:
+            return Decision("no_keyword")
+        with time_stage("spam_score"):
+            spam = self.scorer.score(msg)
+        if spam.score >= self.scorer.threshold:
+            return Decision("spam_score", keyword, spam=spam)
+        return Decision("queued", keyword, spam=spam)
@@ -0,0 +1,215 @@
+"""
+journal.py — Журнал рішень конвеєра у JSONL (без залежності від Telethon).
+Кожне рішення (queued / local_blocked / ai_blocked / forwarded / dropped) —
+один JSON-рядок у data/journal/events_YYYY-MM-DD.jsonl (для аудиту та розбору інцидентів).
+Паралельно ведуться погодинні/подобові лічильники (data/journal/counters.json),
+з яких /stats відповідає за будь-який період без читання файлів.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+EVENTS = ("queued", "local_blocked", "ai_blocked", "forwarded", "dropped")
+COUNTERS = EVENTS + ("ai_checked", "ai_passed")  # ai_* — лише лічильники, без подій у журналі
+
+log = logging.getLogger("monitor")
+
+
+def day_start(days: int) -> float:
+    """Початок доби (days - 1) днів тому: days=1 — з опівночі сьогодні."""
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - timedelta(days=max(days, 1) - 1)).timestamp()
+
+
+class StatsCounters:
+    """
+    Лічильники по годинах (останні hourly_days діб) і по добах (останні daily_days).
+    add() — словникова операція; total(days) — сума не більше days подобових записів.
+    """
+
+    def __init__(self, hourly_days: int = 7, daily_days: int = 400):
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.hourly: dict[str, Counter] = {}  # "YYYY-MM-DD HH" → лічильники
+        self.daily: dict[str, Counter] = {}   # "YYYY-MM-DD" → лічильники
+        self.dirty = False
+        self._hour = ("", "", 0.0, 0.0)  # (година, дата, початок, кінець)
+
+    def _keys(self, ts: float) -> tuple[str, str]:
+        hour, date, start, end = self._hour
+        if not start <= ts < end:
+            moment = datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0)
+            hour, date = moment.strftime("%Y-%m-%d %H"), moment.strftime("%Y-%m-%d")
+            self._hour = (hour, date, moment.timestamp(), (moment + timedelta(hours=1)).timestamp())
+            if date not in self.daily:
+                self._trim(moment)
+        return hour, date
+
+    def _trim(self, now: datetime) -> None:
+        hourly_cutoff = (now - timedelta(days=self.hourly_days)).strftime("%Y-%m-%d %H")
+        daily_cutoff = (now - timedelta(days=self.daily_days)).strftime("%Y-%m-%d")
+        for key in [k for k in self.hourly if k < hourly_cutoff]:
+            del self.hourly[key]
+        for key in [k for k in self.daily if k < daily_cutoff]:
+            del self.daily[key]
+
+    def add(self, name: str, ts: Optional[float] = None, n: int = 1) -> None:
+        hour, date = self._keys(time.time() if ts is None else ts)
+        self.hourly.setdefault(hour, Counter())[name] += n
+        self.daily.setdefault(date, Counter())[name] += n
+        self.dirty = True
+
+    def total(self, days: int = 1) -> dict[str, int]:
+        """Суми за останні days діб (з опівночі) для всіх COUNTERS."""
+        start = datetime.fromtimestamp(day_start(days))
+        totals: Counter = Counter()
+        for d in range(max(days, 1)):
+            day = self.daily.get((start + timedelta(days=d)).strftime("%Y-%m-%d"))
+            if day:
+                totals.update(day)
+        return {name: totals.get(name, 0) for name in COUNTERS}
+
+    def hours(self, count: int = 24) -> list[tuple[str, dict[str, int]]]:
+        """[(«YYYY-MM-DD HH», лічильники)] за останні count годин, від старіших."""
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        keys = [(now - timedelta(hours=h)).strftime("%Y-%m-%d %H") for h in range(count - 1, -1, -1)]
+        return [(key, dict(self.hourly.get(key, {}))) for key in keys]
+
+    def to_dict(self) -> dict:
+        return {"hourly": self.hourly, "daily": self.daily}
+
+    def load(self, data: dict) -> None:
+        self.hourly = {k: Counter(v) for k, v in data.get("hourly", {}).items()}
+        self.daily = {k: Counter(v) for k, v in data.get("daily", {}).items()}
+        self._trim(datetime.now())
+
+
+class EventJournal:
+    """
+    record() лише додає подію в буфер (event loop не чекає на диск); run() раз
+    на flush_interval дописує буфер у файл дня в окремому потоці. Файли старші
+    за retention_days видаляються при зміні дати.
+    """
+
+    def __init__(self, directory: "str | Path", retention_days: int = 30, flush_interval: float = 1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()  # запис файлів: flush() з потоку і flush_sync() при виході
+        self._last_date = ""
+        self.counters = StatsCounters()
+        self.on_record: Optional[Callable[[str, Optional[str]], None]] = None  # напр. метрики
+        self.counters_path = self.directory / "counters.json"
+        try:
+            self.counters.load(json.loads(self.counters_path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            self._rebuild_counters()
+        except (ValueError, AttributeError) as exc:
+            log.warning(f"⚠️ Пошкоджений {self.counters_path}: {exc} — лічильники з нуля")
+
+    def _rebuild_counters(self) -> None:
+        """Перший запуск з лічильниками: підрахунок подій з наявних файлів журналу."""
+        for path in sorted(self.directory.glob("events_*.jsonl")):
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.counters.add(entry["ev"], entry["ts"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        self.counters._trim(datetime.now())
+
+    def path_for(self, date: str) -> Path:
+        return self.directory / f"events_{date}.jsonl"
+
+    def record(self, event: str, chat_id=None, keyword: Optional[str] = None,
+               reason: Optional[str] = None, **fields) -> None:
+        entry = {"ts": round(time.time(), 3), "ev": event}
+        if chat_id is not None:
+            entry["chat_id"] = chat_id
+        if keyword is not None:
+            entry["kw"] = keyword
+        if reason is not None:
+            entry["reason"] = reason
+        entry.update((k, v) for k, v in fields.items() if v is not None)
+        self._buffer.append(entry)
+        self.counters.add(event, entry["ts"])
+        if self.on_record is not None:
+            self.on_record(event, reason)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Лише лічильник, без запису події (напр. ai_checked / ai_passed)."""
+        self.counters.add(name, n=n)
+
+    # ── Запис ──
+    def _write(self, entries: list[dict]) -> None:
+        by_date: dict[str, list[str]] = {}
+        for entry in entries:
+            date = datetime.fromtimestamp(entry["ts"]).strftime("%Y-%m-%d")
+            by_date.setdefault(date, []).append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        with self._lock:
+            for date, lines in by_date.items():
+                with open(self.path_for(date), "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                if date != self._last_date:
+                    self._last_date = date
+                    self._prune()
+
+    def _prune(self) -> None:
+        if not self.retention_days:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for path in self.directory.glob("events_*.jsonl"):
+            if path.stem[len("events_"):] < cutoff:
+                path.unlink(missing_ok=True)
+
+    def _write_counters(self, snapshot: str) -> None:
+        tmp = self.counters_path.with_suffix(".tmp")
+        with self._lock:
+            tmp.write_text(snapshot, encoding="utf-8")
+            os.replace(tmp, self.counters_path)
+
+    def _take(self) -> tuple[list[dict], Optional[str]]:
+        entries, self._buffer = self._buffer, []
+        snapshot = None
+        if self.counters.dirty:
+            self.counters.dirty = False
+            snapshot = json.dumps(self.counters.to_dict(), ensure_ascii=False, separators=(",", ":"))
+        return entries, snapshot
+
+    def flush_sync(self) -> None:
+        entries, snapshot = self._take()
+        if entries:
+            self._write(entries)
+        if snapshot:
+            self._write_counters(snapshot)
+
+    async def flush(self) -> None:
+        entries, snapshot = self._take()
+        if entries:
+            await asyncio.to_thread(self._write, entries)
+        if snapshot:
+            await asyncio.to_thread(self._write_counters, snapshot)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                log.error(f"Помилка запису журналу подій: {exc}")
+
+    # ── Читання ──
+    def summary(self, days: int = 1) -> dict:
+        """{лічильник: к-сть} для всіх COUNTERS за останні days діб — з агрегатів, без читання журналу."""
+        return self.counters.total(days)
@@ -0,0 +1,280 @@
+"""
+fake_telegram.py — Локальна заміна Telethon для навантажувальних тестів.
+Лише та поверхня TelegramClient, якою користуються main.py і bot.py на гарячому
+шляху: реєстрація/доставка подій, get_chat / get_entity / get_sender,
+send_message із затримкою мережі та ін'єкцією FloodWaitError.
+
+install_fake_telethon() підміняє модулі telethon.* у sys.modules — викликати
+до імпорту main.py / bot.py. Решта імен (запити tl.functions, типи tl.types)
+віддаються заглушками, яких достатньо для імпорту.
+"""
+
+import asyncio
+import random
+import sys
+import time
+import types
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+
+class FloodWaitError(Exception):
+    """Як telethon.errors.FloodWaitError: seconds — скільки чекати перед повтором."""
+
+    def __init__(self, request=None, capture: int = 0, seconds: Optional[int] = None):
+        self.request = request
+        self.seconds = capture if seconds is None else seconds
+        super().__init__(f"A wait of {self.seconds} seconds is required")
+
+
+class FloodPlan:
+    """
+    Коли send_message кидає FloodWaitError: з імовірністю probability, а в «шторм»
+    (storm = (початок, кінець) у секундах від start()) — на кожен виклик.
+    """
+
+    def __init__(self, probability: float = 0.0, seconds: int = 1,
+                 storm: Optional[tuple[float, float]] = None, seed: int = 1):
+        self.probability = probability
+        self.seconds = seconds
+        self.storm = storm
+        self._rnd = random.Random(seed)
+        self._started = time.monotonic()
+        self.injected = 0
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+
+    def should_flood(self) -> bool:
+        if self.storm is not None:
+            elapsed = time.monotonic() - self._started
+            if self.storm[0] <= elapsed < self.storm[1]:
+                return True
+        return self.probability > 0 and self._rnd.random() < self.probability
+
+
+class FakeEntity:
+    """Чат або користувач: поля, які читають format_chat() / format_sender()."""
+
+    def __init__(self, entity_id: int, title: str = "", username: Optional[str] = None,
+                 first_name: str = "", last_name: str = ""):
+        self.id = entity_id
+        self.title = title
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, text: str, date: Optional[datetime] = None):
+        self.id = message_id
+        self.text = text
+        self.message = text
+        self.date = date or datetime.now(timezone.utc)
+
+
+class FakeNewMessageEvent:
+    """Подія NewMessage: chat_id / sender_id / message і асинхронні get_chat() / get_sender()."""
+
+    def __init__(self, client: "FakeTelegramClient", chat: FakeEntity, sender: FakeEntity, message: FakeMessage):
+        self.client = client
+        self.chat_id = chat.id
+        self.sender_id = sender.id
+        self.input_sender = sender
+        self.message = message
+        self._chat = chat
+        self._sender = sender
+
+    async def get_chat(self) -> FakeEntity:
+        await self.client.network_delay()
+        self.client.calls["get_chat"] += 1
+        return self._chat
+
+    async def get_sender(self) -> FakeEntity:
+        await self.client.network_delay()
+        self.client.calls["get_sender"] += 1
+        return self._sender
+
+    async def get_input_sender(self) -> FakeEntity:
+        return self._sender
+
+
+class SentMessage:
+    __slots__ = ("sent_at", "entity", "text", "buttons")
+
+    def __init__(self, entity, text: str, buttons=None):
+        self.sent_at = time.time()
+        self.entity = entity
+        self.text = text
+        self.buttons = buttons
+
+
+class FakeTelegramClient:
+    """
+    Замість telethon.TelegramClient. on() реєструє обробники, dispatch() доставляє
+    подію кожному (як Telethon без sequential_updates — окремим завданням).
+    latency — затримка «мережі» на кожен запит, секунд.
+    """
+
+    def __init__(self, session: Any = None, api_id: Any = None, api_hash: Any = None, **kwargs):
+        self.session = session
+        self.latency = 0.0
+        self.flood = FloodPlan()
+        self.entities: dict[Any, FakeEntity] = {}
+        self.sent: deque[SentMessage] = deque(maxlen=1000)  # останні — щоб не рахувати їх у зростання пам'яті
+        self.sent_total = 0
+        self.calls = {"get_chat": 0, "get_sender": 0, "get_entity": 0, "send_message": 0, "flood_wait": 0}
+        self._handlers: list[tuple[Any, Callable]] = []
+        self._connected = False
+        self._disconnected: Optional[asyncio.Event] = None
+
+    # ── Життєвий цикл ──
+    async def start(self, *args, **kwargs) -> "FakeTelegramClient":
+        self._connected = True
+        return self
+
+    async def connect(self) -> None:
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def disconnect(self) -> None:
+        self._connected = False
+        if self._disconnected is not None:
+            self._disconnected.set()
+
+    async def run_until_disconnected(self) -> None:
+        self._disconnected = asyncio.Event()
+        await self._disconnected.wait()
+
+    # ── Події ──
+    def on(self, event_builder: Any = None) -> Callable:
+        def decorator(fn: Callable) -> Callable:
+            self._handlers.append((event_builder, fn))
+            return fn
+        return decorator
+
+    def add_event_handler(self, fn: Callable, event_builder: Any = None) -> None:
+        self._handlers.append((event_builder, fn))
+
+    def dispatch(self, event: FakeNewMessageEvent) -> list[asyncio.Task]:
+        """Кожен обробник NewMessage — окремим завданням; повертає завдання."""
+        return [
+            asyncio.create_task(fn(event))
+            for builder, fn in self._handlers
+            if isinstance(builder, NewMessage)
+        ]
+
+    # ── Запити ──
+    async def network_delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_entity(self, peer: Any) -> FakeEntity:
+        await self.network_delay()
+        self.calls["get_entity"] += 1
+        if isinstance(peer, FakeEntity):
+            return peer
+        entity = self.entities.get(peer)
+        if entity is None:
+            raise ValueError(f"Cannot find any entity corresponding to {peer!r}")
+        return entity
+
+    async def get_input_entity(self, peer: Any) -> FakeEntity:
+        return await self.get_entity(peer)
+
+    async def send_message(self, entity: Any, message: str = "", buttons=None, **kwargs) -> FakeMessage:
+        await self.network_delay()
+        self.calls["send_message"] += 1
+        if self.flood.should_flood():
+            self.flood.injected += 1
+            self.calls["flood_wait"] += 1
+            raise FloodWaitError(seconds=self.flood.seconds)
+        self.sent.append(SentMessage(entity, message, buttons))
+        self.sent_total += 1
+        return FakeMessage(self.sent_total, message)
+
+    async def get_messages(self, entity: Any, limit: int = 1, **kwargs) -> list:
+        return []
+
+    async def get_dialogs(self, limit: Optional[int] = None, **kwargs) -> list:
+        return []
+
+    async def iter_dialogs(self, limit: Optional[int] = None, **kwargs):
+        for _ in ():
+            yield _
+
+    async def __call__(self, request: Any) -> Any:
+        await self.network_delay()
+        return None
+
+
+# ──────────────────────────────────────────────────────────────
+# Конструктори подій і заглушки модулів telethon.*
+# ──────────────────────────────────────────────────────────────
+class NewMessage:
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+
+class CallbackQuery:
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+
+class _Stub:
+    """Будь-який запит/тип Telethon: зберігає аргументи, нічого не робить."""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+class Button:
+    @staticmethod
+    def inline(text: str, data: bytes = b"") -> tuple[str, bytes]:
+        return text, data
+
+    @staticmethod
+    def url(text: str, url: str = "") -> tuple[str, str]:
+        return text, url
+
+
+def _stub_module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+
+    # PEP 562: невідомі імена (запити tl.functions, типи tl.types) — заглушки
+    def __getattr__(attr: str):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        stub = type(attr, (_Stub,), {})
+        setattr(module, attr, stub)
+        return stub
+
+    module.__getattr__ = __getattr__
+    return module
+
+
+def install_fake_telethon() -> None:
+    """Підміняє telethon.* у sys.modules (до імпорту main.py / bot.py)."""
+    events = _stub_module("telethon.events", NewMessage=NewMessage, CallbackQuery=CallbackQuery)
+    errors = _stub_module("telethon.errors", FloodWaitError=FloodWaitError)
+    tl = _stub_module("telethon.tl")
+    functions = _stub_module("telethon.tl.functions")
+    modules = {
+        "telethon": _stub_module(
+            "telethon", TelegramClient=FakeTelegramClient, events=events, errors=errors, Button=Button, tl=tl,
+        ),
+        "telethon.events": events,
+        "telethon.errors": errors,
+        "telethon.tl": tl,
+        "telethon.tl.functions": functions,
+        "telethon.tl.functions.channels": _stub_module("telethon.tl.functions.channels"),
+        "telethon.tl.functions.bots": _stub_module("telethon.tl.functions.bots"),
+        "telethon.tl.functions.messages": _stub_module("telethon.tl.functions.messages"),
+        "telethon.tl.types": _stub_module("telethon.tl.types"),
+    }
+    sys.modules.update(modules)
@@ -0,0 +1,320 @@
+"""
+run.py — Навантажувальний прогін main.py + bot.py на фейковому Telegram.
+Справжні monitor() і background_forwarder() (черга, дедуплікація, журнал,
+дайджест, AI-фільтр) працюють у тимчасовому каталозі; Telethon замінено
+fake_telegram, OpenAI — stub_openai (через OPENAI_BASE_URL).
+
+Потік повідомлень подається з заданою швидкістю (кілька ступенів), у звіті:
+досягнута швидкість прийому й пересилки, розподіл затримок (metrics.STAGES),
+глибина черги в часі, запізнення event loop і зростання пам'яті (RSS).
+
+    python loadtest/run.py --rates 1,5,20 --step 30
+    python loadtest/run.py --rates 50 --step 60 --flood-storm 20:30 --flood-seconds 2
+    python loadtest/run.py --rates 10 --ai --ai-latency 0.8 --out report.json
+    python loadtest/run.py --dump messages.jsonl --rates 100
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_telegram import (  # noqa: E402
+    FakeEntity, FakeMessage, FakeNewMessageEvent, FloodPlan, install_fake_telethon,
+)
+from stub_openai import StubOpenAIServer  # noqa: E402
+
+FORWARD_CHANNEL = "@loadtest_out"
+DEFAULT_KEYWORDS = ["квартиру", "flat", "mieszkania", "работа", "price"]
+REPORT_STAGES = ("monitor", "queue_wait", "ai_filter", "openai", "resolve_sender", "send", "flood_wait", "end_to_end")
+
+
+def rss_kb() -> int:
+    """Поточний RSS процесу (Linux — /proc, інакше пікове значення з getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load_texts(dump: Optional[Path], count: int, seed: int) -> list[tuple[str, str]]:
+    """[(текст, чат)]: з дампу (JSONL/CSV, як у replay.py) або синтетичний корпус."""
+    if dump is not None:
+        from replay import read_messages
+        return [(m.text, m.chat) for m in read_messages(dump)]
+    from benchmarks.bench_filters import make_corpus
+    return [(text, "") for text in make_corpus(count, seed)]
+
+
+def write_config(workdir: Path, args) -> dict:
+    config = {}
+    if args.config:
+        config = json.loads(args.config.read_text(encoding="utf-8"))
+    config.setdefault("keywords", DEFAULT_KEYWORDS)
+    config.update({
+        "forward_channel": FORWARD_CHANNEL,
+        "admins": config.get("admins", []),
+        "queue_path": "data/queue.db" if args.durable else "",
+        "blocked_store": "data/blocked.db",
+        "metrics_port": 0,
+        "ai_filter_enabled": bool(args.ai),
+    })
+    if args.digest_mode:
+        config["digest_mode"] = args.digest_mode
+    (workdir / "config").mkdir(parents=True, exist_ok=True)
+    (workdir / "config" / "config.json").write_text(json.dumps(config, ensure_ascii=False, indent=2),
+                                                     encoding="utf-8")
+    return config
+
+
+def import_app(workdir: Path):
+    """Імпорт main.py і bot.py з фейковим Telethon у workdir (там з'являться logs/, data/)."""
+    install_fake_telethon()
+    os.chdir(workdir)
+    os.environ.update({
+        "TG_API_ID": "1", "TG_API_HASH": "loadtest", "TG_PHONE": "+10000000000",
+        "BOT_TOKEN": "1:loadtest", "BOT_USERNAME": "@loadtest_bot",
+    })
+    main = importlib.import_module("main")
+    bot = importlib.import_module("bot")
+    return main, bot
+
+
+async def drive(main, bot, args, texts: list[tuple[str, str]]) -> dict:
+    from metrics import STAGES
+
+    user, bot_client = main.user_client, main.bot_client
+    user.latency = args.net_latency
+    bot_client.latency = args.net_latency
+    storm = tuple(float(x) for x in args.flood_storm.split(":")) if args.flood_storm else None
+    bot_client.flood = FloodPlan(args.flood_prob, args.flood_seconds, storm)
+
+    chats = [FakeEntity(-1000000000 - i, f"Група {i}", f"group{i}") for i in range(args.chats)]
+    senders = [FakeEntity(100000 + i, first_name=f"User{i}", username=f"user{i}") for i in range(args.senders)]
+    for sender in senders:
+        user.entities[sender.id] = sender
+    by_title = {}
+
+    # Як main(): стійка черга, сховище заблокованих, ліміти з конфігу, фонові завдання
+    await main.init_message_queue()
+    await main.init_blocked_store()
+    main.configure_runtime(await main.get_config())
+    background = [asyncio.create_task(main.journal.run())]
+    if main.blocked_store is not None:
+        background.append(asyncio.create_task(main.blocked_store.run()))
+    background.append(asyncio.create_task(bot.background_forwarder(
+        bot_client, main.pending_messages, main.get_config,
+        resolve_sender_fn=main.resolve_sender_name, journal=main.journal, blocked_store=main.blocked_store,
+        near_duplicates=main.near_duplicates,
+    )))
+
+    rates = [float(r) for r in args.rates.split(",")]
+    samples: list[dict] = []
+    steps: list[dict] = []
+    state = {"dispatched": 0, "handled": 0, "errors": 0, "max_lag": 0.0}
+    pending_tasks: set = set()
+
+    def on_done(task: asyncio.Task) -> None:
+        pending_tasks.discard(task)
+        state["handled"] += 1
+        if not task.cancelled() and task.exception() is not None:
+            state["errors"] += 1
+
+    def sample(started: float) -> dict:
+        st = main.pending_messages.stats()
+        return {
+            "t": round(time.monotonic() - started, 2),
+            "dispatched": state["dispatched"],
+            "handled": state["handled"],
+            "forwarded": bot_client.sent_total,
+            "queue": st["size"],
+            "oldest_age": round(st["oldest_age"], 2),
+            "dropped": st["dropped_total"],
+            "rss_kb": rss_kb(),
+        }
+
+    async def sampler(started: float) -> None:
+        while True:
+            await asyncio.sleep(args.sample)
+            samples.append(sample(started))
+
+    started = time.monotonic()
+    bot_client.flood.start()
+    rss_start = rss_kb()
+    samples.append(sample(started))
+    sampler_task = asyncio.create_task(sampler(started))
+    index = 0
+    for rate in rates:
+        step_start = time.monotonic()
+        first = sample(started)
+        count = int(rate * args.step)
+        for n in range(count):
+            due = step_start + n / rate
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Event loop не встигає за розкладом (блокуючі виклики, перевантаження)
+                state["max_lag"] = max(state["max_lag"], -delay)
+            text, chat_title = texts[index % len(texts)]
+            chat = chats[index % len(chats)]
+            if chat_title:
+                chat = by_title.setdefault(chat_title, FakeEntity(-2000000000 - len(by_title), chat_title))
+            event = FakeNewMessageEvent(user, chat, senders[index % len(senders)], FakeMessage(index + 1, text))
+            for task in user.dispatch(event):
+                pending_tasks.add(task)
+                task.add_done_callback(on_done)
+            state["dispatched"] += 1
+            index += 1
+        remaining = step_start + args.step - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        last = sample(started)
+        elapsed = time.monotonic() - step_start
+        steps.append({
+            "rate": rate,
+            "ingested_per_sec": round((last["handled"] - first["handled"]) / elapsed, 2),
+            "forwarded_per_sec": round((last["forwarded"] - first["forwarded"]) / elapsed, 2),
+            "queue_start": first["queue"],
+            "queue_end": last["queue"],
+            "queue_growth_per_sec": round((last["queue"] - first["queue"]) / elapsed, 2),
+            "dropped": last["dropped"] - first["dropped"],
+        })
+
+    # Дочекатися спорожнення черги (не довше drain секунд)
+    drain_started = time.monotonic()
+    while (main.pending_messages.qsize() or pending_tasks) and time.monotonic() - drain_started < args.drain:
+        await asyncio.sleep(0.2)
+    samples.append(sample(started))
+    sampler_task.cancel()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(sampler_task, *background, return_exceptions=True)
+    await main.journal.flush()
+    if main.blocked_store is not None:
+        await main.blocked_store.flush()
+    if hasattr(main.pending_messages, "close"):
+        await main.pending_messages.close()
+
+    return {
+        "duration": round(time.monotonic() - started, 2),
+        "dispatched": state["dispatched"],
+        "handled": state["handled"],
+        "handler_errors": state["errors"],
+        "forwarded": bot_client.sent_total,
+        "flood_waits": bot_client.flood.injected,
+        "max_loop_lag": round(state["max_lag"], 3),
+        "queue_left": main.pending_messages.qsize(),
+        "rss_start_kb": rss_start,
+        "rss_end_kb": samples[-1]["rss_kb"],
+        "rss_peak_kb": max(s["rss_kb"] for s in samples),
+        "steps": steps,
+        "latency": {k: v for k, v in STAGES.percentiles(window=1e9).items() if k in REPORT_STAGES},
+        "samples": samples,
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"⏱ {report['duration']} с: подано {report['dispatched']}, оброблено {report['handled']} "
+        f"(помилок {report['handler_errors']}), постів {report['forwarded']}, FloodWait {report['flood_waits']}",
+        f"🧵 Макс. запізнення event loop: {report['max_loop_lag'] * 1000:.0f} мс | "
+        f"у черзі наприкінці: {report['queue_left']}",
+        f"🧠 RSS: {report['rss_start_kb'] / 1024:.1f} → {report['rss_end_kb'] / 1024:.1f} МБ "
+        f"(пік {report['rss_peak_kb'] / 1024:.1f})",
+        "",
+        f"{'повід./с':>9} {'прийом/с':>9} {'постів/с':>9} {'черга':>13} {'Δ/с':>7} {'відкинуто':>10}",
+    ]
+    for s in report["steps"]:
+        verdict = "  ⚠️ розходиться" if s["queue_growth_per_sec"] > 0.05 * s["rate"] and s["queue_end"] > 10 else ""
+        lines.append(
+            f"{s['rate']:>9g} {s['ingested_per_sec']:>9.2f} {s['forwarded_per_sec']:>9.2f} "
+            f"{s['queue_start']:>6}→{s['queue_end']:<6} {s['queue_growth_per_sec']:>7.2f} {s['dropped']:>10}{verdict}"
+        )
+    lines.append("")
+    lines.append(f"{'стадія':<15} {'к-сть':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for stage in REPORT_STAGES:
+        p = report["latency"].get(stage)
+        if p:
+            lines.append(f"{stage:<15} {p['count']:>7} " + " ".join(
+                f"{p[q] * 1000:>7.1f}мс" if p[q] < 1 else f"{p[q]:>8.2f}с" for q in ("p50", "p95", "p99", "max")
+            ))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Навантажувальний прогін на фейковому Telegram")
+    parser.add_argument("--rates", default="1,5,20", help="повідомлень/с на кожному ступені, через кому")
+    parser.add_argument("--step", type=float, default=30, help="тривалість ступеня, с")
+    parser.add_argument("--drain", type=float, default=30, help="скільки чекати спорожнення черги, с")
+    parser.add_argument("--sample", type=float, default=1.0, help="інтервал знімків, с")
+    parser.add_argument("--dump", type=Path, help="JSONL/CSV з полями text, chat (інакше синтетичний корпус)")
+    parser.add_argument("--messages", type=int, default=5000, help="розмір синтетичного корпусу")
+    parser.add_argument("--config", type=Path, help="базовий config.json (keywords, фільтри, дайджест…)")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--net-latency", type=float, default=0.05, help="затримка кожного запиту до Telegram, с")
+    parser.add_argument("--flood-prob", type=float, default=0.0, help="імовірність FloodWait на send_message")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="FloodWaitError.seconds")
+    parser.add_argument("--flood-storm", default="", help="«шторм» FloodWait: початок:кінець, с від старту")
+    parser.add_argument("--digest-mode", choices=("off", "auto", "always"), default="")
+    parser.add_argument("--durable", action="store_true", help="стійка черга (SQLite) замість пам'яті")
+    parser.add_argument("--ai", action="store_true", help="AI-фільтр через stub OpenAI")
+    parser.add_argument("--ai-latency", type=float, default=0.5)
+    parser.add_argument("--ai-spam-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", type=Path, help="робочий каталог (за замовчуванням тимчасовий)")
+    parser.add_argument("--out", type=Path, help="зберегти звіт у JSON")
+    args = parser.parse_args(argv)
+
+    out = args.out.resolve() if args.out else None
+    texts = load_texts(args.dump.resolve() if args.dump else None, args.messages, args.seed)
+    workdir = args.workdir.resolve() if args.workdir else Path(tempfile.mkdtemp(prefix="tgm-loadtest-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    write_config(workdir, args)
+
+    stub = None
+    if args.ai:
+        stub = StubOpenAIServer(latency=args.ai_latency, spam_ratio=args.ai_spam_ratio, seed=args.seed).start()
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-loadtest")
+    try:
+        main_module, bot = import_app(workdir)
+        if args.ai and not bot.OPENAI_AVAILABLE:
+            print("⚠️ Пакет openai не встановлено — AI-фільтр пропускатиметься", file=sys.stderr)
+        report = asyncio.run(drive(main_module, bot, args, texts))
+        main_module.log_writer.stop()
+    finally:
+        if stub is not None:
+            report_ai = {"requests": stub.requests, "max_in_flight": stub.max_in_flight}
+            stub.stop()
+        if not args.workdir:
+            os.chdir(ROOT)
+            shutil.rmtree(workdir, ignore_errors=True)
+    if stub is not None:
+        report["ai"] = report_ai
+
+    print(format_report(report))
+    if stub is not None:
+        print(f"🤖 Запитів до stub OpenAI: {report['ai']['requests']}, "
+              f"одночасно макс.: {report['ai']['max_in_flight']}")
+    if out:
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
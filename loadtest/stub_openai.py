@@ -0,0 +1,118 @@
+"""
+stub_openai.py — Заглушка OpenAI Responses API для навантажувальних тестів.
+POST /v1/responses → відповідь у форматі SDK (output_text = TARGET або SPAM)
+після затримки latency (± jitter). Клієнт openai бере адресу з OPENAI_BASE_URL,
+тож код бота не змінюється:
+
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def response_body(text: str, request_id: int) -> dict:
+    return {
+        "id": f"resp_{request_id}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": "stub",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{request_id}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {"input_tokens": 0, "output_tokens": 1, "total_tokens": 1},
+    }
+
+
+class StubOpenAIServer:
+    """
+    HTTP-сервер у фоновому потоці (кожен запит — свій потік, як паралельні з'єднання).
+    spam_ratio — частка відповідей SPAM; latency/jitter — секунд.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.5,
+                 jitter: float = 0.2, spam_ratio: float = 0.3, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.spam_ratio = spam_ratio
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _reply(self) -> tuple[int, str, float]:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            verdict = "SPAM" if self._rnd.random() < self.spam_ratio else "TARGET"
+            delay = max(0.0, self.latency + self._rnd.uniform(-self.jitter, self.jitter))
+            return self.requests, verdict, delay
+
+    def _done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, як у httpx-клієнта SDK
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                if not self.path.rstrip("/").endswith("/responses"):
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                request_id, verdict, delay = stub._reply()
+                try:
+                    time.sleep(delay)
+                    self._send(200, response_body(verdict, request_id))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # клієнт закрив з'єднання (таймаут або кінець прогону)
+                finally:
+                    stub._done()
+
+            def _send(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # без запису в stderr на кожен запит
+
+        return Handler
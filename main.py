@@ -3,19 +3,40 @@ main.py — User client: моніторинг груп + базова фільт
 Збирає повідомлення та складає в чергу для бота (bot.py).
 """
 
+import atexit
+import copy
 import json
 import asyncio
 import os
+import signal
 import sys
-import re
 import logging
 import logging.handlers
-from datetime import datetime
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Callable, Optional
 from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError
 
+from blocked_store import BlockedStore
+from config_watch import ConfigWatcher, diff_config, validate_config
+from dedup import NearDuplicateIndex
+from metrics import (
+    CLIENT_CONNECTED, CONFIG_VERSION, PIPELINE_EVENTS, QUEUE_DEPTH, QUEUE_DROPPED, QUEUE_OLDEST_AGE, STAGES,
+    serve_metrics,
+)
+from message_queue import BoundedMessageQueue, DurableMessageQueue
+from rules_store import RULE_KEYS, RuleStore, diff_lists
+from journal import EventJournal
+from filters import CompiledFilters, NormalizedMessage, clean_minus_words
+
 # ──────────────────────────────────────────────────────────────
 # Налаштування логування: logs/user_YYYY-MM-DD.log та logs/bot_YYYY-MM-DD.log
 # ──────────────────────────────────────────────────────────────
@@ -28,46 +49,117 @@ _log_format = logging.Formatter(
 )
 
 
-class DailyFileHandler(logging.FileHandler):
-    """Хендлер що автоматично створює новий файл при зміні дати."""
+class LogWriter(threading.Thread):
+    """
+    Фоновий потік запису логів: записи з усіх логерів надходять у чергу в пам'яті,
+    потік форматує їх і пише пакетами — один write+flush на файл і на консоль
+    за пакет. Файл logs/{prefix}_YYYY-MM-DD.log змінюється за датою запису.
+    """
+
+    def __init__(self, logs_dir: Path, batch_size: int = 500):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.logs_dir = logs_dir
+        self.batch_size = batch_size
+        self._streams: dict[str, tuple[str, object]] = {}  # prefix → (дата, файл)
+        self._day = ("", 0.0, 0.0)  # (YYYY-MM-DD, початок доби, кінець доби)
+
+    def _date_of(self, created: float) -> str:
+        date, start, end = self._day
+        if not start <= created < end:
+            day = datetime.fromtimestamp(created).replace(hour=0, minute=0, second=0, microsecond=0)
+            date = day.strftime("%Y-%m-%d")
+            self._day = (date, day.timestamp(), (day + timedelta(days=1)).timestamp())
+        return date
+
+    def _stream(self, prefix: str, date: str):
+        current = self._streams.get(prefix)
+        if current is not None and current[0] == date:
+            return current[1]
+        if current is not None:
+            current[1].close()
+        stream = open(self.logs_dir / f"{prefix}_{date}.log", "a", encoding="utf-8")
+        self._streams[prefix] = (date, stream)
+        return stream
+
+    def run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._write(batch):
+                return
+
+    def _write(self, batch: list) -> bool:
+        """False — отримано сигнал зупинки."""
+        running = True
+        console: list[str] = []
+        files: dict[tuple[str, str], list[str]] = {}
+        for entry in batch:
+            if entry is None:
+                running = False
+                continue
+            prefix, record = entry
+            try:
+                line = _log_format.format(record)
+            except Exception:
+                line = f"{record.levelname} {record.name}: {record.msg!r} (помилка форматування)"
+            console.append(line)
+            files.setdefault((prefix, self._date_of(record.created)), []).append(line)
+        try:
+            for (prefix, date), lines in files.items():
+                stream = self._stream(prefix, date)
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            if console:
+                sys.stderr.write("\n".join(console) + "\n")
+                sys.stderr.flush()
+        except Exception as exc:
+            sys.stderr.write(f"log-writer: {exc}\n")
+        if not running:
+            for _, stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
+        return running
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Дописує все, що в черзі, і зупиняє потік."""
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(timeout)
 
-    def __init__(self, prefix: str, logs_dir: Path):
-        self._prefix = prefix
-        self._logs_dir = logs_dir
-        self._current_date = ""
-        filepath = self._get_filepath()
-        super().__init__(filepath, encoding="utf-8")
 
-    def _get_filepath(self) -> str:
-        today = datetime.now().strftime("%Y-%m-%d")
-        self._current_date = today
-        return str(self._logs_dir / f"{self._prefix}_{today}.log")
+class QueuedLogHandler(logging.handlers.QueueHandler):
+    """Кладе запис у чергу LogWriter — на event loop лише getMessage() без форматування й I/O."""
 
-    def emit(self, record):
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today != self._current_date:
-            self.close()
-            self.baseFilename = self._get_filepath()
-            self.stream = self._open()
-        super().emit(record)
+    def __init__(self, prefix: str, writer: LogWriter):
+        super().__init__(writer.queue)
+        self.prefix = prefix
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait((self.prefix, record))
+
+
+log_writer = LogWriter(LOGS_DIR)
+log_writer.start()
+atexit.register(log_writer.stop)
 
 
 def _setup_logger(name: str, prefix: str) -> logging.Logger:
-    """Створює логер з виводом в консоль + файл logs/{prefix}_YYYY-MM-DD.log."""
+    """Логер з виводом в консоль + файл logs/{prefix}_YYYY-MM-DD.log (через потік log_writer)."""
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
     logger.handlers.clear()
-
-    # Консоль
-    console = logging.StreamHandler()
-    console.setFormatter(_log_format)
-    logger.addHandler(console)
-
-    # Файл з міткою дати
-    file_h = DailyFileHandler(prefix, LOGS_DIR)
-    file_h.setFormatter(_log_format)
-    logger.addHandler(file_h)
-
+    logger.addHandler(QueuedLogHandler(prefix, log_writer))
     return logger
 
 
@@ -104,10 +196,62 @@ CONFIG_DIR.mkdir(exist_ok=True)
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
 # ──────────────────────────────────────────────────────────────
-# Кешований конфіг + lock
+# Конфіг: незмінні версіоновані знімки
 # ──────────────────────────────────────────────────────────────
-_config_cache: Optional[dict] = None
-_config_lock = asyncio.Lock()
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Незмінний знімок конфігу: списки → tuple, словники → read-only mapping.
+    Похідні індекси рахуються один раз при публікації версії.
+    """
+
+    __slots__ = ("_data", "version", "admins_lower", "forward_channel_clean")
+
+    def __init__(self, data: Mapping, version: int = 0):
+        self._data = _freeze(data)
+        self.version = version
+        self.admins_lower = frozenset(a.lower() for a in data.get("admins", ()))
+        self.forward_channel_clean = (data.get("forward_channel") or "").lstrip("@").lower()
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(v{self.version}, {dict(self._data)!r})"
+
+    def to_dict(self) -> dict:
+        """Глибока змінна копія — для редагування і збереження."""
+        return _thaw(self._data)
+
+
+_config: Optional[ConfigSnapshot] = None
+_config_lock = asyncio.Lock()  # лише для записувачів
+_config_version = 0  # збільшується при кожній публікації
+
+# Опційне сховище правил (config["rule_store"] = шлях до SQLite); None — списки живуть у config.json
+rule_store: Optional[RuleStore] = None
+rule_hits: Counter = Counter()  # {(ключ конфігу, правило): спрацювання} — пишуться в сховище пакетами
 
 
 def load_config() -> dict:
@@ -118,40 +262,310 @@ def load_config() -> dict:
         return json.load(f)
 
 
-def save_config(config: dict) -> None:
+def save_config(config: Mapping) -> None:
     """Атомарне збереження через тимчасовий файл."""
     tmp = CONFIG_FILE.with_suffix(".tmp")
     with tmp.open("w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+        json.dump(_thaw(config), f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
     tmp.replace(CONFIG_FILE)
 
 
-async def get_config() -> dict:
-    """Повертає кешований конфіг; при першому виклику читає з диска."""
-    global _config_cache
+def _publish_config(data: Mapping) -> ConfigSnapshot:
+    """Атомарно підміняє поточний знімок новою версією."""
+    global _config, _config_version
+    _config_version += 1
+    snapshot = ConfigSnapshot(data, _config_version)
+    _config = snapshot
+    return snapshot
+
+
+def _read_config(base: Mapping) -> tuple[dict, dict, list[str]]:
+    """
+    Читання + перевірка config.json — у пулі потоків, поза event loop.
+    Зі сховищем правил списки, яких немає у файлі, беруться з base (поточного знімка).
+    """
+    try:
+        raw = load_config()
+    except (OSError, ValueError) as exc:
+        return {}, {}, [f"не вдалося прочитати: {exc}"]
+    errors = validate_config(raw)
+    if errors:
+        return raw, raw, errors
+    data = dict(raw)
+    if rule_store is not None:
+        for key in RULE_KEYS:
+            if key not in data:
+                data[key] = list(base.get(key, ()))
+    return raw, data, []
+
+
+def current_config() -> ConfigSnapshot:
+    """Поточний знімок — одне читання атрибута, без lock і копій."""
+    snapshot = _config
+    if snapshot is None:
+        snapshot = _publish_config(load_config())
+    return snapshot
+
+
+def load_config_copy() -> dict:
+    """Змінна копія поточного знімка — для редагування (диск може відставати через write-behind)."""
+    return current_config().to_dict()
+
+
+async def get_config() -> ConfigSnapshot:
+    """Async-обгортка над current_config() для bot.py."""
+    return current_config()
+
+
+class ConfigPersister:
+    """
+    Write-behind збереження конфігу: зміни вже опубліковані в пам'яті,
+    а на диск пишеться остання версія — не частіше ніж раз на delay секунд,
+    у потоці (save_config з атомарною заміною файлу). flush() — при завершенні.
+    Зі сховищем правил зміни списків ідуть туди окремими рядками, а config.json
+    переписується лише при зміні інших ключів.
+    """
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        self.writes = 0
+        self.coalesced = 0
+        self.last_written: Optional[dict] = None  # для розпізнавання власних записів
+        self._dirty = False
+        self._rule_ops: list[tuple[str, list[str], list[str], str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> bool:
+        return self._dirty or bool(self._rule_ops)
+
+    def schedule(self, json_changed: bool = True, rule_ops=()) -> None:
+        """Позначає конфіг зміненим; запис відбудеться після вікна delay."""
+        if not json_changed and not rule_ops:
+            return
+        if self.pending:
+            self.coalesced += 1
+        self._dirty = self._dirty or json_changed
+        self._rule_ops.extend(rule_ops)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self.pending:
+            await asyncio.sleep(self.delay)
+            try:
+                await self.flush()
+            except Exception as exc:
+                log.error(f"Помилка збереження конфігу: {exc}")
+
+    async def flush(self) -> None:
+        """Записує поточний знімок і зміни правил, якщо є незбережені зміни."""
+        async with self._write_lock:
+            if not self.pending:
+                return
+            snapshot = current_config() if self._dirty else None
+            rule_ops, self._rule_ops = self._rule_ops, []
+            self._dirty = False
+            written = await asyncio.to_thread(self._write, snapshot, rule_ops)
+            if written is not None:
+                self.last_written = written
+            self.writes += 1
+
+    @staticmethod
+    def _write(snapshot: Optional[ConfigSnapshot], rule_ops) -> Optional[dict]:
+        for key, added, removed, added_by in rule_ops:
+            rule_store.apply(key, added, removed, added_by)
+        if snapshot is None:
+            return None
+        data = snapshot.to_dict()
+        if rule_store is not None:
+            data = {k: v for k, v in data.items() if k not in RULE_KEYS}
+        save_config(data)
+        return data
+
+
+config_persister = ConfigPersister()
+
+
+def _rule_ops(old: Mapping, new: Mapping, added_by: str) -> list[tuple[str, list[str], list[str], str]]:
+    """Порядкові зміни списків правил між двома знімками (для сховища правил)."""
+    ops = []
+    for key in RULE_KEYS:
+        if old.get(key, ()) != new.get(key, ()):
+            added, removed = diff_lists(old.get(key, ()), new.get(key, ()))
+            if added or removed:
+                ops.append((key, added, removed, added_by))
+    return ops
+
+
+def _recompile(filters: Optional[CompiledFilters], snapshot: ConfigSnapshot, changed: set[str]) -> CompiledFilters:
+    if filters is None:
+        return CompiledFilters(snapshot, snapshot.version)
+    return filters.updated(snapshot, snapshot.version, changed)
+
+
+async def mutate_config(fn: Callable[[dict], None], added_by: str = "") -> set[str]:
+    """
+    Атомарна зміна конфігу: fn редагує свіжу змінну копію поточного знімка під lock
+    (без втрачених оновлень між конкурентними хендлерами). Повертає множину змінених ключів.
+    Перекомпілюються лише залежні стадії фільтрів (у потоці); на диск — через write-behind.
+    """
+    global _config, _config_version, _filters
     async with _config_lock:
-        if _config_cache is None:
-            _config_cache = load_config()
-        return dict(_config_cache)  # shallow copy
+        old = current_config()
+        before = old.to_dict()
+        data = old.to_dict()
+        fn(data)
+        changed = {k for k in before.keys() | data.keys() if before.get(k) != data.get(k)}
+        if not changed:
+            return changed
+        snapshot = ConfigSnapshot(data, _config_version + 1)
+        base = _filters if _filters is not None and _filters.version == old.version else None
+        filters = await asyncio.to_thread(_recompile, base, snapshot, changed)
+        _config_version = snapshot.version
+        _config = snapshot
+        _filters = filters
+    if rule_store is None:
+        config_persister.schedule()
+    else:
+        config_persister.schedule(bool(changed - set(RULE_KEYS)), _rule_ops(old, snapshot, added_by))
+    configure_runtime(snapshot)
+    return changed
 
 
-async def update_config(config: dict) -> None:
-    """Зберігає конфіг та оновлює кеш."""
-    global _config_cache
+async def update_config(config: Mapping, added_by: str = "") -> set[str]:
+    """Замінює конфіг цілком (через mutate_config)."""
+    def replace(data: dict) -> None:
+        data.clear()
+        data.update(_thaw(config))
+
+    return await mutate_config(replace, added_by)
+
+
+async def reload_config() -> bool:
+    """
+    Перечитує config.json з диска: перевіряє, порівнює з поточним знімком і лише
+    при реальній зміні перекомпілює залежні стадії фільтрів у фоні, атомарно
+    підміняє знімок і логує diff. False — якщо змін немає або конфіг некоректний.
+    """
+    global _config, _config_version, _filters
     async with _config_lock:
-        save_config(config)
-        _config_cache = config
+        old = current_config()
+        raw, data, errors = await asyncio.to_thread(_read_config, old)
+        if errors:
+            log.warning("⚠️ Конфіг не перезавантажено:\n  " + "\n  ".join(errors))
+            return False
+        old_data = old.to_dict()
+        if data == old_data or raw == config_persister.last_written:
+            return False  # наш власний запис або зміна без змісту
+        changed = {k for k in old_data.keys() | data.keys() if old_data.get(k) != data.get(k)}
+        snapshot = ConfigSnapshot(data, _config_version + 1)
+        base = _filters if _filters is not None and _filters.version == old.version else None
+        filters = await asyncio.to_thread(_recompile, base, snapshot, changed)
+        _config_version = snapshot.version
+        _config = snapshot
+        _filters = filters
+    if rule_store is not None and any(k in raw for k in RULE_KEYS):
+        # Списки, розкладені у config.json, переносяться в сховище; файл — без них
+        config_persister.schedule(True, _rule_ops(old, snapshot, "config.json"))
+    configure_runtime(snapshot)
+    changes = diff_config(old_data, data)
+    log.info(f"🔄 Конфіг перезавантажено (v{snapshot.version}):\n  " + "\n  ".join(changes))
+    return True
+
+
+async def init_rule_store() -> None:
+    """
+    Відкриває сховище правил, якщо задано config["rule_store"]. Списки, присутні
+    у config.json, синхронізуються в сховище (файл — джерело правди, якщо їх там розклали),
+    далі config.json зберігається без них. Фільтри компілюються одразу — до старту
+    user client, щоб перші повідомлення не відкинулись як no_keyword.
+    """
+    global rule_store, _filters
+    config = current_config()
+    path = config.get("rule_store")
+    if not path:
+        return
+    store = await asyncio.to_thread(RuleStore, path)
+    stored = await asyncio.to_thread(store.load)
+    rule_store = store
+    async with _config_lock:
+        snapshot = _publish_config({**stored, **config.to_dict()})
+        _filters = await asyncio.to_thread(CompiledFilters, snapshot, snapshot.version)
+    in_json = any(k in config for k in RULE_KEYS)
+    config_persister.schedule(in_json, _rule_ops(stored, snapshot, "config.json"))
+    counts = ", ".join(f"{k}: {len(snapshot.get(k, ()))}" for k in RULE_KEYS)
+    log.info(f"🗄 Сховище правил {path} ({counts})")
+
+
+async def flush_rule_hits() -> None:
+    """Скидає накопичені лічильники спрацювань у сховище правил."""
+    if rule_store is None or not rule_hits:
+        return
+    hits = dict(rule_hits)
+    rule_hits.clear()
+    await asyncio.to_thread(rule_store.record_hits, hits)
+
+
+async def rule_hits_flusher(interval: float = 60.0) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_rule_hits()
+        except Exception as exc:
+            log.error(f"Помилка запису hit_count: {exc}")
 
 
 def invalidate_config_cache() -> None:
-    global _config_cache
-    _config_cache = None
+    """Наступне читання перечитає конфіг з диска (з новою версією)."""
+    global _config
+    _config = None
+
+
+# ──────────────────────────────────────────────────────────────
+# Скомпільовані фільтри (один набір на версію конфігу)
+# ──────────────────────────────────────────────────────────────
+_filters: Optional[CompiledFilters] = None
+
+
+def get_filters(config: ConfigSnapshot) -> CompiledFilters:
+    """Матчер keywords/minus_words + спам-скорер для версії знімка config."""
+    global _filters
+    filters = _filters
+    if filters is None or filters.version != config.version:
+        filters = _filters = CompiledFilters(config, config.version)
+    return filters
 
 
 # ──────────────────────────────────────────────────────────────
 # Черга пересилки (спільна між user та bot)
 # ──────────────────────────────────────────────────────────────
-pending_messages: asyncio.Queue = asyncio.Queue()
+pending_messages = BoundedMessageQueue(maxsize=1000, policy="drop_oldest")
+
+
+async def init_message_queue() -> None:
+    """
+    Стійка черга у config["queue_path"] (за замовчуванням data/queue.db; "" — лише в пам'яті).
+    Викликати до старту user client: непідтверджені повідомлення попереднього запуску
+    повертаються в чергу.
+    """
+    global pending_messages
+    config = current_config()
+    path = config.get("queue_path", "data/queue.db")
+    if not path:
+        return
+    pending_messages = await asyncio.to_thread(
+        DurableMessageQueue,
+        path,
+        maxsize=config.get("queue_max_size", 1000),
+        policy=config.get("queue_overflow_policy", "drop_oldest"),
+        memory_budget=config.get("queue_memory_budget_kb", 2048) * 1024,
+    )
+    pending_messages.on_evict = _record_evicted
+    log.info(f"📦 Стійка черга {path} (відновлено: {pending_messages.recovered})")
 
 # ──────────────────────────────────────────────────────────────
 # Telethon клієнти (сесії зберігаються в data/)
@@ -161,52 +575,37 @@ DATA_DIR.mkdir(exist_ok=True)
 user_client = TelegramClient(str(DATA_DIR / PHONE.replace("+", "")), API_ID, API_HASH)
 bot_client = TelegramClient(str(DATA_DIR / BOT_USERNAME.replace("@", "")), API_ID, API_HASH)
 
+# Журнал рішень конвеєра: data/journal/events_YYYY-MM-DD.jsonl (+ лічильники для /stats)
+journal = EventJournal(DATA_DIR / "journal")
+journal.on_record = lambda event, reason: PIPELINE_EVENTS.inc(event, reason or "")
 
-# ──────────────────────────────────────────────────────────────
-# Утиліти: очищення minus_words
-# ──────────────────────────────────────────────────────────────
-def clean_minus_words(minus_words: list[str], skip_words: list[str], keywords: list[str]) -> list[str]:
-    """
-    Видаляє зі списку мінус-слів ті слова, що є в skip_words або keywords.
-    Повертає новий (очищений) список. НЕ мутує оригінал.
-    """
-    skip_lower = {w.lower() for w in skip_words}
-    kw_lower = {w.lower() for w in keywords}
-    forbidden = skip_lower | kw_lower
 
-    result: list[str] = []
-    seen: set[str] = set()
+def _record_evicted(item) -> None:
+    """Старіше повідомлення, витіснене з переповненої черги, — теж рішення конвеєра."""
+    item = item or {}
+    QUEUE_DROPPED.inc(pending_messages.policy)
+    log.warning(f"🗑 Черга переповнена — витіснено повідомлення з {item.get('chat', '?')}")
+    journal.record("dropped", item.get("chat_id"), item.get("keyword"), "queue_full", chat=item.get("chat"))
 
-    for phrase in minus_words:
-        words = phrase.lower().split()
-        cleaned = [w for w in words if w not in forbidden]
-        new_phrase = " ".join(cleaned).strip()
-        if new_phrase and new_phrase not in seen:
-            result.append(new_phrase)
-            seen.add(new_phrase)
 
-    return result
+pending_messages.on_evict = _record_evicted
 
+# Заблоковані повідомлення з повним текстом для /blocked (відкривається в main())
+blocked_store: Optional[BlockedStore] = None
 
-def has_minus_word(text: str, minus_words: list[str]) -> bool:
-    """True якщо текст містить будь-яке мінус-слово."""
-    text_lower = text.lower()
-    for phrase in minus_words:
-        if phrase.lower() in text_lower:
-            return True
-    return False
 
-
-def find_keyword(text: str, keywords: list[str]) -> str | None:
-    """
-    Повертає перше знайдене ключове слово або None.
-    """
-    text_lower = text.lower()
-    for kw in keywords:
-        pattern = r"(?<!\w)" + re.escape(kw.lower()) + r"(?!\w)"
-        if re.search(pattern, text_lower):
-            return kw
-    return None
+async def init_blocked_store() -> None:
+    """Відкриває config["blocked_store"] (за замовчуванням data/blocked.db; "" — вимкнено)."""
+    global blocked_store
+    config = current_config()
+    path = config.get("blocked_store", "data/blocked.db")
+    if not path:
+        return
+    blocked_store = await asyncio.to_thread(
+        BlockedStore, path,
+        max_rows=config.get("blocked_max_rows", 20000),
+        max_age_days=config.get("blocked_retention_days", 30),
+    )
 
 
 # ──────────────────────────────────────────────────────────────
@@ -244,87 +643,164 @@ def is_admin(chat_username: str, admins: list[str]) -> bool:
 
 
 # ──────────────────────────────────────────────────────────────
-# Локальний евристичний спам-фільтр
+# LRU/TTL кеш
 # ──────────────────────────────────────────────────────────────
-_compiled_triggers: list[re.Pattern] | None = None
-_compiled_triggers_src: list[str] | None = None
-
-
-def _get_compiled_triggers(patterns: list[str]) -> list[re.Pattern]:
-    """Кешує скомпільовані regex-патерни для комерційних тригерів."""
-    global _compiled_triggers, _compiled_triggers_src
-    if _compiled_triggers is not None and _compiled_triggers_src == patterns:
-        return _compiled_triggers
-    _compiled_triggers = [re.compile(p, re.IGNORECASE) for p in patterns]
-    _compiled_triggers_src = patterns
-    return _compiled_triggers
+class TTLCache:
+    """Обмежений LRU-кеш: запис живе ttl секунд, понад maxsize витісняються найстаріші."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._trim()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expired += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        self._trim()
+
+    def _trim(self) -> None:
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
 
 
-def is_service_spam(text: str, config: dict) -> bool:
+# ──────────────────────────────────────────────────────────────
+# Кеш метаданих чатів (без get_chat() на кожне повідомлення)
+# ──────────────────────────────────────────────────────────────
+class ChatInfo:
+    """Метадані чату + прапорці виключення, пораховані для певної версії конфігу."""
+
+    __slots__ = ("chat_id", "title", "username", "usernameid", "name",
+                 "version", "is_forward_channel", "is_admin_chat")
+
+    def __init__(self, chat_id: int, chat):
+        self.chat_id = chat_id
+        self.title = getattr(chat, "title", None) or ""
+        self.username = getattr(chat, "username", None)
+        self.usernameid = getattr(chat, "username", getattr(chat, "id", False))
+        self.name = format_chat(chat)
+        self.version = -1
+        self.is_forward_channel = False
+        self.is_admin_chat = False
+
+    def apply_config(self, config: ConfigSnapshot) -> None:
+        """Перераховує прапорці виключення (лише при зміні версії конфігу)."""
+        fwd_clean = config.forward_channel_clean
+        self.is_forward_channel = bool(
+            fwd_clean and self.usernameid and str(self.usernameid).lower() == fwd_clean
+        )
+        self.is_admin_chat = bool(self.username and "@" + self.username.lower() in config.admins_lower)
+        self.version = config.version
+
+    @property
+    def excluded(self) -> bool:
+        return self.is_forward_channel or self.is_admin_chat
+
+
+chat_cache = TTLCache(maxsize=5000, ttl=3600)
+sender_cache = TTLCache(maxsize=10000, ttl=3600)
+near_duplicates = NearDuplicateIndex(threshold=0.8, window=3600, max_entries=5000)
+
+
+def configure_runtime(config: Mapping) -> None:
+    """Ліміти кешів і черги пересилки з конфігу (при старті та після кожної зміни)."""
+    chat_cache.configure(config.get("chat_cache_size", 5000), config.get("chat_cache_ttl", 3600))
+    sender_cache.configure(config.get("sender_cache_size", 10000), config.get("sender_cache_ttl", 3600))
+    journal.retention_days = config.get("journal_retention_days", 30)
+    if blocked_store is not None:
+        blocked_store.max_rows = config.get("blocked_max_rows", 20000)
+        blocked_store.max_age_days = config.get("blocked_retention_days", 30)
+    near_duplicates.configure(
+        config.get("dedup_threshold", 0.8), config.get("dedup_window", 3600), config.get("dedup_max_entries", 5000)
+    )
+    try:
+        pending_messages.configure(
+            config.get("queue_max_size", 1000), config.get("queue_overflow_policy", "drop_oldest")
+        )
+    except ValueError as exc:
+        log.warning(f"⚠️ {exc}")
+
+
+async def get_chat_info(event, config: ConfigSnapshot) -> ChatInfo:
+    """ChatInfo з кешу; event.get_chat() — лише при промаху."""
+    info = chat_cache.get(event.chat_id)
+    if info is None:
+        info = ChatInfo(event.chat_id, await event.get_chat())
+        chat_cache.put(event.chat_id, info)
+    if info.version != config.version:
+        info.apply_config(config)
+    return info
+
+
+async def resolve_sender_name(sender_id: Optional[int], input_peer=None) -> str:
     """
-    Локальний евристичний фільтр: виявляє комерційний спам.
-    True = спам, False = не спам.
+    Ім'я відправника для поста — лише для повідомлень, що реально пересилаються.
+    Результат кешується в sender_cache; при помилці повертає id (без кешування).
     """
-    t = text.lower()
-    score = 0
-
-    # 1. Комерційні тригери (regex з конфігу)
-    triggers = config.get("spam_commercial_triggers", [])
-    if triggers:
-        compiled = _get_compiled_triggers(triggers)
-        triggers_found = sum(1 for p in compiled if p.search(t))
-        if triggers_found >= 3:
-            score += 4
-        elif triggers_found >= 2:
-            score += 3
-        elif triggers_found == 1:
-            score += 1
-
-    # 2. Емодзі прайс-листів
-    spam_emojis = config.get("spam_emojis", "")
-    if spam_emojis:
-        emoji_pattern = f"[{re.escape(spam_emojis)}]"
-        emoji_count = len(re.findall(emoji_pattern, text))
-        if emoji_count >= 6:
-            score += 3
-        elif emoji_count >= 3:
-            score += 1
-
-    # 3. Перелік послуг
-    services = config.get("spam_services", [])
-    if services:
-        services_found = sum(1 for s in services if s in t)
-        if services_found >= 5:
-            score += 4
-        elif services_found >= 3:
-            score += 2
-        elif services_found >= 2:
-            score += 1
-
-    # 4. Ціни в тексті
-    prices = len(re.findall(r"\d+\s*(?:[€$]|eur|usd)\b", t))
-    if prices >= 3:
-        score += 4
-    elif prices >= 2:
-        score += 3
-    elif prices == 1:
-        score += 1
-
-    # 5. Контактні патерни
-    if re.search(r"\+?\d[\d\s\-]{8,}", text):
-        score += 1
-    if re.search(r"contact.{0,10}privado|privado.{0,5}📱|в лс|в личк|telegram.{0,5}@", t):
-        score += 2
-
-    # 6. Рядки з маркерами прайс-листів
-    bullet_lines = len(re.findall(r"^[✓✔•►▸→]\s*\S", text, re.MULTILINE))
-    if bullet_lines >= 4:
-        score += 3
-    elif bullet_lines >= 2:
-        score += 1
-
-    threshold = config.get("spam_score_threshold", 4)
-    return score >= threshold
+    if not sender_id:
+        return ""
+    name = sender_cache.get(sender_id)
+    if name is None:
+        try:
+            name = format_sender(await user_client.get_entity(input_peer or sender_id))
+        except Exception as exc:
+            log.warning(f"⚠️ Не вдалося отримати відправника {sender_id}: {exc}")
+            return f"[ {sender_id} ]"
+        sender_cache.put(sender_id, name)
+    return name
+
+
+async def prewarm_chat_cache(client: TelegramClient) -> None:
+    """Заповнює кеш чатів зі списку діалогів (групи/канали) при старті."""
+    count = 0
+    try:
+        async for dialog in client.iter_dialogs(limit=chat_cache.maxsize):
+            if dialog.is_group or dialog.is_channel:
+                chat_cache.put(dialog.id, ChatInfo(dialog.id, dialog.entity))
+                count += 1
+        log.info(f"🗂 Кеш чатів прогріто: {count}")
+    except Exception as exc:
+        log.warning(f"⚠️ Не вдалося прогріти кеш чатів: {exc}")
 
 
 # ──────────────────────────────────────────────────────────────
@@ -332,38 +808,39 @@ def is_service_spam(text: str, config: dict) -> bool:
 # ──────────────────────────────────────────────────────────────
 @user_client.on(events.NewMessage(incoming=True))
 async def monitor(event):
+    received_at = time.time()
+    started = time.perf_counter()
     text = event.message.text
     if not text:
+        PIPELINE_EVENTS.inc("ignored", "no_text")
         return
 
-    config = await get_config()
-
-    chat = await event.get_chat()
-    chat_usernameid = getattr(chat, "username", getattr(chat, "id", False))
-
-    # Виключити канал пересилки
-    fwd_ch = config.get("forward_channel", "")
-    if fwd_ch and chat_usernameid:
-        fwd_clean = fwd_ch.lstrip("@").lower()
-        if str(chat_usernameid).lower() == fwd_clean:
-            return
-
-    # Виключити чати з адмінами зі списку моніторингу
-    if getattr(chat, "username", False) and is_admin(getattr(chat, "username", False), config.get("admins", [])):
-        return
+    config = current_config()
+    filters = get_filters(config)
 
-    # Перевірка мінус-слів
-    if has_minus_word(text, config.get("minus_words", [])):
+    # Виключити канал пересилки та чати з адмінами зі списку моніторингу
+    with STAGES.time("get_chat"):
+        chat = await get_chat_info(event, config)
+    if chat.excluded:
+        PIPELINE_EVENTS.inc("ignored", "excluded_chat")
         return
-
-    # Пошук ключового слова
-    found_keyword = find_keyword(text, config.get("keywords", []))
-    if not found_keyword:
+    chat_usernameid = chat.usernameid
+
+    # Нормалізований вигляд — один на всі стадії фільтрації (і на дедуплікацію нижче).
+    # Мінус-слова + ключові слова (один прохід; опечатки — якщо увімкнено), далі
+    # локальний спам-фільтр без API — та сама логіка, що й у replay.py
+    msg = NormalizedMessage(text)
+    decision = filters.decide(msg, STAGES)
+    found_keyword = decision.keyword
+    if decision.verdict in ("minus_word", "no_keyword"):
+        PIPELINE_EVENTS.inc("ignored", decision.verdict)
+        if decision.minus_word and rule_store is not None:
+            rule_hits["minus_words", decision.minus_word] += 1
         return
+    if rule_store is not None:
+        rule_hits["keywords", found_keyword] += 1
 
-    sender = await event.get_sender()
-    chat_name = format_chat(chat)
-    sender_name = format_sender(sender)
+    chat_name = chat.name
 
     # Посилання на оригінальне повідомлення
     if chat_usernameid:
@@ -371,20 +848,82 @@ async def monitor(event):
     else:
         msg_link = ''
 
-    # Локальний спам-фільтр (без API)
-    if is_service_spam(text, config):
+    spam = decision.spam
+    if decision.verdict == "spam_score":
         log.info(f"🛑 Локальний фільтр заблокував: {text[:60]}… з {chat_name}")
+        journal.record(
+            "local_blocked", event.chat_id, found_keyword, "spam_score",
+            score=spam.score, features={k: v for k, v in spam.features.items() if v},
+            chat=chat_name, text=text[:200],
+        )
+        if blocked_store is not None:
+            reasons = ", ".join(k for k, v in spam.features.items() if v)
+            blocked_store.add("local_blocked", event.chat_id, chat_name, found_keyword, text,
+                              reason=reasons, score=spam.score)
         return
 
-    # Додати в чергу для бота
-    await pending_messages.put({
+    item = {
         "keyword": found_keyword,
         "chat": chat_name,
-        "sender": sender_name,
+        # Ім'я відправника резолвить background_forwarder — лише для пересланих
+        "sender_id": event.sender_id,
+        "chat_id": event.chat_id,
+        "sender_peer": event.input_sender,
         "text": text if len(text) <= 1000 else text[:1000] + "…",
         "link": msg_link,
+        "received_at": received_at,  # для end-to-end затримки в /perf
+    }
+
+    # Майже-дублікат уже баченого (репост з дрібними правками) — не ставимо в чергу вдруге
+    dedup_mode = config.get("dedup_mode", "annotate")
+    signature = None
+    if dedup_mode != "off":
+        if dedup_mode == "annotate":
+            # За цим id пересилка, взявши елемент з черги, забере «також у N чатах»
+            item["dedup_id"] = uuid.uuid4().hex
+        with STAGES.time("dedup"):
+            signature = near_duplicates.signature(msg)
+            original = near_duplicates.check(msg, chat_name, item.get("dedup_id"), signature=signature)
+        if original is not None:
+            log.info(f"♻️ Дублікат з {chat_name} (вже бачили у {len(original.chats) - 1} чатах) — пропущено")
+            journal.record("dropped", event.chat_id, found_keyword, "duplicate", chat=chat_name)
+            return
+
+    # Додати в чергу для бота (при переповненні спрацьовує queue_overflow_policy)
+    priority = config.get("keyword_priorities", {}).get(found_keyword, 0)
+    item["queued_at"] = time.time()
+    with STAGES.time("enqueue"):
+        queued = await pending_messages.put(item, priority)
+    STAGES.observe("monitor", time.perf_counter() - started)
+    if queued:
+        log.info(f"📥 Додано в чергу з {chat_name} (черга: {pending_messages.qsize()})")
+        journal.record("queued", event.chat_id, found_keyword, chat=chat_name, priority=priority or None)
+    else:
+        QUEUE_DROPPED.inc(pending_messages.policy)
+        if signature is not None:
+            near_duplicates.discard(signature)  # не пересилається — не еталон для дублікатів
+        log.warning(f"🗑 Черга переповнена — відкинуто повідомлення з {chat_name} (пріоритет {priority})")
+        journal.record("dropped", event.chat_id, found_keyword, "queue_full", chat=chat_name)
+
+
+async def start_metrics() -> None:
+    """HTTP-ендпоінт /metrics, якщо задано config["metrics_port"] (читається при старті)."""
+    config = current_config()
+    port = config.get("metrics_port", 0)
+    if not port:
+        return
+    # Обчислюються лише під час scrape; pending_messages — поточна (можливо, стійка) черга
+    QUEUE_DEPTH.set_function(lambda: pending_messages.qsize())
+    QUEUE_OLDEST_AGE.set_function(lambda: pending_messages.oldest_age())
+    CONFIG_VERSION.set_function(lambda: current_config().version)
+    CLIENT_CONNECTED.set_function(lambda: {
+        ("user",): int(user_client.is_connected()),
+        ("bot",): int(bot_client.is_connected()),
     })
-    log.info(f"📥 Додано в чергу з {chat_name} (черга: {pending_messages.qsize()})")
+    try:
+        await serve_metrics(config.get("metrics_host", "127.0.0.1"), port)
+    except OSError as exc:
+        log.error(f"❌ Не вдалося запустити метрики на порту {port}: {exc}")
 
 
 # ──────────────────────────────────────────────────────────────
@@ -398,10 +937,30 @@ async def main():
         auto_create_bot, auto_promote_bot_in_channel,
     )
 
+    # Стійка черга пересилки та сховище заблокованих — до старту моніторингу
+    await init_message_queue()
+    await init_blocked_store()
+
+    # Опційне сховище правил (SQLite) — до старту моніторингу: без нього в конфігу немає keywords
+    await init_rule_store()
+    if rule_store is not None:
+        asyncio.create_task(rule_hits_flusher())
+
     # Запуск user client
     await user_client.start()
     log.info("✅ User client запущено (моніторинг)")
 
+    # Ліміти кешів/черги з конфігу + прогрів кешу чатів зі списку діалогів у фоні
+    configure_runtime(await get_config())
+    asyncio.create_task(prewarm_chat_cache(user_client))
+    asyncio.create_task(journal.run())
+    await start_metrics()
+    if blocked_store is not None:
+        asyncio.create_task(blocked_store.run())
+
+    # Гаряче перезавантаження config/config.json
+    asyncio.create_task(ConfigWatcher(CONFIG_FILE, reload_config).run())
+
     # Авто-створення бота якщо токен відсутній
     if not BOT_TOKEN or BOT_TOKEN == "YOUR_BOT_TOKEN_FROM_BOTFATHER":
         try:
@@ -423,15 +982,22 @@ async def main():
         user_client=user_client,
         pending_messages=pending_messages,
         get_config_fn=get_config,
-        load_config_fn=load_config,
-        update_config_fn=update_config,
+        mutate_config_fn=mutate_config,
         is_admin_fn=is_admin,
         clean_minus_words_fn=clean_minus_words,
+        chat_cache=chat_cache,
+        sender_cache=sender_cache,
+        near_duplicates=near_duplicates,
+        journal=journal,
+        blocked_store=blocked_store,
+        rule_store=rule_store,
     )
 
     # Фонова пересилка (в контексті бота)
     asyncio.create_task(
-        background_forwarder(bot_client, pending_messages, get_config, load_config, update_config)
+        background_forwarder(bot_client, pending_messages, get_config,
+                             resolve_sender_fn=resolve_sender_name, journal=journal,
+                             blocked_store=blocked_store, near_duplicates=near_duplicates)
     )
 
     log.info("🚀 Обидва клієнти працюють")
@@ -444,11 +1010,27 @@ async def main():
     else:
         log.warning("⚠️ Канал пересилки не налаштовано — використай /set_channel @канал")
 
+    # SIGTERM (systemctl stop) → скасування main(), щоб спрацював finally
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, RuntimeError):
+        pass
+
     # Запускаємо обидва клієнти паралельно
-    await asyncio.gather(
-        user_client.run_until_disconnected(),
-        bot_client.run_until_disconnected(),
-    )
+    try:
+        await asyncio.gather(
+            user_client.run_until_disconnected(),
+            bot_client.run_until_disconnected(),
+        )
+    finally:
+        # Незбережені зміни конфігу та лічильники правил — на диск перед виходом
+        await config_persister.flush()
+        await flush_rule_hits()
+        await journal.flush()
+        if blocked_store is not None:
+            await blocked_store.flush()
+        if isinstance(pending_messages, DurableMessageQueue):
+            await pending_messages.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+"""
+message_queue.py — Черга пересилки між monitor() та background_forwarder (без залежності від Telethon).
+BoundedMessageQueue — обмежена черга в пам'яті з політиками переповнення.
+DurableMessageQueue — те саме поверх SQLite (WAL): доставка at-least-once з ack,
+відновлення після падіння, пакетний fsync і вивантаження на диск понад бюджет пам'яті.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+POLICIES = ("drop_oldest", "drop_newest", "drop_lowest_priority")
+
+
+class QueueEntry:
+    """Елемент черги. item=None — вміст вивантажено на диск (лише у DurableMessageQueue)."""
+
+    __slots__ = ("enqueued_at", "priority", "item", "key", "size")
+
+    def __init__(self, enqueued_at: float, priority: int, item: Any, key: int = 0, size: int = 0):
+        self.enqueued_at = enqueued_at  # time.monotonic()
+        self.priority = priority
+        self.item = item
+        self.key = key
+        self.size = size
+
+
+class BoundedMessageQueue:
+    """
+    Інтерфейс як у asyncio.Queue (put / get / task_done / qsize), але put() ніколи
+    не блокує моніторинг: при maxsize спрацьовує політика переповнення.
+    maxsize=0 — без обмеження.
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = "drop_oldest"):
+        self._entries: deque[QueueEntry] = deque()
+        self._not_empty = asyncio.Event()
+        self._unfinished = 0
+        self.enqueued = 0
+        self.dropped = {policy: 0 for policy in POLICIES}
+        # Виклик на кожен витіснений переповненням елемент (None — вміст лише на диску)
+        self.on_evict: Optional[Callable[[Any], None]] = None
+        self.maxsize = 0
+        self.policy = POLICIES[0]
+        self.configure(maxsize, policy)
+
+    def configure(self, maxsize: int, policy: str) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"невідома політика черги: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        while self.maxsize and len(self._entries) > self.maxsize:
+            self._evict()
+
+    # ── asyncio.Queue-сумісний інтерфейс ──
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def empty(self) -> bool:
+        return not self._entries
+
+    async def put(self, item: Any, priority: int = 0) -> bool:
+        return self.put_nowait(item, priority)
+
+    def put_nowait(self, item: Any, priority: int = 0) -> bool:
+        """False — якщо відкинуто саме це повідомлення."""
+        if self.maxsize and len(self._entries) >= self.maxsize:
+            if self.policy == "drop_newest" or (
+                self.policy == "drop_lowest_priority" and priority < self._lowest()[1].priority
+            ):
+                self.dropped[self.policy] += 1
+                return False
+            self._evict()
+        entry = QueueEntry(time.monotonic(), priority, item)
+        self._on_enqueue(entry)
+        self._entries.append(entry)
+        self._unfinished += 1
+        self.enqueued += 1
+        self._not_empty.set()
+        return True
+
+    async def get(self) -> Any:
+        while not self._entries:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self._take()
+
+    def get_nowait(self) -> Any:
+        if not self._entries:
+            raise asyncio.QueueEmpty
+        return self._take()
+
+    def _take(self) -> Any:
+        entry = self._entries.popleft()
+        self._on_dequeue(entry)
+        return entry.item
+
+    def task_done(self, item: Any = None) -> None:
+        """
+        item — елемент, отриманий з get(): підтверджується саме він (потрібно, коли
+        елементи підтверджуються не в порядку видачі, напр. дайджестом). Без item — найстаріший.
+        """
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        self._on_ack(item)
+
+    # ── Хуки для сховища (DurableMessageQueue) ──
+    def _on_enqueue(self, entry: QueueEntry) -> None:
+        pass
+
+    def _on_dequeue(self, entry: QueueEntry) -> None:
+        pass
+
+    def _on_drop(self, entry: QueueEntry) -> None:
+        pass
+
+    def _on_ack(self, item: Any) -> None:
+        pass
+
+    # ── Переповнення ──
+    def _lowest(self) -> tuple[int, QueueEntry]:
+        """Найнижчий пріоритет; серед рівних — найстаріше."""
+        return min(enumerate(self._entries), key=lambda pair: pair[1].priority)
+
+    def _evict(self) -> None:
+        if self.policy == "drop_lowest_priority":
+            index, entry = self._lowest()
+            del self._entries[index]
+        else:
+            entry = self._entries.popleft()
+        self._unfinished -= 1
+        self.dropped[self.policy] += 1
+        self._on_drop(entry)
+        if self.on_evict is not None:
+            self.on_evict(entry.item)
+
+    # ── Статистика ──
+    def oldest_age(self) -> float:
+        """Скільки секунд чекає найстаріше повідомлення (0 — черга порожня)."""
+        if not self._entries:
+            return 0.0
+        return time.monotonic() - self._entries[0].enqueued_at  # порядок надходження зберігається
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "dropped": dict(self.dropped),
+            "dropped_total": sum(self.dropped.values()),
+            "oldest_age": self.oldest_age(),
+        }
+
+
+# ──────────────────────────────────────────────────────────────
+# Стійка черга (SQLite WAL)
+# ──────────────────────────────────────────────────────────────
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id          INTEGER PRIMARY KEY,
+    enqueued_at REAL    NOT NULL,
+    priority    INTEGER NOT NULL DEFAULT 0,
+    payload     TEXT    NOT NULL
+);
+"""
+
+
+def _dump(item: Any) -> str:
+    # Непереносні об'єкти (напр. InputPeer відправника) на диск не пишуться — лише None
+    return json.dumps(item, ensure_ascii=False, default=lambda _: None)
+
+
+class DurableMessageQueue(BoundedMessageQueue):
+    """
+    Кожен put() потрапляє в пакет на запис; пакети комітяться у фоновому потоці
+    раз на flush_interval (один fsync на пакет). Рядок видаляється лише після
+    task_done() — незавершене повертається в чергу після перезапуску (at-least-once).
+    Понад memory_budget байт вміст повідомлень тримається лише на диску
+    і підвантажується пакетами, коли черга до нього доходить.
+    """
+
+    def __init__(
+        self,
+        path: "str | Path",
+        maxsize: int = 1000,
+        policy: str = "drop_oldest",
+        memory_budget: int = 2 * 1024 * 1024,
+        flush_interval: float = 0.2,
+    ):
+        self.path = Path(path)
+        self.memory_budget = memory_budget
+        self.flush_interval = flush_interval
+        self.memory_bytes = 0
+        self.spilled = 0  # к-сть елементів, вміст яких лише на диску
+        self.flushes = 0
+        self.recovered = 0
+        self._next_key = 1
+        self._inflight: dict[int, tuple[int, Any]] = {}  # id(item) → (ключ, item): видані get(), ще без task_done()
+        self._inserts: dict[int, tuple] = {}  # ще не записані на диск
+        self._writing: dict[int, tuple] = {}  # пакет, що саме записується
+        self._deletes: set[int] = set()
+        self._dirty = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._db_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        super().__init__(maxsize, policy)
+        self._recover()
+
+    # ── Відновлення ──
+    def _recover(self) -> None:
+        """Завантажує непідтверджені повідомлення попереднього запуску (метадані; вміст — в межах бюджету)."""
+        now_wall, now_mono = time.time(), time.monotonic()
+        rows = self._db.execute(
+            "SELECT id, enqueued_at, priority, length(payload) FROM queue ORDER BY id"
+        ).fetchall()
+        for key, enqueued_wall, priority, size in rows:
+            entry = QueueEntry(now_mono - max(now_wall - enqueued_wall, 0.0), priority, None, key, size)
+            self._entries.append(entry)
+            self._next_key = key + 1
+        self.spilled = len(rows)
+        self._unfinished = len(rows)
+        self.recovered = len(rows)
+        if rows:
+            self._not_empty.set()
+            self._page_in_sync()
+
+    # ── Хуки ──
+    def _on_enqueue(self, entry: QueueEntry) -> None:
+        entry.key = self._next_key
+        self._next_key += 1
+        payload = _dump(entry.item)
+        entry.size = len(payload)
+        self._inserts[entry.key] = (entry.key, time.time(), entry.priority, payload)
+        if self.memory_bytes + entry.size > self.memory_budget:
+            entry.item = None  # вміст — лише в пакеті на запис, після flush — лише на диску
+            self.spilled += 1
+        else:
+            self.memory_bytes += entry.size
+        self._schedule_flush()
+
+    def _forget(self, entry: QueueEntry) -> None:
+        if entry.item is None:
+            self.spilled -= 1
+        else:
+            self.memory_bytes -= entry.size
+
+    def _on_dequeue(self, entry: QueueEntry) -> None:
+        self._forget(entry)
+        self._inflight[id(entry.item)] = (entry.key, entry.item)
+
+    def _on_drop(self, entry: QueueEntry) -> None:
+        self._forget(entry)
+        self._delete(entry.key)
+
+    def _on_ack(self, item: Any) -> None:
+        pending = self._inflight.pop(id(item), None) if item is not None else None
+        if pending is None and self._inflight:
+            pending = self._inflight.pop(next(iter(self._inflight)))
+        if pending is not None:
+            self._delete(pending[0])
+
+    def _delete(self, key: int) -> None:
+        if self._inserts.pop(key, None) is None:  # ще не записаний — просто не пишемо
+            self._deletes.add(key)
+            self._schedule_flush()
+
+    # ── Видача з підвантаженням вмісту з диска ──
+    async def get(self) -> Any:
+        while True:
+            while not self._entries:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+            if self._entries[0].item is None:
+                await self._page_in()
+                if not self._entries or self._entries[0].item is None:
+                    continue  # поки підвантажували, елемент відкинуто
+            return self._take()
+
+    def get_nowait(self) -> Any:
+        if self._entries and self._entries[0].item is None:
+            self._page_in_sync()
+        return super().get_nowait()
+
+    def _spilled_head(self) -> list[QueueEntry]:
+        """Вивантажені елементи з голови черги, що влазять у бюджет пам'яті (мінімум один)."""
+        batch, budget = [], self.memory_budget - self.memory_bytes
+        for entry in self._entries:
+            if entry.item is not None:
+                continue
+            if batch and entry.size > budget:
+                break
+            batch.append(entry)
+            budget -= entry.size
+        return batch
+
+    def _apply_page(self, batch: list[QueueEntry], payloads: dict[int, str]) -> None:
+        # Поки читали з диска, елемент могли відкинути переповненням чи видати —
+        # лічильники для нього вже скориговані в _forget(), тож такі пропускаємо
+        queued = {id(entry) for entry in self._entries}
+        for entry in batch:
+            payload = payloads.get(entry.key)
+            if payload is None or entry.item is not None or id(entry) not in queued:
+                continue
+            entry.item = json.loads(payload)
+            self.spilled -= 1
+            self.memory_bytes += entry.size
+
+    def _read_payloads(self, keys: list[int]) -> dict[int, str]:
+        payloads = {}
+        for key in keys:
+            pending = self._inserts.get(key) or self._writing.get(key)
+            if pending is not None:
+                payloads[key] = pending[3]
+        missing = [k for k in keys if k not in payloads]
+        if missing:
+            marks = ", ".join("?" * len(missing))
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT id, payload FROM queue WHERE id IN ({marks})", missing
+                ).fetchall()
+            payloads.update(rows)
+        return payloads
+
+    async def _page_in(self) -> None:
+        batch = self._spilled_head()
+        keys = [e.key for e in batch]
+        payloads = await asyncio.to_thread(self._read_payloads, keys)
+        self._apply_page(batch, payloads)
+
+    def _page_in_sync(self) -> None:
+        batch = self._spilled_head()
+        self._apply_page(batch, self._read_payloads([e.key for e in batch]))
+
+    # ── Пакетний запис ──
+    def _schedule_flush(self) -> None:
+        self._dirty.set()
+        if self._flusher is None or self._flusher.done():
+            try:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+            except RuntimeError:
+                pass  # без event loop (відновлення/тести) — запише flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записує накопичені вставки/видалення однією транзакцією (один fsync) у потоці."""
+        async with self._flush_lock:
+            self._dirty.clear()
+            if not self._inserts and not self._deletes:
+                return
+            self._writing, self._inserts = self._inserts, {}
+            deletes, self._deletes = self._deletes, set()
+            try:
+                await asyncio.to_thread(self._write, list(self._writing.values()), deletes)
+            except Exception:
+                # Повернути пакет, щоб не загубити — наступна спроба з наступним flush
+                self._inserts = {**self._writing, **self._inserts}
+                self._deletes |= deletes
+                self._dirty.set()
+                raise
+            finally:
+                self._writing = {}
+            self.flushes += 1
+
+    def _write(self, inserts: list[tuple], deletes: set[int]) -> None:
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO queue (id, enqueued_at, priority, payload) VALUES (?, ?, ?, ?)",
+                inserts,
+            )
+            self._db.executemany("DELETE FROM queue WHERE id = ?", ((k,) for k in deletes))
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        st = super().stats()
+        st.update({
+            "durable": True,
+            "memory_bytes": self.memory_bytes,
+            "memory_budget": self.memory_budget,
+            "spilled": self.spilled,
+            "unacked": len(self._inflight),
+            "unflushed": len(self._inserts) + len(self._deletes),
+            "flushes": self.flushes,
+            "recovered": self.recovered,
+        })
+        return st
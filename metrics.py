@@ -0,0 +1,261 @@
+"""
+metrics.py — Метрики у текстовому форматі Prometheus (без залежності від Telethon
+і prometheus_client). Лічильники/гістограми оновлюються словниковою операцією
+в тому ж event loop; gauge-и з функціями обчислюються лише під час scrape.
+Опційний HTTP-ендпоінт /metrics на asyncio.start_server.
+StageTimers — затримки стадій конвеєра (p50/p95/p99 у ковзному вікні) для /perf.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+log = logging.getLogger("monitor")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Значення задається set() або обчислюється функцією під час scrape (set_function)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+        self._function: Optional[Callable[[], "float | dict[tuple, float]"]] = None
+
+    def set(self, value: float, *label_values) -> None:
+        self._values[label_values] = value
+
+    def set_function(self, fn: Callable[[], "float | dict[tuple, float]"]) -> None:
+        """fn() → число (без міток) або {значення міток: число}."""
+        self._function = fn
+
+    def samples(self) -> list[str]:
+        values = self._values
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception as exc:
+                log.warning(f"⚠️ Метрика {self.name}: {exc}")
+                return []
+            values = result if isinstance(result, dict) else {(): result}
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # мітки → [лічильники кошиків…, сума, к-сть]
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"метрика {metric.name} вже зареєстрована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ──────────────────────────────────────────────────────────────
+# Метрики процесу (оновлюються в main.py і bot.py)
+# ──────────────────────────────────────────────────────────────
+PIPELINE_EVENTS = REGISTRY.register(Counter(
+    "tgmonitor_pipeline_events_total", "Рішення конвеєра monitor()/background_forwarder", ("event", "reason"),
+))
+FLOOD_WAITS = REGISTRY.register(Counter(
+    "tgmonitor_flood_waits_total", "К-сть FloodWait від Telegram", ("client",),
+))
+FLOOD_WAIT_SECONDS = REGISTRY.register(Counter(
+    "tgmonitor_flood_wait_seconds_total", "Сумарне очікування через FloodWait, с", ("client",),
+))
+AI_LATENCY = REGISTRY.register(Histogram(
+    "tgmonitor_ai_request_seconds", "Тривалість запиту до AI-фільтра, с",
+    (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30), ("result",),
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge("tgmonitor_queue_depth", "Повідомлень у черзі пересилки"))
+QUEUE_OLDEST_AGE = REGISTRY.register(Gauge(
+    "tgmonitor_queue_oldest_age_seconds", "Скільки чекає найстаріше повідомлення в черзі, с",
+))
+QUEUE_DROPPED = REGISTRY.register(Counter(
+    "tgmonitor_queue_dropped_total", "Відкинуто чергою при переповненні", ("policy",),
+))
+CONFIG_VERSION = REGISTRY.register(Gauge("tgmonitor_config_version", "Версія опублікованого знімка конфігу"))
+CLIENT_CONNECTED = REGISTRY.register(Gauge(
+    "tgmonitor_client_connected", "Стан з'єднання Telethon-клієнта (1 — підключено)", ("client",),
+))
+
+
+# ──────────────────────────────────────────────────────────────
+# Затримки стадій (/perf)
+# ──────────────────────────────────────────────────────────────
+def _percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageTimers:
+    """
+    На кожну стадію — кільцевий буфер останніх size вимірів (час, тривалість):
+    пам'ять фіксована, запис — append у deque. Перцентилі рахуються лише
+    на запит, по вимірах за останні window секунд.
+    """
+
+    def __init__(self, size: int = 2048, window: float = 900):
+        self.size = size
+        self.window = window
+        self._samples: dict[str, deque] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self.size)
+        samples.append((time.monotonic(), seconds))
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def percentiles(self, window: Optional[float] = None) -> dict[str, dict[str, float]]:
+        """{стадія: {count, p50, p95, p99, max}} за останні window секунд (секунди)."""
+        since = time.monotonic() - (window or self.window)
+        result = {}
+        for stage, samples in self._samples.items():
+            values = sorted(v for t, v in list(samples) if t >= since)
+            if values:
+                result[stage] = {
+                    "count": len(values),
+                    "p50": _percentile(values, 0.50),
+                    "p95": _percentile(values, 0.95),
+                    "p99": _percentile(values, 0.99),
+                    "max": values[-1],
+                }
+        return result
+
+
+STAGES = StageTimers()
+
+
+# ──────────────────────────────────────────────────────────────
+# HTTP-ендпоінт
+# ──────────────────────────────────────────────────────────────
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, registry: Registry) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)).strip():
+            pass  # заголовки не потрібні
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            body = registry.render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int, registry: Registry = REGISTRY) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, registry), host, port)
+    log.info(f"📈 Метрики: http://{host}:{port}/metrics")
+    return server
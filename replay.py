@@ -0,0 +1,293 @@
+"""
+replay.py — Офлайн-прогін вивантажених повідомлень через фільтри (без Telethon).
+Рішення — ті самі, що в monitor(): CompiledFilters.decide() (мінус-слова,
+ключові слова, спам-скорер), далі дедуплікація для тих, що пішли б у чергу.
+AI-фільтр і виключення чатів не застосовуються.
+
+Вхід — JSONL або CSV з полями text, chat, sender (зайві поля ігноруються).
+Якщо в конфігу задано rule_store, списки правил беруться зі сховища SQLite.
+Великі дампи діляться на пакети між процесами (разом із MinHash-підписами —
+найдорожчою частиною дедуплікації); пошук дублікатів за підписами (стан у часі) —
+послідовно в головному процесі, у порядку повідомлень дампу.
+
+    python replay.py config/config.json dump.jsonl
+    python replay.py config/config.json dump.csv --compare new.json --show 50
+    python replay.py config/config.json dump.jsonl --jobs 8 --json report.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from config_watch import validate_config
+from dedup import NearDuplicateIndex
+from filters import CompiledFilters, NormalizedMessage
+from rules_store import RuleStore
+
+REPLAY_VERDICTS = ("no_text", "minus_word", "no_keyword", "spam_score", "duplicate", "queued")
+CHUNK_SIZE = 500
+
+
+class Message(NamedTuple):
+    index: int
+    text: str
+    chat: str
+    sender: str
+
+
+class Verdict(NamedTuple):
+    verdict: str
+    keyword: Optional[str] = None
+    detail: Optional[str] = None  # мінус-слово або спам-бал
+
+
+# ──────────────────────────────────────────────────────────────
+# Вхід
+# ──────────────────────────────────────────────────────────────
+def read_messages(path: Path, fmt: str = "") -> Iterator[Message]:
+    """Потоково: JSONL (рядок — об'єкт) або CSV із заголовком. fmt — jsonl/csv, інакше за розширенням."""
+    fmt = fmt or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            rows: Iterable = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            yield Message(
+                index,
+                str(row.get("text") or ""),
+                str(row.get("chat") or ""),
+                str(row.get("sender") or ""),
+            )
+
+
+def load_replay_config(path: Path) -> dict:
+    """
+    config.json + списки правил зі сховища (rule_store), як у main.init_rule_store():
+    списки, присутні у файлі, мають перевагу. Шлях сховища — відносно поточного каталогу, як у бота.
+    """
+    data = json.loads(path.read_text(encoding="utf-8"))
+    errors = validate_config(data)
+    if errors:
+        raise ValueError(f"{path}: " + "; ".join(errors))
+    store_path = data.get("rule_store")
+    if store_path:
+        if not Path(store_path).exists():
+            raise ValueError(f"{path}: сховище правил {store_path} не знайдено")
+        store = RuleStore(store_path)
+        try:
+            stored = store.load()
+        finally:
+            store.close()
+        data = {**stored, **data}
+    return data
+
+
+# ──────────────────────────────────────────────────────────────
+# Рішення (у процесах-обробниках)
+# ──────────────────────────────────────────────────────────────
+_filters: list[CompiledFilters] = []
+_hasher: Optional[NearDuplicateIndex] = None  # лише для підписів; None — дедуплікацію вимкнено
+
+
+def _init_worker(configs: list[dict]) -> None:
+    global _filters, _hasher
+    _filters = [CompiledFilters(config) for config in configs]
+    _hasher = NearDuplicateIndex() if any(_dedup_index(c) is not None for c in configs) else None
+
+
+def decide(filters: CompiledFilters, text: str) -> Verdict:
+    """Рішення фільтрів для одного тексту (без дедуплікації)."""
+    if not text:
+        return Verdict("no_text")
+    decision = filters.decide(NormalizedMessage(text))
+    if decision.verdict == "minus_word":
+        return Verdict("minus_word", decision.keyword, decision.minus_word)
+    if decision.spam is not None:
+        return Verdict(decision.verdict, decision.keyword, str(decision.spam.score))
+    return Verdict(decision.verdict, decision.keyword)
+
+
+def _decide_chunk(texts: list[str]) -> list[tuple[tuple[Verdict, ...], Optional[tuple[int, ...]]]]:
+    """[(рішення на кожен конфіг, MinHash-підпис — якщо хоч один конфіг ставить у чергу)]."""
+    rows = []
+    for text in texts:
+        verdicts = tuple(decide(f, text) for f in _filters)
+        signature = None
+        if _hasher is not None and any(v.verdict == "queued" for v in verdicts):
+            signature = _hasher.signature(text)
+        rows.append((verdicts, signature))
+    return rows
+
+
+def _chunks(messages: Iterator[Message], size: int) -> Iterator[list[Message]]:
+    while True:
+        chunk = list(islice(messages, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _dedup_index(config: dict) -> Optional[NearDuplicateIndex]:
+    if config.get("dedup_mode", "annotate") == "off":
+        return None
+    # Дамп проганяється «миттєво», тож вікно в часі не спрацьовує — лише max_entries
+    return NearDuplicateIndex(
+        config.get("dedup_threshold", 0.8), float("inf"), config.get("dedup_max_entries", 5000)
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+# Прогін
+# ──────────────────────────────────────────────────────────────
+class ReplayReport(NamedTuple):
+    total: int
+    elapsed: float
+    jobs: int
+    counts: list[Counter]  # на кожен конфіг: вердикт → к-сть
+    changed: list[tuple[Message, Verdict, Verdict]]  # лише при двох конфігах
+    changed_total: int
+
+
+def replay(
+    messages: Iterable[Message],
+    configs: list[dict],
+    jobs: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    max_changed: int = 1000,
+) -> ReplayReport:
+    """
+    Проганяє messages через кожен конфіг. jobs > 1 — пакети по chunk_size у пулі
+    процесів (у пам'яті не більше jobs × 4 пакетів). Зберігає до max_changed змінених рішень.
+    """
+    started = time.perf_counter()
+    counts = [Counter() for _ in configs]
+    dedup = [_dedup_index(config) for config in configs]
+    changed: list[tuple[Message, Verdict, Verdict]] = []
+    changed_total = 0
+    total = 0
+
+    def consume(chunk: list[Message], results: list) -> None:
+        nonlocal changed_total, total
+        for message, (verdicts, signature) in zip(chunk, results):
+            total += 1
+            row = list(verdicts)
+            for i, verdict in enumerate(row):
+                if verdict.verdict == "queued" and dedup[i] is not None:
+                    if dedup[i].check(message.text, message.chat, signature=signature) is not None:
+                        row[i] = Verdict("duplicate", verdict.keyword)
+                counts[i][row[i].verdict] += 1
+            if len(row) > 1 and row[0][:2] != row[1][:2]:
+                changed_total += 1
+                if len(changed) < max_changed:
+                    changed.append((message, row[0], row[1]))
+
+    chunks = _chunks(iter(messages), chunk_size)
+    if jobs <= 1:
+        _init_worker(configs)
+        for chunk in chunks:
+            consume(chunk, _decide_chunk([m.text for m in chunk]))
+    else:
+        with Pool(jobs, initializer=_init_worker, initargs=(configs,)) as pool:
+            while True:
+                window = list(islice(chunks, jobs * 4))
+                if not window:
+                    break
+                results = pool.map(_decide_chunk, [[m.text for m in chunk] for chunk in window])
+                for chunk, verdicts in zip(window, results):
+                    consume(chunk, verdicts)
+
+    return ReplayReport(total, time.perf_counter() - started, max(jobs, 1), counts, changed, changed_total)
+
+
+# ──────────────────────────────────────────────────────────────
+# Вивід
+# ──────────────────────────────────────────────────────────────
+def _describe(verdict: Verdict) -> str:
+    if verdict.verdict == "minus_word":
+        return f"minus_word «{verdict.detail}»"
+    if verdict.verdict == "spam_score":
+        return f"spam_score {verdict.detail} б. ({verdict.keyword})"
+    if verdict.keyword:
+        return f"{verdict.verdict} ({verdict.keyword})"
+    return verdict.verdict
+
+
+def format_report(report: ReplayReport, names: list[str], show: int = 20, preview: int = 80) -> str:
+    rate = report.total / report.elapsed if report.elapsed else 0.0
+    lines = [
+        f"📼 {report.total} повідомлень за {report.elapsed:.2f} с "
+        f"({rate:,.0f} повід./с, процесів: {report.jobs})",
+        "",
+        f"{'вердикт':<12}" + "".join(f"{name[-24:]:>26}" for name in names),
+    ]
+    for verdict in REPLAY_VERDICTS:
+        lines.append(f"{verdict:<12}" + "".join(
+            f"{c[verdict]:>18} ({c[verdict] / report.total * 100 if report.total else 0:5.1f}%)"
+            for c in report.counts
+        ))
+    if len(names) > 1:
+        lines.append("")
+        lines.append(f"🔀 Змінених рішень: {report.changed_total}")
+        for message, old, new in report.changed[:show]:
+            text = " ".join(message.text.split())
+            if len(text) > preview:
+                text = text[:preview] + "…"
+            lines.append(f"#{message.index} [{message.chat}] {_describe(old)} → {_describe(new)}: {text}")
+        if report.changed_total > show:
+            lines.append(f"… ще {report.changed_total - show}")
+    return "\n".join(lines)
+
+
+def report_to_dict(report: ReplayReport, names: list[str]) -> dict:
+    return {
+        "total": report.total,
+        "elapsed": round(report.elapsed, 3),
+        "jobs": report.jobs,
+        "counts": {name: {v: c[v] for v in REPLAY_VERDICTS} for name, c in zip(names, report.counts)},
+        "changed_total": report.changed_total,
+        "changed": [
+            {"index": m.index, "chat": m.chat, "sender": m.sender, "text": m.text,
+             "old": old._asdict(), "new": new._asdict()}
+            for m, old, new in report.changed
+        ],
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн-прогін повідомлень через фільтри monitor()")
+    parser.add_argument("config", type=Path, help="config.json")
+    parser.add_argument("dump", type=Path, help="JSONL або CSV з полями text, chat, sender")
+    parser.add_argument("--compare", type=Path, help="другий конфіг: показати змінені рішення")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="", help="формат дампу (за розширенням)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="процесів (1 — без пулу)")
+    parser.add_argument("--show", type=int, default=20, help="скільки змінених рішень вивести")
+    parser.add_argument("--json", type=Path, help="зберегти звіт у JSON")
+    args = parser.parse_args(argv)
+
+    paths = [args.config] + ([args.compare] if args.compare else [])
+    try:
+        configs = [load_replay_config(path) for path in paths]
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc}", file=sys.stderr)
+        return 2
+
+    report = replay(read_messages(args.dump, args.format), configs, args.jobs)
+    names = [str(path) for path in paths]
+    print(format_report(report, names, args.show))
+    if args.json:
+        args.json.write_text(json.dumps(report_to_dict(report, names), ensure_ascii=False, indent=2),
+                             encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+rules_store.py — Опційне сховище правил у SQLite (без залежності від Telethon).
+keywords / minus_words / skip_words / тригери / сервіси з метаданими
+(added_by, added_at, hit_count). Окремі вставки й видалення не переписують
+config.json, а список у десятки тисяч правил завантажується за один SELECT.
+"""
+
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+# Ключі конфігу, що зберігаються в сховищі правил
+RULE_KEYS = ("keywords", "minus_words", "skip_words", "spam_commercial_triggers", "spam_services")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    id        INTEGER PRIMARY KEY,
+    kind      TEXT    NOT NULL,
+    value     TEXT    NOT NULL,
+    added_by  TEXT    NOT NULL DEFAULT '',
+    added_at  REAL    NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (kind, value)
+);
+"""
+
+
+def diff_lists(old: Iterable[str], new: Iterable[str]) -> tuple[list[str], list[str]]:
+    """(додані, видалені) із збереженням порядку."""
+    old, new = list(old), list(new)
+    old_set, new_set = set(old), set(new)
+    return [v for v in new if v not in old_set], [v for v in old if v not in new_set]
+
+
+class RuleStore:
+    """
+    Таблиця rules (kind, value) у режимі WAL. Одне з'єднання, доступ під lock —
+    методи синхронні, з event loop викликати через asyncio.to_thread().
+    """
+
+    def __init__(self, path: "str | Path"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def load(self) -> dict[str, list[str]]:
+        """Усі правила за ключами конфігу, у порядку додавання."""
+        lists: dict[str, list[str]] = {key: [] for key in RULE_KEYS}
+        with self._lock:
+            for kind, value in self._db.execute("SELECT kind, value FROM rules ORDER BY id"):
+                if kind in lists:
+                    lists[kind].append(value)
+        return lists
+
+    def count(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT kind, COUNT(*) FROM rules GROUP BY kind").fetchall()
+        return {key: dict(rows).get(key, 0) for key in RULE_KEYS}
+
+    def apply(self, key: str, added: Iterable[str], removed: Iterable[str], added_by: str = "") -> int:
+        """Вставляє/видаляє окремі рядки однією транзакцією. Повертає к-сть вставлених."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM rules WHERE kind = ? AND value = ?", ((key, v) for v in removed)
+            )
+            cur = self._db.executemany(
+                "INSERT OR IGNORE INTO rules (kind, value, added_by, added_at) VALUES (?, ?, ?, ?)",
+                ((key, v, added_by, now) for v in added),
+            )
+            return max(cur.rowcount, 0)
+
+    def record_hits(self, hits: Mapping[tuple[str, str], int]) -> None:
+        """Додає лічильники спрацювань {(ключ, значення): n} пакетом."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE rules SET hit_count = hit_count + ? WHERE kind = ? AND value = ?",
+                ((n, key, value) for (key, value), n in hits.items()),
+            )
+
+    def top(self, key: str, limit: int = 10) -> list[tuple[str, int, str, float]]:
+        """(значення, hit_count, added_by, added_at) — найчастіші спрацювання."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT value, hit_count, added_by, added_at FROM rules "
+                "WHERE kind = ? ORDER BY hit_count DESC, id LIMIT ?",
+                (key, limit),
+            ).fetchall()
@@ -27,14 +27,21 @@ telethon_tl_channels.JoinChannelRequest  = MagicMock()
 telethon_tl_channels.LeaveChannelRequest = MagicMock()
 telethon_errors = types.ModuleType("telethon.errors")
 telethon_errors.FloodWaitError = Exception
+telethon_tl_channels.GetParticipantRequest = MagicMock()
+telethon_tl_channels.EditAdminRequest      = MagicMock()
+telethon_tl_bots = types.ModuleType("telethon.tl.functions.bots")
+telethon_tl_bots.SetBotCommandsRequest = MagicMock()
 telethon_tl_types = types.ModuleType("telethon.tl.types")
 telethon_tl_types.InputChannel = MagicMock()
+for _name in ("ChatAdminRights", "BotCommand", "BotCommandScopePeerUser", "BotCommandScopeDefault"):
+    setattr(telethon_tl_types, _name, MagicMock())
 
 sys.modules.setdefault("telethon",                          telethon_stub)
 sys.modules.setdefault("telethon.events",                   telethon_events)
 sys.modules.setdefault("telethon.tl",                       telethon_tl)
 sys.modules.setdefault("telethon.tl.functions",             telethon_tl_funcs)
 sys.modules.setdefault("telethon.tl.functions.channels",    telethon_tl_channels)
+sys.modules.setdefault("telethon.tl.functions.bots",        telethon_tl_bots)
 sys.modules.setdefault("telethon.errors",                   telethon_errors)
 sys.modules.setdefault("telethon.tl.types",                 telethon_tl_types)
 
@@ -43,6 +50,8 @@ import os
 os.environ.setdefault("TG_API_ID",   "12345678")
 os.environ.setdefault("TG_API_HASH", "deadbeef")
 os.environ.setdefault("TG_PHONE",    "+34600000000")
+os.environ.setdefault("BOT_TOKEN",   "123456:test-token")
+os.environ.setdefault("BOT_USERNAME", "@test_monitor_bot")
 
 # Патчимо asyncio.run щоб main() не запустилась при імпорті
 with patch("asyncio.run"):
@@ -60,12 +69,17 @@ with patch("asyncio.run"):
         except SystemExit:
             pass
 
-clean_minus_words = main_module.clean_minus_words
-has_minus_word    = main_module.has_minus_word
-find_keyword      = main_module.find_keyword
+from filters import (
+    CompiledFilters, FuzzyKeywordIndex, KeywordMatcher, NormalizedMessage, SpamScorer,
+    clean_minus_words, find_keyword, has_minus_word, is_service_spam,
+)
+
 format_sender     = main_module.format_sender
 format_chat       = main_module.format_chat
 is_admin          = main_module.is_admin
+TTLCache          = main_module.TTLCache
+ChatInfo          = main_module.ChatInfo
+ConfigSnapshot    = main_module.ConfigSnapshot
 
 
 # ════════════════════════════════════════════════════════════════
@@ -272,7 +286,88 @@ class TestIntegration:
         msg = "Get guaranteed fast results today"
         assert has_minus_word(msg, cleaned)
 
-send_long_message = main_module.send_long_message
+
+# ════════════════════════════════════════════════════════════════
+# KeywordMatcher — один прохід для keywords + minus_words
+# ════════════════════════════════════════════════════════════════
+class TestKeywordMatcher:
+    def test_scan_finds_keyword(self):
+        m = KeywordMatcher(["refund", "delivery"], ["bitcoin"])
+        assert m.scan("Need a REFUND now") == ("refund", None)
+
+    def test_scan_minus_word_wins(self):
+        m = KeywordMatcher(["refund"], ["bitcoin"])
+        assert m.scan("refund in bitcoin") == (None, "bitcoin")
+
+    def test_scan_nothing(self):
+        m = KeywordMatcher(["refund"], ["bitcoin"])
+        assert m.scan("hello there") == (None, None)
+
+    def test_priority_follows_list_order(self):
+        m = KeywordMatcher(["refund request", "refund"], [])
+        assert m.find_keyword("I want refund request") == "refund request"
+        m = KeywordMatcher(["refund", "refund request"], [])
+        assert m.find_keyword("I want refund request") == "refund"
+
+    def test_overlapping_patterns_respect_word_boundary(self):
+        m = KeywordMatcher(["cat", "category"], [])
+        assert m.find_keyword("select category now") == "category"
+
+    def test_boundary_skips_partial_but_finds_later_full_word(self):
+        m = KeywordMatcher(["cat"], [])
+        assert m.find_keyword("category, then a cat") == "cat"
+
+    def test_minus_is_substring(self):
+        m = KeywordMatcher([], ["crypto"])
+        assert m.find_minus_word("cryptocurrency trading") == "crypto"
+
+    def test_matches_regex_reference_on_large_list(self):
+        import re
+        keywords = [f"kw{i} term" for i in range(3000)] + ["повернення коштів", "model 500"]
+        m = KeywordMatcher(keywords, [])
+        for text in ("x kw2999 term y", "kw10 terms", "хочу повернення коштів", "model 5000", ""):
+            expected = None
+            for kw in keywords:
+                if re.search(r"(?<!\w)" + re.escape(kw.lower()) + r"(?!\w)", text.lower()):
+                    expected = kw
+                    break
+            assert m.find_keyword(text) == expected
+
+
+# ════════════════════════════════════════════════════════════════
+# NormalizedMessage — спільний вигляд повідомлення
+# ════════════════════════════════════════════════════════════════
+class TestNormalizedMessage:
+    def test_zero_width_chars_do_not_hide_keyword(self):
+        assert find_keyword("need a re\u200bfu\u200dnd now", ["refund"]) == "refund"
+
+    def test_mixed_script_lookalikes_match(self):
+        # "rеfund" з кириличною "е"
+        assert find_keyword("need a r\u0435fund now", ["refund"]) == "refund"
+        # "скидка" з латинськими "c" та "a"
+        assert has_minus_word("велика cкидкa тільки сьогодні", ["скидка"])
+
+    def test_cyrillic_keyword_with_capital_letter(self):
+        assert find_keyword("Вода закінчилась", ["вода"]) == "вода"
+
+    def test_fullwidth_letters_are_folded(self):
+        assert find_keyword("ｒｅｆｕｎｄ please", ["refund"]) == "refund"
+
+    def test_tokens(self):
+        assert NormalizedMessage("Hello, wor\u200bld!").tokens == ["hello", "world"]
+
+    def test_cached_counts(self):
+        text = "✓ a 10 usd\n✓ b 20 eur\n💰💰 +34 600 000 000"
+        msg = NormalizedMessage(text)
+        assert msg.prices == 2
+        assert msg.bullets == 2
+        assert msg.phone_runs == 1
+        assert msg.count_chars("💰🔥") == 2
+
+    def test_is_service_spam_accepts_normalized_message(self):
+        config = {"spam_score_threshold": 4}
+        text = "✓ a 10€\n✓ b 20€\n✓ c 30€"
+        assert is_service_spam(NormalizedMessage(text), config) == is_service_spam(text, config)
 
 
 # ════════════════════════════════════════════════════════════════
@@ -342,5 +437,1177 @@ class TestIsAdminEdgeCases:
         assert not is_admin("user123", ["user123"])
 
 
+# ════════════════════════════════════════════════════════════════
+# FuzzyKeywordIndex — ключові слова з опечатками
+# ════════════════════════════════════════════════════════════════
+class TestFuzzyKeywordIndex:
+    KEYWORDS = ["delivery", "повернення коштів", "refund", "cat"]
+
+    def test_single_typo(self):
+        assert FuzzyKeywordIndex(self.KEYWORDS).find("my delivary is late") == "delivery"
+
+    def test_multi_word_keyword_with_typo(self):
+        assert FuzzyKeywordIndex(self.KEYWORDS).find("хочу повернення коштив") == "повернення коштів"
+
+    def test_too_many_typos(self):
+        assert FuzzyKeywordIndex(self.KEYWORDS).find("my dlivary is late") is None
+
+    def test_short_keywords_are_exact_only_by_default(self):
+        assert FuzzyKeywordIndex(self.KEYWORDS).find("a cot") is None
+        assert FuzzyKeywordIndex(self.KEYWORDS, overrides={"cat": 1}).find("a cot") == "cat"
+
+    def test_override_disables_keyword(self):
+        assert FuzzyKeywordIndex(self.KEYWORDS, overrides={"refund": 0}).find("refnd") is None
+
+    def test_priority_follows_list_order(self):
+        index = FuzzyKeywordIndex(["delivery", "delivers"])
+        assert index.find("deliverx") == "delivery"
+
+    def test_compiled_filters_exact_first_then_fuzzy(self):
+        config = {"keywords": self.KEYWORDS, "minus_words": ["bitcoin"], "fuzzy_keywords_enabled": True}
+        filters = CompiledFilters(config)
+        assert filters.match("refund please") == ("refund", None)
+        assert filters.match("refnd please") == ("refund", None)
+        assert filters.match("refnd in bitcoin") == (None, "bitcoin")
+
+    def test_compiled_filters_fuzzy_disabled_by_default(self):
+        filters = CompiledFilters({"keywords": self.KEYWORDS})
+        assert filters.fuzzy is None
+        assert filters.match("refnd please") == (None, None)
+
+
+# ════════════════════════════════════════════════════════════════
+# SpamScorer — скомпільований евристичний фільтр
+# ════════════════════════════════════════════════════════════════
+class TestSpamScorer:
+    CONFIG = {
+        "spam_commercial_triggers": [r"\d{2,}\s*%", r"\bdiscount\b", r"\bsale\b", "contact me"],
+        "spam_emojis": "💰🔥",
+        "spam_services": ["manicure", "pedicure", "massage"],
+        "spam_score_threshold": 4,
+    }
+    PRICE_LIST = (
+        "💰💰💰 Big sale, 50% discount!\n"
+        "✓ manicure 20 eur\n"
+        "✓ pedicure 25 eur\n"
+        "✓ massage 40 eur\n"
+        "✓ nails 15 eur\n"
+        "contact me +34 600 000 000"
+    )
+
+    def test_breakdown(self):
+        result = SpamScorer.from_config(self.CONFIG).score(self.PRICE_LIST)
+        assert result.features == {
+            "triggers": 4, "emojis": 1, "services": 2, "prices": 4,
+            "phone": 1, "contacts": 0, "bullets": 3,
+        }
+        assert result.score == sum(result.features.values())
+
+    def test_same_verdict_as_is_service_spam(self):
+        scorer = SpamScorer.from_config(self.CONFIG)
+        for text in (self.PRICE_LIST, "hello, any refund news?", "sale sale"):
+            assert scorer.is_spam(text) == is_service_spam(text, self.CONFIG)
+
+    def test_clean_message_scores_zero(self):
+        assert SpamScorer.from_config(self.CONFIG).score("Where can I get a refund?").score == 0
+
+    def test_literal_trigger_keeps_word_boundary(self):
+        scorer = SpamScorer([r"\bsale\b"])
+        assert scorer.score("big sale").features["triggers"] == 1
+        assert scorer.score("wholesale prices").features["triggers"] == 0
+
+    def test_automaton_mode_matches_small_mode(self, monkeypatch):
+        import filters
+        small = SpamScorer.from_config(self.CONFIG)
+        monkeypatch.setattr(filters, "AUTOMATON_MIN_PATTERNS", 0)
+        large = SpamScorer.from_config(self.CONFIG)
+        for text in (self.PRICE_LIST, "wholesale", "discount manicure massage", ""):
+            assert small.score(text) == large.score(text)
+
+
+# ════════════════════════════════════════════════════════════════
+# TTLCache / ChatInfo
+# ════════════════════════════════════════════════════════════════
+class TestTTLCache:
+    def test_hit_and_miss_counters(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        st = cache.stats()
+        assert (st["hits"], st["misses"], st["hit_rate"]) == (1, 1, 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.evictions == 1
+
+    def test_expires_after_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(main_module.time, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.put("a", 1)
+        now[0] += 6
+        assert cache.get("a") is None
+        assert cache.expired == 1 and len(cache) == 0
+
+    def test_configure_shrinks(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        for i in range(5):
+            cache.put(i, i)
+        cache.configure(maxsize=2, ttl=60)
+        assert len(cache) == 2 and cache.get(4) == 4
+
+
+class TestChatInfo:
+    def _chat(self, username=None, title="Group", id=-100123):
+        c = MagicMock()
+        c.username = username
+        c.title = title
+        c.id = id
+        return c
+
+    def test_forward_channel_excluded(self):
+        info = ChatInfo(-100123, self._chat(username="MyChannel"))
+        info.apply_config(ConfigSnapshot({"forward_channel": "@mychannel", "admins": []}, 1))
+        assert info.is_forward_channel and info.excluded
+
+    def test_admin_chat_excluded(self):
+        info = ChatInfo(-100123, self._chat(username="boss"))
+        info.apply_config(ConfigSnapshot({"forward_channel": "@other", "admins": ["@Boss"]}, 1))
+        assert info.is_admin_chat and not info.is_forward_channel
+
+    def test_regular_chat_not_excluded(self):
+        info = ChatInfo(-100123, self._chat(username="market"))
+        info.apply_config(ConfigSnapshot({"forward_channel": "@other", "admins": ["@boss"]}, 3))
+        assert not info.excluded and info.version == 3
+        assert info.name == format_chat(self._chat(username="market"))
+
+    def test_get_chat_info_uses_cache(self, monkeypatch):
+        monkeypatch.setattr(main_module, "chat_cache", TTLCache(maxsize=10, ttl=60))
+        event = MagicMock()
+        event.chat_id = -100123
+        event.get_chat = AsyncMock(return_value=self._chat(username="market"))
+        config = ConfigSnapshot({"forward_channel": "@market", "admins": []}, 1)
+        first = asyncio.run(main_module.get_chat_info(event, config))
+        second = asyncio.run(main_module.get_chat_info(event, config))
+        assert first is second and first.excluded
+        event.get_chat.assert_awaited_once()
+
+
+# ════════════════════════════════════════════════════════════════
+# ConfigSnapshot — незмінні версіоновані знімки конфігу
+# ════════════════════════════════════════════════════════════════
+class TestConfigSnapshot:
+    DATA = {
+        "keywords": ["кава"],
+        "admins": ["@Boss"],
+        "forward_channel": "@Chan",
+        "fuzzy_keywords_overrides": {"кава": 1},
+    }
+
+    def test_frozen(self):
+        snap = ConfigSnapshot(self.DATA, 1)
+        assert snap["keywords"] == ("кава",)
+        with pytest.raises(TypeError):
+            snap["keywords"] = []
+        with pytest.raises(TypeError):
+            snap["fuzzy_keywords_overrides"]["x"] = 2
+
+    def test_to_dict_is_independent_copy(self):
+        snap = ConfigSnapshot(self.DATA, 1)
+        copy = snap.to_dict()
+        copy["keywords"].append("чай")
+        assert copy["keywords"] == ["кава", "чай"]
+        assert snap["keywords"] == ("кава",)
+        assert copy == {**self.DATA, "keywords": ["кава", "чай"]}
+
+    def test_derived_indexes(self):
+        snap = ConfigSnapshot(self.DATA, 1)
+        assert snap.admins_lower == {"@boss"}
+        assert snap.forward_channel_clean == "chan"
+
+    def test_update_publishes_new_version(self, monkeypatch):
+        saved = []
+        monkeypatch.setattr(main_module, "save_config", saved.append)
+        monkeypatch.setattr(main_module, "config_persister", main_module.ConfigPersister(delay=0))
+        monkeypatch.setattr(main_module, "_config", ConfigSnapshot({"keywords": ["a"]}, 1))
+        monkeypatch.setattr(main_module, "_config_version", 1)
+        before = main_module.current_config()
+
+        async def scenario():
+            await main_module.update_config({"keywords": ["b"]})
+            await main_module.config_persister.flush()
+
+        asyncio.run(scenario())
+        after = main_module.current_config()
+        assert after.version > before.version
+        assert before["keywords"] == ("a",) and after["keywords"] == ("b",)
+        assert saved == [{"keywords": ["b"]}]
+
+
+# ════════════════════════════════════════════════════════════════
+# mutate_config — атомарні зміни та інкрементна перекомпіляція
+# ════════════════════════════════════════════════════════════════
+class TestMutateConfig:
+    def _setup(self, monkeypatch, data):
+        monkeypatch.setattr(main_module, "save_config", lambda config: None)
+        monkeypatch.setattr(main_module, "config_persister", main_module.ConfigPersister(delay=60))
+        monkeypatch.setattr(main_module, "_config", ConfigSnapshot(data, 1))
+        monkeypatch.setattr(main_module, "_config_version", 1)
+        monkeypatch.setattr(main_module, "_filters", None)
+
+    def test_returns_changed_keys(self, monkeypatch):
+        self._setup(monkeypatch, {"keywords": ["кава"], "spam_score_threshold": 4})
+
+        def edit(config):
+            config["keywords"].append("чай")
+            config["spam_score_threshold"] = 4  # те саме значення — не зміна
+
+        changed = asyncio.run(main_module.mutate_config(edit))
+        assert changed == {"keywords"}
+        assert main_module.current_config()["keywords"] == ("кава", "чай")
+        assert asyncio.run(main_module.mutate_config(lambda c: None)) == set()
+        assert main_module.current_config().version == 2
+
+    def test_recompiles_only_affected_stages(self, monkeypatch):
+        self._setup(monkeypatch, {"keywords": ["кава"], "spam_services": ["telegram"]})
+        first = main_module.get_filters(main_module.current_config())
+        asyncio.run(main_module.mutate_config(lambda c: c["keywords"].append("чай")))
+        second = main_module.get_filters(main_module.current_config())
+        assert second.version == 2
+        assert second.matcher is not first.matcher and second.scorer is first.scorer
+        asyncio.run(main_module.mutate_config(lambda c: c.update(spam_score_threshold=7)))
+        third = main_module.get_filters(main_module.current_config())
+        assert third.matcher is second.matcher and third.scorer.threshold == 7
+
+    def test_concurrent_mutations_do_not_lose_updates(self, monkeypatch):
+        self._setup(monkeypatch, {"join_queue": []})
+
+        async def scenario():
+            await asyncio.gather(*(
+                main_module.mutate_config(lambda c, g=f"@g{i}": c["join_queue"].append(g))
+                for i in range(10)
+            ))
+
+        asyncio.run(scenario())
+        assert sorted(main_module.current_config()["join_queue"]) == sorted(f"@g{i}" for i in range(10))
+
+
+# ════════════════════════════════════════════════════════════════
+# ConfigPersister — write-behind збереження конфігу
+# ════════════════════════════════════════════════════════════════
+class TestConfigPersister:
+    def _setup(self, monkeypatch, delay):
+        saved = []
+        monkeypatch.setattr(main_module, "save_config", saved.append)
+        monkeypatch.setattr(main_module, "config_persister", main_module.ConfigPersister(delay=delay))
+        monkeypatch.setattr(main_module, "_config", ConfigSnapshot({}, 1))
+        monkeypatch.setattr(main_module, "_config_version", 1)
+        return saved
+
+    def test_coalesces_burst_into_one_write(self, monkeypatch):
+        saved = self._setup(monkeypatch, delay=0.05)
+
+        async def scenario():
+            for i in range(5):
+                await main_module.update_config({"join_queue": [f"@g{j}" for j in range(i + 1)]})
+            assert main_module.current_config()["join_queue"][-1] == "@g4"  # одразу в пам'яті
+            assert saved == []
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+        assert saved == [{"join_queue": ["@g0", "@g1", "@g2", "@g3", "@g4"]}]
+        assert main_module.config_persister.coalesced == 4
+        assert main_module.config_persister.last_written == saved[0]
+
+    def test_flush_writes_pending_immediately(self, monkeypatch):
+        saved = self._setup(monkeypatch, delay=60)
+
+        async def scenario():
+            await main_module.update_config({"keywords": ["x"]})
+            assert main_module.config_persister.pending
+            await main_module.config_persister.flush()
+            await main_module.config_persister.flush()  # повторно — нічого писати
+
+        asyncio.run(scenario())
+        assert saved == [{"keywords": ["x"]}]
+
+    def test_filters_keyed_on_version(self, monkeypatch):
+        monkeypatch.setattr(main_module, "_filters", None)
+        snap = ConfigSnapshot({"keywords": ["кава"]}, 5)
+        filters = main_module.get_filters(snap)
+        assert filters.version == 5 and main_module.get_filters(snap) is filters
+        newer = ConfigSnapshot({"keywords": ["чай"]}, 6)
+        assert main_module.get_filters(newer).match("чай є?")[0] == "чай"
+
+
+# ════════════════════════════════════════════════════════════════
+# Гаряче перезавантаження config.json
+# ════════════════════════════════════════════════════════════════
+class TestConfigReload:
+    def test_validate_config(self):
+        assert main_module.validate_config({"keywords": ["a"], "spam_score_threshold": 4}) == []
+        errors = main_module.validate_config({
+            "keywords": "a", "ai_filter_enabled": "yes", "spam_score_threshold": -1,
+            "spam_commercial_triggers": ["(unclosed"],
+        })
+        assert len(errors) == 4
+        assert main_module.validate_config([]) == ["конфіг має бути JSON-об'єктом"]
+
+    def test_diff_config(self):
+        lines = main_module.diff_config(
+            {"keywords": ["a", "b"], "spam_score_threshold": 4, "old": 1},
+            {"keywords": ["b", "c"], "spam_score_threshold": 5, "new": 2},
+        )
+        assert lines == [
+            "keywords +1: c", "keywords -1: a", "new: додано = 2",
+            "old: видалено (було 1)", "spam_score_threshold: 4 → 5",
+        ]
+
+    def _setup(self, monkeypatch, tmp_path, data):
+        import json
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        monkeypatch.setattr(main_module, "CONFIG_FILE", path)
+        monkeypatch.setattr(main_module, "_config", ConfigSnapshot({"keywords": ["кава"]}, 1))
+        monkeypatch.setattr(main_module, "_config_version", 1)
+        monkeypatch.setattr(main_module, "_filters", None)
+        return path
+
+    def test_reload_swaps_snapshot_and_filters(self, monkeypatch, tmp_path):
+        self._setup(monkeypatch, tmp_path, {"keywords": ["чай"]})
+        assert asyncio.run(main_module.reload_config()) is True
+        config = main_module.current_config()
+        assert config.version == 2 and config["keywords"] == ("чай",)
+        assert main_module._filters.version == 2
+        assert main_module.get_filters(config).match("є чай?")[0] == "чай"
+
+    def test_reload_rejects_invalid_config(self, monkeypatch, tmp_path):
+        path = self._setup(monkeypatch, tmp_path, {"keywords": "чай"})
+        assert asyncio.run(main_module.reload_config()) is False
+        path.write_text("{broken", encoding="utf-8")
+        assert asyncio.run(main_module.reload_config()) is False
+        assert main_module.current_config()["keywords"] == ("кава",)
+
+    def test_reload_skips_unchanged(self, monkeypatch, tmp_path):
+        self._setup(monkeypatch, tmp_path, {"keywords": ["кава"]})
+        assert asyncio.run(main_module.reload_config()) is False
+        assert main_module.current_config().version == 1
+
+    def test_reload_compiles_only_on_change(self, monkeypatch, tmp_path):
+        path = self._setup(monkeypatch, tmp_path, {"keywords": ["кава"]})
+        base = CompiledFilters(main_module.current_config(), 1)
+        monkeypatch.setattr(main_module, "_filters", base)
+        recompile = MagicMock(side_effect=main_module._recompile)
+        monkeypatch.setattr(main_module, "_recompile", recompile)
+        assert asyncio.run(main_module.reload_config()) is False
+        recompile.assert_not_called()
+        import json
+        path.write_text(json.dumps({"keywords": ["кава"], "spam_score_threshold": 6}), encoding="utf-8")
+        assert asyncio.run(main_module.reload_config()) is True
+        filters, snapshot, changed = recompile.call_args.args
+        assert filters is base and changed == {"spam_score_threshold"} and snapshot.version == 2
+
+    @pytest.mark.parametrize("force_poll", [False, True])
+    def test_watcher_detects_change(self, tmp_path, monkeypatch, force_poll):
+        import config_watch
+        if force_poll:
+            monkeypatch.setattr(config_watch, "_Inotify", MagicMock(side_effect=OSError("off")))
+        path = tmp_path / "config.json"
+        path.write_text("{}", encoding="utf-8")
+
+        async def scenario():
+            changed = asyncio.Event()
+
+            async def on_change():
+                changed.set()
+
+            watcher = config_watch.ConfigWatcher(path, on_change, poll_interval=0.01, debounce=0.01)
+            task = asyncio.create_task(watcher.run())
+            await asyncio.sleep(0.05)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text('{"keywords": ["x"]}', encoding="utf-8")
+            tmp.replace(path)
+            await asyncio.wait_for(changed.wait(), 2)
+            task.cancel()
+            return watcher.mode
+
+        native = "inotify" if sys.platform.startswith("linux") else "poll"
+        assert asyncio.run(scenario()) == ("poll" if force_poll else native)
+
+
+# ════════════════════════════════════════════════════════════════
+# RuleStore — SQLite-сховище правил
+# ════════════════════════════════════════════════════════════════
+class TestRuleStore:
+    def test_apply_load_and_metadata(self, tmp_path):
+        from rules_store import RuleStore
+        store = RuleStore(tmp_path / "rules.db")
+        assert store.apply("keywords", ["кава", "чай", "кава"], [], "@boss") == 2
+        store.apply("keywords", ["сік"], ["чай"], "ai:target")
+        assert store.load()["keywords"] == ["кава", "сік"]
+        store.record_hits({("keywords", "сік"): 3, ("keywords", "кава"): 1})
+        top = store.top("keywords")
+        assert [(v, n, by) for v, n, by, _ in top] == [("сік", 3, "ai:target"), ("кава", 1, "@boss")]
+        assert store.count()["keywords"] == 2 and store.count()["minus_words"] == 0
+        store.close()
+
+    def test_holds_50k_rules(self, tmp_path):
+        from rules_store import RuleStore
+        store = RuleStore(tmp_path / "rules.db")
+        words = [f"word{i}" for i in range(50_000)]
+        store.apply("minus_words", words, [])
+        assert store.load()["minus_words"] == words
+        store.close()
+
+    def _setup(self, monkeypatch, tmp_path, data):
+        import json
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        monkeypatch.setattr(main_module, "CONFIG_FILE", path)
+        monkeypatch.setattr(main_module, "_config", None)
+        monkeypatch.setattr(main_module, "rule_store", None)
+        monkeypatch.setattr(main_module, "_filters", None)
+        monkeypatch.setattr(main_module, "config_persister", main_module.ConfigPersister(delay=60))
+        return path
+
+    def test_init_imports_json_lists_and_strips_file(self, monkeypatch, tmp_path):
+        import json
+        db = str(tmp_path / "rules.db")
+        path = self._setup(monkeypatch, tmp_path, {
+            "rule_store": db, "keywords": ["кава"], "forward_channel": "@ch",
+        })
+
+        async def scenario():
+            await main_module.init_rule_store()
+            await main_module.config_persister.flush()
+
+        asyncio.run(scenario())
+        config = main_module.current_config()
+        assert config["keywords"] == ("кава",)
+        # Фільтри вже скомпільовані зі сховища — до першого повідомлення
+        assert main_module._filters.version == config.version
+        assert main_module._filters.match("є кава?")[0] == "кава"
+        assert json.loads(path.read_text(encoding="utf-8")) == {"rule_store": db, "forward_channel": "@ch"}
+        assert main_module.rule_store.load()["keywords"] == ["кава"]
+        main_module.rule_store.close()
+
+    def test_list_edit_goes_to_store_not_json(self, monkeypatch, tmp_path):
+        db = str(tmp_path / "rules.db")
+        path = self._setup(monkeypatch, tmp_path, {"rule_store": db, "forward_channel": "@ch"})
+        before = path.read_text(encoding="utf-8")
+
+        async def scenario():
+            await main_module.init_rule_store()
+            config = main_module.load_config_copy()
+            config["keywords"].append("чай")
+            await main_module.update_config(config, added_by="@boss")
+            await main_module.config_persister.flush()
+
+        asyncio.run(scenario())
+        assert path.read_text(encoding="utf-8") == before
+        assert [(v, by) for v, _, by, _ in main_module.rule_store.top("keywords")] == [("чай", "@boss")]
+        main_module.rule_store.close()
+
+
+# ════════════════════════════════════════════════════════════════
+# BoundedMessageQueue — обмежена черга пересилки
+# ════════════════════════════════════════════════════════════════
+class TestBoundedMessageQueue:
+    def _queue(self, policy, maxsize=3):
+        from message_queue import BoundedMessageQueue
+        return BoundedMessageQueue(maxsize=maxsize, policy=policy)
+
+    def _drain(self, q):
+        return [q.get_nowait() for _ in range(q.qsize())]
+
+    def test_drop_oldest(self):
+        q = self._queue("drop_oldest")
+        for i in range(5):
+            assert q.put_nowait(i) is True
+        assert self._drain(q) == [2, 3, 4]
+        assert q.stats()["dropped"]["drop_oldest"] == 2
+
+    def test_evicted_items_are_reported(self, monkeypatch, tmp_path):
+        from journal import EventJournal
+        q = self._queue("drop_oldest", maxsize=2)
+        evicted = []
+        q.on_evict = evicted.append
+        for i in range(4):
+            q.put_nowait({"chat_id": i, "keyword": "чай", "chat": f"g{i}"})
+        assert [item["chat_id"] for item in evicted] == [0, 1]
+        from metrics import QUEUE_DROPPED
+        journal = EventJournal(tmp_path)
+        monkeypatch.setattr(main_module, "journal", journal)
+        monkeypatch.setattr(main_module, "pending_messages", q)
+        before = QUEUE_DROPPED.value("drop_oldest")
+        for item in evicted + [None]:             # None — вміст витісненого лише на диску
+            main_module._record_evicted(item)
+        assert journal.summary(1)["dropped"] == 3
+        assert QUEUE_DROPPED.value("drop_oldest") == before + 3
+        assert "# TYPE tgmonitor_queue_dropped_total counter" in QUEUE_DROPPED.render()
+
+    def test_drop_newest(self):
+        q = self._queue("drop_newest")
+        results = [q.put_nowait(i) for i in range(5)]
+        assert results == [True, True, True, False, False]
+        assert self._drain(q) == [0, 1, 2]
+
+    def test_drop_lowest_priority(self):
+        q = self._queue("drop_lowest_priority")
+        q.put_nowait("a", priority=5)
+        q.put_nowait("b", priority=1)
+        q.put_nowait("c", priority=1)
+        assert q.put_nowait("d", priority=3) is True   # витісняє найстаріше з найнижчим — "b"
+        assert q.put_nowait("e", priority=0) is False  # нижче за всіх — відкидається саме воно
+        assert self._drain(q) == ["a", "c", "d"]
+        assert q.stats()["dropped_total"] == 2
+
+    def test_oldest_age_and_shrink(self, monkeypatch):
+        import message_queue
+        now = [100.0]
+        monkeypatch.setattr(message_queue.time, "monotonic", lambda: now[0])
+        q = self._queue("drop_oldest", maxsize=0)
+        for i in range(4):
+            q.put_nowait(i)
+            now[0] += 10
+        assert q.oldest_age() == 40
+        q.configure(2, "drop_oldest")
+        assert q.qsize() == 2 and q.oldest_age() == 20
+
+    def test_get_waits_for_put(self):
+        q = self._queue("drop_oldest")
+
+        async def scenario():
+            getter = asyncio.create_task(q.get())
+            await asyncio.sleep(0)
+            await q.put("x")
+            return await asyncio.wait_for(getter, 1)
+
+        assert asyncio.run(scenario()) == "x"
+        q.task_done()
+        with pytest.raises(ValueError):
+            q.task_done()
+
+
+# ════════════════════════════════════════════════════════════════
+# DurableMessageQueue — стійка черга на SQLite
+# ════════════════════════════════════════════════════════════════
+class TestDurableMessageQueue:
+    def _queue(self, path, **kwargs):
+        from message_queue import DurableMessageQueue
+        return DurableMessageQueue(path / "queue.db", **kwargs)
+
+    def test_unacked_messages_survive_restart(self, tmp_path):
+        async def first_run():
+            q = self._queue(tmp_path)
+            for i in range(3):
+                await q.put({"text": f"m{i}", "sender_peer": object()})
+            assert (await q.get())["text"] == "m0"
+            q.task_done()                       # m0 переслано
+            assert (await q.get())["text"] == "m1"  # m1 взято, але не підтверджено
+            await q.flush()                     # «падіння» без close()
+
+        asyncio.run(first_run())
+        q = self._queue(tmp_path)
+        assert q.recovered == 2
+        assert q.get_nowait() == {"text": "m1", "sender_peer": None}
+        assert q.get_nowait()["text"] == "m2"
+
+    def test_ack_before_flush_never_hits_disk(self, tmp_path):
+        async def scenario():
+            q = self._queue(tmp_path, flush_interval=60)
+            await q.put({"text": "x"})
+            await q.get()
+            q.task_done()
+            await q.close()
+            return q.flushes
+
+        assert asyncio.run(scenario()) == 0
+        assert self._queue(tmp_path).qsize() == 0
+
+    def test_spill_beyond_memory_budget(self, tmp_path):
+        async def scenario():
+            q = self._queue(tmp_path, maxsize=0, memory_budget=100)
+            for i in range(10):
+                await q.put({"text": f"{i:040d}"})
+            spilled = q.stats()["spilled"]
+            await q.flush()
+            texts = []
+            while not q.empty():
+                texts.append((await q.get())["text"])
+                q.task_done()
+            await q.close()
+            return spilled, texts, q.memory_bytes
+
+        spilled, texts, memory = asyncio.run(scenario())
+        assert spilled == 9  # ~52 байти на повідомлення — у бюджет влазить одне
+        assert texts == [f"{i:040d}" for i in range(10)]
+        assert memory == 0
+
+    def test_ack_by_item_out_of_order(self, tmp_path):
+        async def scenario():
+            q = self._queue(tmp_path)
+            for i in range(3):
+                await q.put({"n": i})
+            first, second = await q.get(), await q.get()
+            q.task_done(second)                 # напр. відфільтровано, поки first чекає в дайджесті
+            await q.close()
+            return first
+
+        assert asyncio.run(scenario()) == {"n": 0}
+        q = self._queue(tmp_path)
+        assert [q.get_nowait()["n"] for _ in range(q.qsize())] == [0, 2]
+
+    def test_eviction_during_page_in_keeps_accounting(self, tmp_path):
+        import threading
+
+        async def scenario():
+            q = self._queue(tmp_path, maxsize=3, policy="drop_oldest", memory_budget=0)
+            for i in range(3):
+                await q.put({"n": i})
+            await q.flush()
+            reading, release = threading.Event(), threading.Event()
+            read = q._read_payloads
+
+            def slow_read(keys):
+                reading.set()
+                release.wait(5)
+                return read(keys)
+
+            q._read_payloads = slow_read
+            getter = asyncio.create_task(q.get())
+            while not reading.is_set():
+                await asyncio.sleep(0.001)
+            await q.put({"n": 3})               # витісняє n=0, поки його вміст читається з диска
+            release.set()
+            first = await getter
+            q._read_payloads = read
+            rest = []
+            while not q.empty():
+                rest.append((await q.get())["n"])
+            stats = q.stats()
+            await q.close()
+            return first, rest, stats
+
+        first, rest, stats = asyncio.run(scenario())
+        assert first == {"n": 1} and rest == [2, 3]
+        assert stats["spilled"] == 0 and stats["memory_bytes"] == 0
+
+    def test_dropped_messages_are_deleted(self, tmp_path):
+        async def scenario():
+            q = self._queue(tmp_path, maxsize=2, policy="drop_oldest")
+            for i in range(4):
+                await q.put({"n": i})
+            await q.close()
+
+        asyncio.run(scenario())
+        q = self._queue(tmp_path)
+        assert [q.get_nowait()["n"] for _ in range(q.qsize())] == [2, 3]
+
+
+# ════════════════════════════════════════════════════════════════
+# NearDuplicateIndex — майже-дублікати (MinHash/LSH)
+# ════════════════════════════════════════════════════════════════
+class TestNearDuplicateIndex:
+    AD = ("Продам iPhone 13 Pro 256GB у відмінному стані, повний комплект, "
+          "без подряпин, батарея 91%. Ціна 650 євро, торг. Пишіть в особисті")
+
+    def _index(self, **kwargs):
+        from dedup import NearDuplicateIndex
+        return NearDuplicateIndex(**kwargs)
+
+    def test_small_edit_is_duplicate(self):
+        index = self._index()
+        assert index.check(self.AD, "chat_a", "q1") is None
+        edited = self.AD.replace("650", "640") + " !!!"
+        original = index.check(edited, "chat_b")
+        assert original is not None and original.pending_id == "q1"
+        assert original.chats == ["chat_a", "chat_b"]
+        assert index.check(self.AD, "chat_b").chats == ["chat_a", "chat_b"]
+
+    def test_take_releases_pending_item(self):
+        index = self._index()
+        index.check(self.AD, "chat_a", "q1")
+        index.check(self.AD + " !!!", "chat_b")
+        assert index.take("q1") == ["chat_b"]
+        # Уже взяте пересилкою — не анотується, але дублікати й далі відкидаються
+        assert index.take("q1") == [] and index.take("unknown") == []
+        original = index.check(self.AD, "chat_c")
+        assert original is not None and original.pending_id is None
+
+    def test_discard_forgets_unqueued_message(self):
+        index = self._index()
+        signature = index.signature(self.AD)
+        assert index.check(self.AD, "chat_a", "q1", signature=signature) is None
+        assert index.discard(signature) is True and len(index) == 0
+        assert index.take("q1") == [] and index.discard(signature) is False
+        assert index.check(self.AD + " !!!", "chat_b") is None  # більше не дублікат відкинутого
+
+    def test_different_message_is_not_duplicate(self):
+        index = self._index()
+        index.check(self.AD, "chat_a")
+        assert index.check("Шукаю перевізника з Валенсії до Києва на наступному тижні, два чемодани", "chat_b") is None
+        assert len(index) == 2
+
+    def test_window_and_size_bound(self, monkeypatch):
+        import dedup
+        now = [0.0]
+        monkeypatch.setattr(dedup.time, "monotonic", lambda: now[0])
+        index = self._index(window=60, max_entries=2)
+        for text in ("здам кімнату в центрі на місяць", "шукаю няню для дитини", "куплю велосипед недорого"):
+            assert index.check(text, "c") is None
+        assert len(index) == 2 and len(index._buckets) <= 2 * index.bands
+        now[0] = 120
+        assert index.check(self.AD, "c") is None
+        assert len(index) == 1
+
+
+# ════════════════════════════════════════════════════════════════
+# Логування — фоновий запис у файл
+# ════════════════════════════════════════════════════════════════
+class TestLogWriter:
+    def _record(self, msg, args, created):
+        import logging
+        record = logging.LogRecord("monitor", logging.INFO, __file__, 1, msg, args, None)
+        record.created = created
+        return record
+
+    def test_batches_by_date_and_prefix(self, tmp_path):
+        from datetime import datetime
+        writer = main_module.LogWriter(tmp_path)
+        handler = main_module.QueuedLogHandler("user", writer)
+        day1 = datetime(2026, 3, 1, 23, 59, 59).timestamp()
+        day2 = datetime(2026, 3, 2, 0, 0, 1).timestamp()
+        handler.handle(self._record("перший %s", ("запис",), day1))
+        handler.handle(self._record("другий", (), day2))
+        main_module.QueuedLogHandler("bot", writer).handle(self._record("бот", (), day2))
+        writer.start()
+        writer.stop()
+        assert not writer.is_alive()
+        assert "перший запис" in (tmp_path / "user_2026-03-01.log").read_text(encoding="utf-8")
+        assert "другий" in (tmp_path / "user_2026-03-02.log").read_text(encoding="utf-8")
+        assert "бот" in (tmp_path / "bot_2026-03-02.log").read_text(encoding="utf-8")
+
+    def test_message_is_rendered_at_call_time(self, tmp_path):
+        writer = main_module.LogWriter(tmp_path)
+        data = ["до"]
+        main_module.QueuedLogHandler("user", writer).handle(self._record("%s", (data,), 0.0))
+        data[0] = "після"
+        _, record = writer.queue.get_nowait()
+        assert record.msg == "['до']" and record.args is None
+
+
+# ════════════════════════════════════════════════════════════════
+# EventJournal — журнал подій
+# ════════════════════════════════════════════════════════════════
+class TestEventJournal:
+    def _journal(self, tmp_path):
+        from journal import EventJournal
+        return EventJournal(tmp_path)
+
+    def test_summary_across_flush(self, tmp_path):
+        journal = self._journal(tmp_path)
+        journal.record("queued", -100, "чай", chat="Група")
+        journal.record("local_blocked", -100, "чай", "spam_score", score=5, chat="Група", text="купуй")
+        journal.flush_sync()
+        journal.record("ai_blocked", -200, "кава", "ai", chat="Інша", text="реклама")
+        journal.record("forwarded", -100, "чай")
+        assert journal.summary(1) == {
+            "queued": 1, "local_blocked": 1, "ai_blocked": 1, "forwarded": 1, "dropped": 0,
+            "ai_checked": 0, "ai_passed": 0,
+        }
+        journal.flush_sync()
+        (path,) = tmp_path.glob("events_*.jsonl")
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+
+    def test_compact_lines_and_old_days_excluded(self, tmp_path):
+        import json, time
+        journal = self._journal(tmp_path)
+        journal.record("forwarded", -100, "чай", reason=None, chat=None)
+        journal._buffer.append({"ts": time.time() - 3 * 86400, "ev": "forwarded"})
+        journal.flush_sync()
+        files = sorted(tmp_path.glob("events_*.jsonl"))
+        assert len(files) == 2
+        entry = json.loads(files[-1].read_text(encoding="utf-8").splitlines()[0])
+        assert set(entry) == {"ts", "ev", "chat_id", "kw"}
+        assert len(files[0].read_text(encoding="utf-8").splitlines()) == 1
+
+    def test_counters_survive_restart(self, tmp_path):
+        import time
+        journal = self._journal(tmp_path)
+        journal.record("forwarded", -100, "чай")
+        journal.counters.add("forwarded", time.time() - 2 * 86400, n=4)
+        journal.count("ai_checked", 3)
+        journal.flush_sync()
+        restarted = self._journal(tmp_path)
+        assert restarted.summary(1)["forwarded"] == 1
+        assert restarted.summary(7)["forwarded"] == 5
+        assert restarted.summary(7)["ai_checked"] == 3
+        assert restarted.counters.hours(24)[-1][1]["forwarded"] == 1
+
+    def test_counters_rebuilt_from_existing_journal(self, tmp_path):
+        journal = self._journal(tmp_path)
+        journal.record("queued", -100, "чай")
+        journal.record("queued", -100, "чай")
+        journal.flush_sync()
+        (tmp_path / "counters.json").unlink()
+        assert self._journal(tmp_path).summary(1)["queued"] == 2
+
+
+# ════════════════════════════════════════════════════════════════
+# BlockedStore — сховище заблокованих
+# ════════════════════════════════════════════════════════════════
+class TestBlockedStore:
+    def _store(self, tmp_path, **kwargs):
+        from blocked_store import BlockedStore
+        return BlockedStore(tmp_path / "blocked.db", **kwargs)
+
+    def test_pages_newest_first_with_filters(self, tmp_path):
+        store = self._store(tmp_path)
+        for i in range(25):
+            chat = "Бізнес Валенсія" if i % 2 else "Оренда"
+            store.add("local_blocked", -100 - i % 2, chat, "чай" if i < 20 else "кава",
+                      f"повідомлення {i} " + ("ПРОМО" if i % 5 == 0 else ""), score=4)
+        store.flush_sync()
+        first = store.page(limit=10)
+        assert [r.text.split()[1] for r in first] == [str(i) for i in range(24, 14, -1)]
+        second = store.page(limit=10, before_id=first[-1].id)
+        assert second[0].text.startswith("повідомлення 14")
+        assert {r.chat for r in store.page(limit=50, chat="валенс")} == {"Бізнес Валенсія"}
+        assert len(store.page(limit=50, chat="-101")) == 12
+        assert len(store.page(limit=50, keyword="КАВА")) == 5
+        assert len(store.page(limit=50, query="промо")) == 5
+
+    def test_retention_by_rows_and_age(self, tmp_path):
+        import time
+        store = self._store(tmp_path, max_rows=3, max_age_days=1)
+        store.add("ai_blocked", 1, "c", "k", "старе", ts=time.time() - 2 * 86400)
+        for i in range(5):
+            store.add("ai_blocked", 1, "c", "k", f"нове {i}")
+        store.flush_sync()
+        assert store.count() == 3
+        assert [r.text for r in store.page()] == ["нове 4", "нове 3", "нове 2"]
+
+
+# ════════════════════════════════════════════════════════════════
+# Метрики — лічильники, гістограми, таймери стадій
+# ════════════════════════════════════════════════════════════════
+class TestMetrics:
+    def test_exposition_format(self):
+        from metrics import Counter, Gauge, Histogram, Registry
+        registry = Registry()
+        events = registry.register(Counter("x_events_total", "події", ("event",)))
+        latency = registry.register(Histogram("x_seconds", "затримка", (0.5, 1)))
+        depth = registry.register(Gauge("x_depth", "глибина"))
+        events.inc("queued")
+        events.inc("queued")
+        events.inc('a"b')
+        latency.observe(0.2)
+        latency.observe(0.7)
+        latency.observe(5)
+        depth.set_function(lambda: 3)
+        text = registry.render()
+        assert '# TYPE x_events_total counter' in text
+        assert 'x_events_total{event="queued"} 2' in text
+        assert 'x_events_total{event="a\\"b"} 1' in text
+        assert 'x_seconds_bucket{le="0.5"} 1' in text
+        assert 'x_seconds_bucket{le="1"} 2' in text
+        assert 'x_seconds_bucket{le="+Inf"} 3' in text
+        assert 'x_seconds_count 3' in text and 'x_seconds_sum 5.9' in text
+        assert 'x_depth 3' in text
+
+    def test_http_endpoint(self):
+        from metrics import Counter, Registry, serve_metrics
+        registry = Registry()
+        registry.register(Counter("y_total", "y")).inc()
+
+        async def scenario():
+            server = await serve_metrics("127.0.0.1", 0, registry)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return response.decode()
+
+        response = asyncio.run(scenario())
+        assert response.startswith("HTTP/1.1 200 OK") and "y_total 1" in response
+
+    def test_stage_timer_percentiles_and_fixed_size(self):
+        from metrics import StageTimers
+        timers = StageTimers(size=100, window=60)
+        for ms in range(1, 201):
+            timers.observe("send", ms / 1000)
+        with timers.time("match"):
+            pass
+        p = timers.percentiles()
+        # У буфері лише останні 100 вимірів (101…200 мс)
+        assert p["send"]["count"] == 100
+        assert (p["send"]["p50"], p["send"]["p95"], p["send"]["p99"]) == (0.15, 0.195, 0.199)
+        assert p["send"]["max"] == 0.2
+        assert p["match"]["count"] == 1
+
+    def test_stage_timer_rolling_window(self, monkeypatch):
+        import metrics
+        timers = metrics.StageTimers(window=60)
+        now = [1000.0]
+        monkeypatch.setattr(metrics.time, "monotonic", lambda: now[0])
+        timers.observe("queue_wait", 5.0)
+        now[0] += 120
+        timers.observe("queue_wait", 1.0)
+        assert timers.percentiles()["queue_wait"]["count"] == 1
+        assert timers.percentiles(window=300)["queue_wait"]["count"] == 2
+
+
+# ════════════════════════════════════════════════════════════════
+# Бенчмарки фільтрів
+# ════════════════════════════════════════════════════════════════
+class TestFilterBenchmarks:
+    def test_report_covers_every_function_and_size(self):
+        import json
+        from benchmarks.bench_filters import format_table, make_rules, run
+        assert len(set(make_rules(300))) == 300
+        report = run([20, 50], messages=30, repeat=1)
+        keys = {(r["function"], r["rules"]) for r in report["results"]}
+        assert keys == {(f, n) for f in ("CompiledFilters.decide", "KeywordMatcher.scan", "CompiledFilters.updated",
+                                         "find_keyword", "has_minus_word", "is_service_spam",
+                                         "clean_minus_words") for n in (20, 50)}
+        assert all(r["ops_per_sec"] > 0 for r in report["results"])
+        json.dumps(report)
+        assert "Δ" in format_table(report, report)
+
+
+# ════════════════════════════════════════════════════════════════
+# replay.py — офлайн-прогін дампу
+# ════════════════════════════════════════════════════════════════
+class TestReplay:
+    BASE = {
+        "keywords": ["квартиру", "flat"],
+        "minus_words": ["посуточно"],
+        "spam_score_threshold": 4,
+    }
+    ROWS = [
+        {"text": "Шукаю квартиру в центрі", "chat": "a", "sender": "x"},
+        {"text": "Здам квартиру посуточно", "chat": "a", "sender": "y"},
+        {"text": "Looking for a flat near the beach, urgent", "chat": "b", "sender": "z"},
+        {"text": "Погода сьогодні чудова", "chat": "b", "sender": "z"},
+        {"text": "", "chat": "b", "sender": "z"},
+        {"text": "Шукаю квартиру в центрі!", "chat": "c", "sender": "w"},
+    ]
+
+    def _messages(self, tmp_path, fmt="jsonl"):
+        import csv, json
+        from replay import read_messages
+        path = tmp_path / f"dump.{fmt}"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=["text", "chat", "sender"])
+                writer.writeheader()
+                writer.writerows(self.ROWS)
+            else:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in self.ROWS)
+        return list(read_messages(path))
+
+    def test_verdict_counts_and_changed_decisions(self, tmp_path):
+        from replay import replay
+        stricter = {**self.BASE, "minus_words": ["посуточно", "urgent"]}
+        report = replay(self._messages(tmp_path, "csv"), [self.BASE, stricter])
+        assert report.total == 6
+        assert dict(report.counts[0]) == {
+            "queued": 2, "minus_word": 1, "no_keyword": 1, "no_text": 1, "duplicate": 1,
+        }
+        assert report.counts[1]["minus_word"] == 2 and report.counts[1]["queued"] == 1
+        assert report.changed_total == 1
+        message, old, new = report.changed[0]
+        assert message.index == 2 and old.verdict == "queued"
+        assert (new.verdict, new.detail) == ("minus_word", "urgent")
+
+    def test_config_with_rule_store(self, tmp_path, monkeypatch):
+        import json
+        from replay import load_replay_config, replay
+        from rules_store import RuleStore
+        monkeypatch.chdir(tmp_path)
+        store = RuleStore("rules.db")
+        store.apply("keywords", self.BASE["keywords"], [])
+        store.apply("minus_words", self.BASE["minus_words"], [])
+        store.close()
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps({"rule_store": "rules.db", "spam_score_threshold": 4}), encoding="utf-8")
+        config = load_replay_config(path)
+        assert config["keywords"] == self.BASE["keywords"]
+        report = replay(self._messages(tmp_path), [config])
+        assert report.counts[0]["queued"] == 2 and report.counts[0]["minus_word"] == 1
+        path.write_text(json.dumps({"rule_store": "missing.db"}), encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_replay_config(path)
+
+    def test_process_pool_matches_single_process(self, tmp_path):
+        from replay import replay
+        messages = self._messages(tmp_path)
+        single = replay(messages, [self.BASE])
+        pooled = replay(messages, [self.BASE], jobs=2, chunk_size=2)
+        assert pooled.counts == single.counts
+
+
+# ════════════════════════════════════════════════════════════════
+# Навантажувальний тест — фейковий Telegram і заглушка OpenAI
+# ════════════════════════════════════════════════════════════════
+class TestLoadTestHarness:
+    def test_fake_client_dispatch_and_flood_injection(self):
+        from loadtest.fake_telegram import (
+            FakeEntity, FakeMessage, FakeNewMessageEvent, FakeTelegramClient, FloodPlan, FloodWaitError, NewMessage,
+        )
+        client = FakeTelegramClient()
+        seen = []
+
+        @client.on(NewMessage(incoming=True))
+        async def handler(event):
+            seen.append((event.chat_id, (await event.get_chat()).title, event.message.text))
+
+        async def scenario():
+            chat, sender = FakeEntity(-1, "Група"), FakeEntity(7, first_name="Ivan")
+            await asyncio.gather(*client.dispatch(FakeNewMessageEvent(client, chat, sender, FakeMessage(1, "привіт"))))
+            await client.send_message("@out", "перший")
+            client.flood = FloodPlan(storm=(0, 60), seconds=3)
+            with pytest.raises(FloodWaitError) as exc:
+                await client.send_message("@out", "другий")
+            return exc.value.seconds
+
+        assert asyncio.run(scenario()) == 3
+        assert seen == [(-1, "Група", "привіт")]
+        assert client.sent_total == 1 and client.calls["flood_wait"] == 1
+
+    def test_stub_openai_returns_responses_payload(self):
+        import json, urllib.request
+        from loadtest.stub_openai import StubOpenAIServer
+        stub = StubOpenAIServer(latency=0, jitter=0, spam_ratio=1.0).start()
+        try:
+            request = urllib.request.Request(
+                stub.base_url + "/responses", data=b'{"input": "x"}', method="POST",
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                body = json.loads(response.read())
+        finally:
+            stub.stop()
+        assert body["output"][0]["content"][0] == {"type": "output_text", "text": "SPAM", "annotations": []}
+        assert stub.requests == 1
+
+
+# ════════════════════════════════════════════════════════════════
+# OpenAI — асинхронний клієнт і ліміт одночасних запитів
+# ════════════════════════════════════════════════════════════════
+class TestOpenAIPool:
+    @pytest.fixture
+    def bot_module(self, monkeypatch):
+        import bot
+        monkeypatch.setattr(bot, "_openai_client", None)
+        monkeypatch.setattr(bot, "_openai_settings", ())
+        monkeypatch.setattr(bot, "_ai_semaphore", None)
+        monkeypatch.setattr(bot, "_ai_semaphore_size", 0)
+        monkeypatch.setattr(bot, "OPENAI_AVAILABLE", True)
+        monkeypatch.setattr(bot, "OPENAI_API_KEY", "sk-test")
+        # HTTP-пакет, з яким «зібрано» SDK: bot.py бере Limits саме з нього
+        transport = types.ModuleType("fake_transport")
+        transport.Limits = lambda **kw: kw
+        transport.AsyncClient = type("AsyncClient", (), {"__init__": lambda self, **kw: setattr(self, "kwargs", kw)})
+        transport.AsyncClient.__module__ = "fake_transport"
+        monkeypatch.setitem(sys.modules, "fake_transport", transport)
+        monkeypatch.setattr(bot, "DefaultAsyncHttpxClient", type("_DefaultAsyncHttpxClient", (transport.AsyncClient,), {}))
+        monkeypatch.setattr(bot, "AsyncOpenAI", MagicMock(side_effect=lambda **kw: MagicMock(close=AsyncMock())))
+        return bot
+
+    def test_sdk_importable_means_ai_available(self, monkeypatch):
+        import importlib.util, pathlib
+        openai = pytest.importorskip("openai")
+        transports = {cls.__module__.partition(".")[0] for cls in openai.DefaultAsyncHttpxClient.__mro__}
+        if "httpx" not in transports:
+            monkeypatch.setitem(sys.modules, "httpx", None)  # SDK без httpx (openai ≥ 3) — оточення без нього
+        spec = importlib.util.spec_from_file_location("bot_fresh", pathlib.Path(__file__).parent.parent / "bot.py")
+        fresh = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(fresh)
+        assert fresh.OPENAI_AVAILABLE is True
+
+    def test_client_reused_and_rebuilt_on_options_change(self, bot_module):
+        config = {"ai_max_concurrency": 2, "ai_timeout": 12.5, "ai_max_retries": 1}
+
+        async def scenario():
+            first = bot_module.get_openai_client("sk-test", config)
+            assert bot_module.get_openai_client("sk-test", dict(config)) is first
+            second = bot_module.get_openai_client("sk-test", {**config, "ai_timeout": 5})
+            await asyncio.sleep(0)  # старий клієнт закривається у фоні
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert second is not first and bot_module.AsyncOpenAI.call_count == 2
+        first.close.assert_awaited_once()
+        kwargs = bot_module.AsyncOpenAI.call_args_list[0].kwargs
+        assert kwargs["timeout"] == 12.5 and kwargs["max_retries"] == 1
+        http_client = kwargs["http_client"]
+        assert http_client.kwargs["timeout"] == 12.5
+        assert http_client.kwargs["limits"]["max_connections"] == 2
+        assert http_client.kwargs["limits"]["max_keepalive_connections"] == 2
+
+    def test_concurrency_bounded_by_semaphore(self, bot_module, monkeypatch):
+        in_flight = peak = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return MagicMock(output_text="TARGET")
+
+        client = MagicMock()
+        client.responses.create = create
+        monkeypatch.setattr(bot_module, "get_openai_client", MagicMock(return_value=client))
+        config = {"ai_filter_enabled": True, "ai_max_concurrency": 2}
+
+        async def scenario():
+            return await asyncio.gather(*(
+                bot_module.ai_filter_message(f"текст {i}", "чай", "Група", config) for i in range(6)
+            ))
+
+        assert asyncio.run(scenario()) == [True] * 6
+        assert peak == 2
+        assert bot_module._ai_slot({"ai_max_concurrency": 3}) is not bot_module._ai_slot(config)
+
+    def test_validate_fractional_timeout(self):
+        assert main_module.validate_config({"ai_timeout": 12.5, "ai_max_concurrency": 4}) == []
+        assert main_module.validate_config({"ai_timeout": -1}) == ["ai_timeout: очікується невід'ємне число"]
+
+
+# ════════════════════════════════════════════════════════════════
+# resolve_sender_name — ліниве ім'я відправника
+# ════════════════════════════════════════════════════════════════
+class TestResolveSenderName:
+    def test_resolves_once_and_caches(self, monkeypatch):
+        client = MagicMock()
+        client.get_entity = AsyncMock(return_value=MagicMock(first_name="Ivan", last_name="", username="ivan", id=7))
+        monkeypatch.setattr(main_module, "user_client", client)
+        monkeypatch.setattr(main_module, "sender_cache", TTLCache(maxsize=10, ttl=60))
+        assert asyncio.run(main_module.resolve_sender_name(7, "peer")) == "Ivan [ @ivan ]"
+        assert asyncio.run(main_module.resolve_sender_name(7, "peer")) == "Ivan [ @ivan ]"
+        client.get_entity.assert_awaited_once_with("peer")
+
+    def test_failure_falls_back_to_id_without_caching(self, monkeypatch):
+        client = MagicMock()
+        client.get_entity = AsyncMock(side_effect=ValueError("not found"))
+        monkeypatch.setattr(main_module, "user_client", client)
+        monkeypatch.setattr(main_module, "sender_cache", TTLCache(maxsize=10, ttl=60))
+        assert asyncio.run(main_module.resolve_sender_name(7)) == "[ 7 ]"
+        assert len(main_module.sender_cache) == 0
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])